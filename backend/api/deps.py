@@ -1,44 +1,145 @@
 """
 API 依赖项
 """
-from fastapi import Depends, HTTPException, Header
+import time
+
+from fastapi import Cookie, Depends, HTTPException, Header, Query
 from sqlalchemy.orm import Session
 from typing import Optional
 
-from backend.database import get_db
+from backend.config import settings
+from backend.database import SessionLocal, get_db
 from backend.models import Family, Child
+from backend.core.auth_cache import (
+    AuthEntry,
+    ChildSnapshot,
+    FamilySnapshot,
+    get_auth_cache,
+)
 from backend.core.request import get_request_id as get_current_request_id
+from backend.services.subject_catalog import SubjectCatalog, get_subject_catalog_service
 
+# 前端保存访问令牌时同步写入的 Cookie（只用于图片请求）
+ACCESS_TOKEN_COOKIE = "mobo_token"
 
-async def get_current_family(
+
+async def get_auth_entry(
     db: Session = Depends(get_db),
     x_access_token: Optional[str] = Header(None),
-) -> Family:
+) -> AuthEntry:
     """
-    获取当前家庭
+    解析访问令牌
 
-    从 Header 中的 X-Access-Token 获取认证信息
+    先查认证缓存，未命中时一次查询取回家庭和孩子，写入缓存。
+    无效令牌不缓存，避免随机令牌挤占缓存。
     """
     if not x_access_token:
         raise HTTPException(status_code=401, detail="缺少访问令牌")
 
-    family = db.query(Family).filter(Family.access_token == x_access_token).first()
-    if not family:
+    return _resolve_token(db, x_access_token)
+
+
+async def get_stream_child(
+    x_access_token: Optional[str] = Header(None),
+    token: Optional[str] = Query(None, description="访问令牌（EventSource 无法设置请求头时使用）"),
+) -> ChildSnapshot:
+    """
+    长连接（SSE）使用的孩子认证
+
+    - 令牌可以放在查询参数 token 中
+    - 不使用 get_db：请求会话要到响应结束才关闭，长连接会一直占用连接池，
+      这里缓存未命中时临时开一个会话查询后立即关闭
+    """
+    access_token = x_access_token or token
+    if not access_token:
+        raise HTTPException(status_code=401, detail="缺少访问令牌")
+
+    db = SessionLocal()
+    try:
+        entry = _resolve_token(db, access_token)
+    finally:
+        db.close()
+
+    if not entry.child:
+        raise HTTPException(status_code=404, detail="未找到孩子信息")
+    return entry.child
+
+
+async def get_media_family(
+    x_access_token: Optional[str] = Header(None),
+    token: Optional[str] = Query(None, description="访问令牌（<img> 无法设置请求头时使用）"),
+    access_token: Optional[str] = Cookie(None, alias=ACCESS_TOKEN_COOKIE),
+    db: Session = Depends(get_db),
+) -> Optional[FamilySnapshot]:
+    """
+    图片请求使用的家庭认证
+
+    - 只在 UPLOAD_SERVE_MODE=accel 时检查，其他模式下图片靠不可猜测的 URL 保护，返回 None
+    - <img> 无法设置请求头，令牌也可以放在 Cookie（前端保存令牌时同步写入）或查询参数中；
+      Cookie 只在只读的图片请求中接受，其他接口仍要求请求头，不引入 CSRF 风险
+    """
+    if settings.UPLOAD_SERVE_MODE != "accel":
+        return None
+
+    resolved = x_access_token or token or access_token
+    if not resolved:
+        raise HTTPException(status_code=401, detail="缺少访问令牌")
+    return _resolve_token(db, resolved).family
+
+
+def _resolve_token(db: Session, x_access_token: str) -> AuthEntry:
+    cache = get_auth_cache()
+    started = time.perf_counter()
+
+    entry = cache.get(x_access_token)
+    if entry is not None:
+        cache.record(hit=True, seconds=time.perf_counter() - started)
+        return entry
+
+    row = (
+        db.query(Family, Child)
+        .outerjoin(Child, Child.family_id == Family.id)
+        .filter(Family.access_token == x_access_token)
+        .order_by(Child.id)
+        .first()
+    )
+    if not row:
         raise HTTPException(status_code=401, detail="无效的访问令牌")
 
-    return family
+    family, child = row
+    entry = AuthEntry(
+        family=FamilySnapshot(id=family.id, name=family.name, access_token=family.access_token),
+        child=ChildSnapshot(id=child.id, family_id=child.family_id, name=child.name) if child else None,
+    )
+    cache.put(x_access_token, entry)
+    cache.record(hit=False, seconds=time.perf_counter() - started)
+    return entry
+
+
+async def get_current_family(
+    entry: AuthEntry = Depends(get_auth_entry),
+) -> FamilySnapshot:
+    """
+    获取当前家庭
+
+    从 Header 中的 X-Access-Token 获取认证信息
+    """
+    return entry.family
 
 
 async def get_current_child(
-    db: Session = Depends(get_db),
-    family: Family = Depends(get_current_family),
-) -> Child:
+    entry: AuthEntry = Depends(get_auth_entry),
+) -> ChildSnapshot:
     """获取当前家庭的孩子"""
-    child = db.query(Child).filter(Child.family_id == family.id).first()
-    if not child:
+    if not entry.child:
         raise HTTPException(status_code=404, detail="未找到孩子信息")
 
-    return child
+    return entry.child
+
+
+async def get_subject_catalog() -> SubjectCatalog:
+    """获取科目目录快照（进程内缓存，写入科目后自动重新加载）"""
+    return get_subject_catalog_service().get_catalog()
 
 
 async def get_request_id() -> str:
@@ -0,0 +1,86 @@
+"""
+HTTP 条件请求工具（ETag / 304）
+"""
+import hashlib
+from datetime import datetime, timezone
+from email.utils import format_datetime
+from typing import Optional
+
+from fastapi import Response
+
+
+def make_etag(*parts) -> str:
+    """由版本信息生成弱 ETag（内容摘要，不暴露内部数据）"""
+    digest = hashlib.sha1(repr(parts).encode()).hexdigest()[:16]
+    return f'W/"{digest}"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """
+    判断 If-None-Match 是否命中（弱比较，忽略 W/ 前缀）
+
+    Args:
+        if_none_match: 请求头 If-None-Match 的值，可以是逗号分隔的多个 ETag 或 *
+        etag: 当前资源的 ETag
+
+    Returns:
+        是否命中
+    """
+    if not if_none_match:
+        return False
+
+    def _opaque(tag: str) -> str:
+        tag = tag.strip()
+        return tag[2:] if tag.startswith("W/") else tag
+
+    current = _opaque(etag)
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate == "*" or _opaque(candidate) == current:
+            return True
+    return False
+
+
+def _validator_headers(
+    etag: str,
+    last_modified: Optional[datetime] = None,
+    private: bool = False,
+) -> dict:
+    headers = {
+        "ETag": etag,
+        # 允许浏览器缓存，但每次使用前都要带 If-None-Match 回源校验
+        "Cache-Control": "private, no-cache" if private else "no-cache",
+    }
+    if private:
+        # 同一 URL 的内容因访问令牌而异
+        headers["Vary"] = "X-Access-Token"
+    if last_modified is not None:
+        # 数据库中的时间均为 UTC（naive）
+        headers["Last-Modified"] = format_datetime(
+            last_modified.replace(tzinfo=timezone.utc), usegmt=True
+        )
+    return headers
+
+
+def set_validators(
+    response: Response,
+    etag: str,
+    last_modified: Optional[datetime] = None,
+    private: bool = False,
+) -> None:
+    """给 200 响应加上 ETag / Last-Modified / Cache-Control"""
+    response.headers.update(_validator_headers(etag, last_modified, private))
+
+
+def not_modified(
+    etag: str,
+    last_modified: Optional[datetime] = None,
+    private: bool = False,
+) -> Response:
+    """
+    构建 304 响应（带上 ETag，便于客户端继续使用缓存）
+
+    是否返回 304 只依据 ETag 判断：Last-Modified 只精确到秒，
+    同一秒内的多次修改无法区分，因此不处理 If-Modified-Since。
+    """
+    return Response(status_code=304, headers=_validator_headers(etag, last_modified, private))
@@ -0,0 +1,150 @@
+"""
+Idempotency-Key 请求头（客户端重试去重，记录的存取见 services/idempotency.py）
+
+用法：
+
+```python
+@router.post("/draft")
+async def create(..., idem: IdempotencyGuard = Depends(get_idempotency), db: Session = Depends(get_db)):
+    if idem.replay is not None:
+        return idem.replay          # 重试：直接返回首次的响应
+    ...
+    response = idem.respond(db, content)
+    db.commit()                     # 响应与业务数据一起提交
+    return response
+```
+"""
+import hashlib
+from typing import Any, Callable, List, Optional
+
+from fastapi import Depends, Header, Request
+from fastapi.responses import Response
+from loguru import logger
+from pydantic import BaseModel
+from sqlalchemy.orm import Session
+from starlette.datastructures import UploadFile
+
+from backend.api.deps import get_current_child
+from backend.api.serializers import ORJSONResponse
+from backend.core.auth_cache import ChildSnapshot
+from backend.database import SessionLocal, get_db
+from backend.services.idempotency import get_idempotency_service
+
+IDEMPOTENCY_KEY_HEADER = "Idempotency-Key"
+REPLAYED_HEADER = "Idempotent-Replayed"
+
+
+async def request_fingerprint(request: Request) -> str:
+    """
+    请求内容摘要
+
+    JSON 请求体直接取哈希；multipart 表单按字段取值，文件只取文件名、类型和大小，
+    不再读一遍文件内容（键由客户端为每次操作生成，摘要只用于发现键被误用于其他请求）
+    """
+    digest = hashlib.sha256(f"{request.method} {request.url.path}\n".encode())
+    content_type = request.headers.get("content-type", "")
+    if content_type.startswith(("multipart/form-data", "application/x-www-form-urlencoded")):
+        # 请求体已由 FastAPI 解析并缓存在 request 上，这里不会重复解析
+        form = await request.form()
+        for name, value in form.multi_items():
+            if isinstance(value, UploadFile):
+                value = f"{value.filename}:{value.content_type}:{value.size}"
+            digest.update(f"{name}={value}\n".encode())
+    else:
+        digest.update(await request.body())
+    return digest.hexdigest()
+
+
+class IdempotencyGuard:
+    """
+    一次请求的幂等状态
+
+    - 没有 Idempotency-Key 时 record_id 为 None，respond 只渲染响应，不保存
+    - 重试命中已完成的请求时 replay 为保存的响应，路由应在执行任何业务逻辑前直接返回它
+    - 在 respond 之前就已提交的数据，用 on_release 登记撤销操作，键被释放时一并撤销，
+      否则客户端用同一个键重试会再写一份
+    """
+
+    def __init__(self, record_id: Optional[int] = None, replay: Optional[Response] = None):
+        self.record_id = record_id
+        self.replay = replay
+        self.responded = False
+        self.release_hooks: List[Callable[[Session], Any]] = []
+
+    def on_release(self, hook: Callable[[Session], Any]) -> None:
+        """
+        登记键被释放（请求失败）时执行的撤销操作
+
+        hook 接收一个新会话，在删除 pending 记录的同一个事务中执行；没有幂等键时不登记
+        """
+        if self.record_id is not None:
+            self.release_hooks.append(hook)
+
+    def respond(self, db: Session, content: Any, status_code: int = 200) -> Any:
+        """
+        序列化响应并记入当前事务（由调用方提交）
+
+        有没有幂等键都由这里渲染，格式一致；首次响应和重试返回的是同一份字节
+        （保存的就是这里渲染出的响应体）。
+        """
+        # 字典（serializers 构建）直接交给 ORJSONResponse，时间按 UTC 加 'Z' 输出；
+        # 不经过 jsonable_encoder，它会先把时间转成不带时区的字符串。pydantic 模型按其 json 配置导出
+        if isinstance(content, BaseModel):
+            content = content.model_dump(mode="json")
+        response = ORJSONResponse(content, status_code=status_code)
+        if self.record_id is not None:
+            get_idempotency_service().complete(db, self.record_id, status_code, response.body)
+            self.responded = True
+        return response
+
+
+async def get_idempotency(
+    request: Request,
+    idempotency_key: Optional[str] = Header(None, alias=IDEMPOTENCY_KEY_HEADER, max_length=255),
+    child: ChildSnapshot = Depends(get_current_child),
+    db: Session = Depends(get_db),
+):
+    """
+    处理请求头 Idempotency-Key（可选）
+
+    键按孩子隔离；请求抛出异常或没有调用 respond 就返回时删除 pending 记录（并执行 on_release
+    登记的撤销操作），允许重试。
+    """
+    if not idempotency_key:
+        yield IdempotencyGuard()
+        return
+
+    service = get_idempotency_service()
+    fingerprint = await request_fingerprint(request)
+    record = service.begin(db, child.id, idempotency_key, fingerprint)
+    if record.status == "done":
+        logger.info(f"[Idempotency] 重试命中 {request.url.path}（key={idempotency_key}）")
+        yield IdempotencyGuard(
+            replay=Response(
+                content=record.response_body.encode(),
+                status_code=record.status_code,
+                media_type="application/json",
+                headers={REPLAYED_HEADER: "true"},
+            )
+        )
+        return
+
+    guard = IdempotencyGuard(record.id)
+    try:
+        yield guard
+    except Exception:
+        _release(guard)
+        raise
+    if not guard.responded:
+        _release(guard)
+
+
+def _release(guard: IdempotencyGuard) -> None:
+    # 请求会话可能处于失败状态，另开一个会话
+    db = SessionLocal()
+    try:
+        for hook in guard.release_hooks:
+            hook(db)
+        get_idempotency_service().release(db, guard.record_id)
+    finally:
+        db.close()
@@ -2,13 +2,13 @@
 统计分析 API
 """
 from fastapi import APIRouter, Depends, Query
-from sqlalchemy.orm import Session
+from sqlalchemy.orm import Session, joinedload
 from sqlalchemy import func
 from datetime import datetime, timedelta
 from typing import List
 
 from backend.database import get_db
-from backend.models import HomeworkBatch, HomeworkItem, Subject
+from backend.models import HomeworkBatch, HomeworkItem
 from backend.api.deps import get_current_child
 
 router = APIRouter(prefix="/api/analytics", tags=["analytics"])
@@ -112,13 +112,15 @@ async def get_subject_stats(
     batches = db.query(HomeworkBatch).filter(HomeworkBatch.child_id == child.id).all()
     batch_ids = [b.id for b in batches]
 
-    # 获取所有作业项
-    items = db.query(HomeworkItem).filter(HomeworkItem.batch_id.in_(batch_ids)).all()
+    # 获取所有作业项（科目随作业项 join 加载）
+    items = db.query(HomeworkItem).options(
+        joinedload(HomeworkItem.subject)
+    ).filter(HomeworkItem.batch_id.in_(batch_ids)).all()
 
     # 按科目分组统计
     subject_stats = {}
     for item in items:
-        subject = db.query(Subject).filter(Subject.id == item.subject_id).first()
+        subject = item.subject
         if not subject:
             continue
 
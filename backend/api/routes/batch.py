@@ -1,22 +1,41 @@
 """
 作业批次管理 API
 """
+import base64
+import binascii
 import json
 
 from datetime import datetime
 
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from typing import List, Optional
+from fastapi import APIRouter, Depends, Header, HTTPException, Query
+from sqlalchemy import String, and_, case, distinct, func, or_, select, type_coerce
+from sqlalchemy.orm import Session, joinedload, selectinload
+from typing import List, Optional, Tuple, Union
 
 from backend.database import get_db
-from backend.models import HomeworkBatch, HomeworkItem, BatchImage, Subject
+from backend.models import BatchImage, HomeworkBatch, HomeworkItem
 from backend.services.homework_service import get_homework_service
-from backend.api.deps import get_current_child
+from backend.api.deps import get_current_child, get_subject_catalog
+from backend.api.serializers import (
+    ORJSONResponse,
+    batch_to_response,
+    batch_to_summary,
+    image_to_response,
+    item_to_response,
+    item_to_slim_response,
+    subject_to_response,
+)
+from backend.services.subject_catalog import SubjectCatalog
+from backend.services.event_bus import queue_event
+from backend.services.batch_purge import mark_batches_deleted
+from backend.api.http_cache import etag_matches, make_etag, not_modified, set_validators
 from backend.schemas import (
     HomeworkBatchResponse,
+    SparseBatchListResponse,
+    SparseBatchDetailResponse,
+    BatchSummaryPage,
+    TodayViewResponse,
     HomeworkItemResponse,
-    BatchImageResponse,
     HomeworkItemCreate,
     HomeworkItemUpdate,
     HomeworkItemStatusUpdate,
@@ -24,79 +43,159 @@ from backend.schemas import (
     BatchUpdate,
     HomeworkItemUpdateOrCreate,
 )
-from backend.config import settings
 
 router = APIRouter(prefix="/api/batches", tags=["batches"])
 
 
-def _subject_response_dict(subject: Subject) -> dict:
-    """科目转字典"""
+# 预加载策略：作业项（连同科目）用 selectin 一次取回，科目在同一条 SQL 中 join
+_LOAD_ITEMS = selectinload(HomeworkBatch.items).joinedload(HomeworkItem.subject)
+_LOAD_IMAGES = selectinload(HomeworkBatch.images)
+
+
+# ==================== 稀疏字段集 / include 展开 ====================
+# 指定 fields 或 include 任一参数时，只返回请求的字段和关联：
+# - fields：批次字段（逗号分隔），id 总是返回
+# - include：items / images / subjects；作业项只带 subject_id，
+#   科目信息以 {id: 科目} 字典在响应顶层 subjects 中给出一次
+
+_BATCH_FIELDS = frozenset(HomeworkBatchResponse.model_fields) - {"items", "images"}
+_BATCH_INCLUDES = frozenset({"items", "images", "subjects"})
+
+
+def _parse_csv(value: Optional[str], allowed: frozenset, name: str) -> Optional[set]:
+    """解析逗号分隔的查询参数，未提供时返回 None"""
+    if value is None:
+        return None
+    values = {v.strip() for v in value.split(",") if v.strip()}
+    invalid = values - allowed
+    if invalid:
+        raise HTTPException(status_code=400, detail=f"无效的 {name} 参数: {', '.join(sorted(invalid))}")
+    return values
+
+
+def _sparse_load_options(include: set) -> list:
+    """只预加载请求的关联（作业项不再 join 科目）"""
+    options = []
+    if "items" in include:
+        options.append(selectinload(HomeworkBatch.items))
+    if "images" in include:
+        options.append(_LOAD_IMAGES)
+    return options
+
+
+def _sparse_batch(batch: HomeworkBatch, fields: Optional[set], include: set) -> dict:
+    """按 fields / include 序列化批次"""
+    keep = (fields | {"id"}) if fields else _BATCH_FIELDS
+    data = {key: value for key, value in batch_to_response(batch).items() if key in keep}
+    if "items" in include:
+        data["items"] = [item_to_slim_response(item) for item in batch.items]
+    if "images" in include:
+        data["images"] = [image_to_response(img) for img in batch.images]
+    return data
+
+
+def _side_load_subjects(
+    db: Session,
+    catalog: SubjectCatalog,
+    batches: List[HomeworkBatch],
+    include: set,
+) -> dict:
+    """侧载这些批次的作业项引用到的科目（科目信息来自目录缓存）"""
+    if "items" in include:
+        subject_ids = {item.subject_id for batch in batches for item in batch.items}
+    elif batches:
+        subject_ids = set(db.scalars(
+            select(distinct(HomeworkItem.subject_id))
+            .where(HomeworkItem.batch_id.in_([batch.id for batch in batches]))
+        ))
+    else:
+        subject_ids = set()
+
     return {
-        "id": subject.id,
-        "name": subject.name,
-        "color": subject.color,
-        "sort_order": subject.sort_order,
+        str(subject_id): subject_to_response(catalog.get(subject_id))
+        for subject_id in sorted(subject_ids)
+        if subject_id in catalog
     }
 
 
-def _item_to_response(item: HomeworkItem, subject: Subject) -> HomeworkItemResponse:
-    """作业项转响应"""
-    return HomeworkItemResponse(
-        id=item.id,
-        batch_id=item.batch_id,
-        source_image_id=item.source_image_id,
-        subject=_subject_response_dict(subject),
-        text=item.text,
-        key_concept=item.key_concept,
-        status=item.status,
-        started_at=item.started_at,
-        finished_at=item.finished_at,
-        created_at=item.created_at,
-    )
+def _cached_json(content, etag: str, last_modified: Optional[datetime]) -> ORJSONResponse:
+    """直接返回 orjson 响应（跳过 response_model 二次校验），并附上条件请求校验头"""
+    result = ORJSONResponse(content)
+    set_validators(result, etag, last_modified, private=True)
+    return result
 
 
-def _image_to_response(img: BatchImage) -> BatchImageResponse:
-    """图片转响应"""
-    response = BatchImageResponse.model_validate(img)
-    response.file_path = f"{settings.BASE_URL}/uploads/{img.file_path}"  # type: ignore
-    return response
-
-
-def _batch_to_response(
-    batch: HomeworkBatch,
-    items: Optional[List[HomeworkItem]] = None,
-    subjects: Optional[dict] = None
-) -> HomeworkBatchResponse:
-    """批次转响应（不包含 vlm_parse_result）"""
-    response_items = []
-    if items and subjects:
-        response_items = [_item_to_response(item, subjects[item.subject_id]) for item in items]
-
-    return HomeworkBatchResponse(
-        id=batch.id,
-        child_id=batch.child_id,
-        name=batch.name,
-        status=batch.status,
-        deadline_at=batch.deadline_at,
-        completed_at=batch.completed_at,
-        created_at=batch.created_at,
-        updated_at=batch.updated_at,
-        items=response_items,
-        images=[],
-        vlm_parse_result=None  # 批次列表不返回解析结果
+def _version_probe(db: Session, child_id: int, batch_id: Optional[int] = None) -> tuple:
+    """版本探测：只聚合批次、作业项和图片的数量与最后修改时间，不加载任何行
+
+    作业项的新增、修改、删除都会改变作业项数量或最大 updated_at；
+    图片的新增、删除会改变图片数量或最大 id（图片没有 updated_at）；
+    新增/删除作业项、修改/删除图片、写入 VLM 解析结果的接口同时会更新批次的 updated_at。
+
+    Returns:
+        (批次数, 批次最大 updated_at, 作业项数, 作业项最大 updated_at, 图片数, 图片最大 id)
+    """
+    batch_filter = [HomeworkBatch.child_id == child_id, HomeworkBatch.deleted_at.is_(None)]
+    if batch_id is not None:
+        batch_filter.append(HomeworkBatch.id == batch_id)
+    image_batches = BatchImage.batch_id.in_(select(HomeworkBatch.id).where(*batch_filter))
+
+    query = (
+        db.query(
+            func.count(distinct(HomeworkBatch.id)),
+            func.max(HomeworkBatch.updated_at),
+            func.count(HomeworkItem.id),
+            func.max(HomeworkItem.updated_at),
+            select(func.count(BatchImage.id)).where(image_batches).scalar_subquery(),
+            select(func.max(BatchImage.id)).where(image_batches).scalar_subquery(),
+        )
+        .select_from(HomeworkBatch)
+        .outerjoin(HomeworkBatch.items)
+        .filter(*batch_filter)
     )
+    return tuple(query.one())
 
 
-@router.get("", response_model=List[HomeworkBatchResponse])
+def _last_modified(version: tuple) -> Optional[datetime]:
+    """取版本探测结果中最晚的修改时间"""
+    timestamps = [t for t in (version[1], version[3]) if t is not None]
+    return max(timestamps) if timestamps else None
+
+
+@router.get("", response_model=Union[List[HomeworkBatchResponse], SparseBatchListResponse])
 async def get_batches(
     status: Optional[str] = None,
     limit: Optional[int] = None,
     offset: Optional[int] = None,
+    fields: Optional[str] = None,
+    include: Optional[str] = None,
     child=Depends(get_current_child),
+    catalog: SubjectCatalog = Depends(get_subject_catalog),
+    if_none_match: Optional[str] = Header(None),
     db: Session = Depends(get_db),
 ):
-    """获取批次列表（包含 items 用于显示进度）"""
-    query = db.query(HomeworkBatch).filter(HomeworkBatch.child_id == child.id)
+    """获取批次列表（包含 items 用于显示进度）
+
+    指定 fields / include 时返回 {"batches": [...], "subjects": {...}}，
+    只加载和返回请求的部分，例如 ?fields=name,status&include=items,subjects。
+    支持 If-None-Match：该孩子的批次和作业项都没有变化时返回 304
+    """
+    field_set = _parse_csv(fields, _BATCH_FIELDS, "fields")
+    include_set = _parse_csv(include, _BATCH_INCLUDES, "include")
+    sparse = field_set is not None or include_set is not None
+    include_set = include_set or set()
+
+    version = _version_probe(db, child.id)
+    etag = make_etag("batches", child.id, status, limit, offset, fields, include, version, catalog.etag)
+    last_modified = _last_modified(version)
+    if etag_matches(if_none_match, etag):
+        return not_modified(etag, last_modified, private=True)
+
+    query = (
+        db.query(HomeworkBatch)
+        .options(*(_sparse_load_options(include_set) if sparse else [_LOAD_ITEMS]))
+        .filter(HomeworkBatch.child_id == child.id)
+    )
 
     if status:
         query = query.filter(HomeworkBatch.status == status)
@@ -110,23 +209,109 @@ async def get_batches(
 
     batches = query.all()
 
-    # 加载所有科目和作业项
-    subjects = {s.id: s for s in db.query(Subject).all()}
-    all_items = db.query(HomeworkItem).filter(
-        HomeworkItem.batch_id.in_([b.id for b in batches])
-    ).all()
+    if sparse:
+        payload = {"batches": [_sparse_batch(b, field_set, include_set) for b in batches]}
+        if "subjects" in include_set:
+            payload["subjects"] = _side_load_subjects(db, catalog, batches, include_set)
+        return _cached_json(payload, etag, last_modified)
 
-    # 按批次分组 items
-    items_by_batch = {}
-    for item in all_items:
-        if item.batch_id not in items_by_batch:
-            items_by_batch[item.batch_id] = []
-        items_by_batch[item.batch_id].append(item)
+    return _cached_json(
+        [batch_to_response(b, include_items=True) for b in batches], etag, last_modified
+    )
+
+
+def _encode_cursor(batch: HomeworkBatch) -> str:
+    """将 (created_at, id) 编码为不透明游标"""
+    # created_at 按 SQLite 存储格式序列化（秒级时为 "YYYY-MM-DD HH:MM:SS"），
+    # 这样比较时可以直接与数据库中的字符串值对比
+    raw = json.dumps([batch.created_at.isoformat(sep=" "), batch.id])
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
 
-    return [
-        _batch_to_response(b, items_by_batch.get(b.id), subjects)
-        for b in batches
-    ]
+
+def _decode_cursor(cursor: str) -> Tuple[str, int]:
+    """解析游标，返回 (created_at, id)"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        created_at, batch_id = json.loads(raw)
+        return str(created_at), int(batch_id)
+    except (binascii.Error, ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="无效的游标")
+
+
+@router.get("/summary", response_model=BatchSummaryPage)
+async def get_batch_summaries(
+    status: Optional[str] = None,
+    cursor: Optional[str] = None,
+    limit: int = Query(20, ge=1, le=100),
+    child=Depends(get_current_child),
+    if_none_match: Optional[str] = Header(None),
+    db: Session = Depends(get_db),
+):
+    """获取批次摘要列表（游标分页，返回作业计数而非作业项）
+
+    按 (created_at, id) 倒序分页，每页开销与历史数据量无关。
+    返回的 next_cursor 原样传回即可获取下一页，为空表示没有更多数据。
+    支持 If-None-Match：没有变化时返回 304。
+    """
+    version = _version_probe(db, child.id)
+    etag = make_etag("summary", child.id, status, cursor, limit, version)
+    last_modified = _last_modified(version)
+    if etag_matches(if_none_match, etag):
+        return not_modified(etag, last_modified, private=True)
+
+    query = db.query(HomeworkBatch).filter(HomeworkBatch.child_id == child.id)
+
+    if status:
+        query = query.filter(HomeworkBatch.status == status)
+
+    if cursor:
+        cursor_created_at, cursor_id = _decode_cursor(cursor)
+        # 按存储的字符串比较，避免 DateTime 绑定参数带微秒导致同一秒内的数据错位
+        created_at_key = type_coerce(HomeworkBatch.created_at, String)
+        query = query.filter(
+            or_(
+                created_at_key < cursor_created_at,
+                and_(created_at_key == cursor_created_at, HomeworkBatch.id < cursor_id),
+            )
+        )
+
+    # 多取一条用于判断是否还有下一页
+    batches = (
+        query.order_by(HomeworkBatch.created_at.desc(), HomeworkBatch.id.desc())
+        .limit(limit + 1)
+        .all()
+    )
+    has_more = len(batches) > limit
+    batches = batches[:limit]
+
+    # 只统计当前页批次的作业数
+    counts = {}
+    if batches:
+        rows = (
+            db.query(
+                HomeworkItem.batch_id,
+                func.count(HomeworkItem.id),
+                func.sum(case((HomeworkItem.status == "done", 1), else_=0)),
+            )
+            .filter(HomeworkItem.batch_id.in_([b.id for b in batches]))
+            .group_by(HomeworkItem.batch_id)
+            .all()
+        )
+        counts = {batch_id: (total, done or 0) for batch_id, total, done in rows}
+
+    summaries = []
+    for b in batches:
+        item_count, done_count = counts.get(b.id, (0, 0))
+        summaries.append(batch_to_summary(b, item_count, done_count))
+
+    return _cached_json(
+        {
+            "batches": summaries,
+            "next_cursor": _encode_cursor(batches[-1]) if has_more else None,
+        },
+        etag,
+        last_modified,
+    )
 
 
 @router.get("/current", response_model=Optional[HomeworkBatchResponse])
@@ -135,30 +320,46 @@ async def get_current_batch(
 ):
     """获取当前 active 批次"""
     homework_service = get_homework_service()
-    batch = homework_service.get_active_batch(db, child.id)
+    batch = homework_service.get_active_batch(db, child.id, _LOAD_ITEMS)
 
     if not batch:
         return None
 
-    # 加载作业项
-    items = db.query(HomeworkItem).filter(HomeworkItem.batch_id == batch.id).all()
-    subjects = {s.id: s for s in db.query(Subject).all()}
-
-    response = _batch_to_response(batch)
-    response.items = [
-        _item_to_response(item, subjects[item.subject_id]) for item in items
-    ]
-
-    return response
+    return batch_to_response(batch, include_items=True)
 
 
-@router.get("/{batch_id}", response_model=HomeworkBatchResponse)
+@router.get("/{batch_id}", response_model=Union[HomeworkBatchResponse, SparseBatchDetailResponse])
 async def get_batch(
-    batch_id: int, child=Depends(get_current_child), db: Session = Depends(get_db)
+    batch_id: int,
+    fields: Optional[str] = None,
+    include: Optional[str] = None,
+    child=Depends(get_current_child),
+    catalog: SubjectCatalog = Depends(get_subject_catalog),
+    if_none_match: Optional[str] = Header(None),
+    db: Session = Depends(get_db),
 ):
-    """获取批次详情"""
+    """获取批次详情
+
+    指定 fields / include 时返回 {"batch": {...}, "subjects": {...}}，只加载和返回请求的部分。
+    支持 If-None-Match：批次和作业项都没有变化时返回 304，不加载批次数据
+    """
+    field_set = _parse_csv(fields, _BATCH_FIELDS, "fields")
+    include_set = _parse_csv(include, _BATCH_INCLUDES, "include")
+    sparse = field_set is not None or include_set is not None
+    include_set = include_set or set()
+
+    version = _version_probe(db, child.id, batch_id)
+    if not version[0]:
+        raise HTTPException(status_code=404, detail="批次不存在")
+
+    etag = make_etag("batch", batch_id, fields, include, version, catalog.etag)
+    last_modified = _last_modified(version)
+    if etag_matches(if_none_match, etag):
+        return not_modified(etag, last_modified, private=True)
+
     batch = (
         db.query(HomeworkBatch)
+        .options(*(_sparse_load_options(include_set) if sparse else [_LOAD_ITEMS, _LOAD_IMAGES]))
         .filter(HomeworkBatch.id == batch_id, HomeworkBatch.child_id == child.id)
         .first()
     )
@@ -166,63 +367,114 @@ async def get_batch(
     if not batch:
         raise HTTPException(status_code=404, detail="批次不存在")
 
-    # 加载作业项和图片
-    items = db.query(HomeworkItem).filter(HomeworkItem.batch_id == batch.id).all()
-    images = db.query(BatchImage).filter(BatchImage.batch_id == batch.id).all()
-    subjects = {s.id: s for s in db.query(Subject).all()}
+    if sparse:
+        data = _sparse_batch(batch, field_set, include_set)
+        # draft 状态时返回 VLM 解析结果（用于草稿恢复）
+        if "vlm_parse_result" in data and batch.status == "draft" and batch.vlm_parse_result:
+            try:
+                data["vlm_parse_result"] = json.loads(batch.vlm_parse_result)
+            except (json.JSONDecodeError, TypeError):
+                pass
+        payload = {"batch": data}
+        if "subjects" in include_set:
+            payload["subjects"] = _side_load_subjects(db, catalog, [batch], include_set)
+        return _cached_json(payload, etag, last_modified)
 
     # 手动构造响应，避免 vlm_parse_result 类型冲突
-    response = HomeworkBatchResponse(
-        id=batch.id,
-        child_id=batch.child_id,
-        name=batch.name,
-        status=batch.status,
-        deadline_at=batch.deadline_at,
-        completed_at=batch.completed_at,
-        created_at=batch.created_at,
-        updated_at=batch.updated_at,
-        items=[_item_to_response(item, subjects[item.subject_id]) for item in items],
-        images=[_image_to_response(img) for img in images],
-        vlm_parse_result=None  # 先设为 None
-    )
+    result = batch_to_response(batch, include_items=True, include_images=True)
 
     # draft 状态时返回 VLM 解析结果（用于草稿恢复）
     if batch.status == "draft" and batch.vlm_parse_result:
         try:
-            response.vlm_parse_result = json.loads(batch.vlm_parse_result)
+            result["vlm_parse_result"] = json.loads(batch.vlm_parse_result)
         except (json.JSONDecodeError, TypeError):
-            response.vlm_parse_result = None
+            result["vlm_parse_result"] = None
 
-    return response
+    return _cached_json(result, etag, last_modified)
 
 
-@router.get("/{batch_id}/items", response_model=List[HomeworkItemResponse])
-async def get_batch_items(
+@router.get("/{batch_id}/today", response_model=TodayViewResponse)
+async def get_today_view(
     batch_id: int,
-    status: Optional[str] = None,
     child=Depends(get_current_child),
     db: Session = Depends(get_db),
 ):
-    """获取批次的作业项列表"""
-    # 验证批次所有权
+    """今日作业页面数据（批次、分组后的作业项、图片、倒计时、完成标记）
+
+    替代前端分别请求批次详情、作业项和图片。
+    响应含随时间变化的倒计时，因此不做条件请求。
+    """
     batch = (
         db.query(HomeworkBatch)
+        .options(_LOAD_ITEMS, _LOAD_IMAGES)
         .filter(HomeworkBatch.id == batch_id, HomeworkBatch.child_id == child.id)
         .first()
     )
-
     if not batch:
         raise HTTPException(status_code=404, detail="批次不存在")
 
-    query = db.query(HomeworkItem).filter(HomeworkItem.batch_id == batch_id)
+    groups = {"todo": [], "doing": [], "done": []}
+    for item in batch.items:
+        groups.get(item.status, groups["todo"]).append(item_to_response(item))
+
+    images = sorted(
+        batch.images,
+        key=lambda img: (img.image_type != "homework", img.sort_order),
+    )
+
+    now = datetime.utcnow()
+    deadline_remaining_seconds = None
+    if batch.deadline_at:
+        deadline_remaining_seconds = int((batch.deadline_at - now).total_seconds())
+
+    item_count = len(batch.items)
+    done_count = len(groups["done"])
+
+    return ORJSONResponse({
+        "batch": batch_to_summary(batch, item_count, done_count),
+        "items": groups,
+        "images": [image_to_response(img) for img in images],
+        "server_time": now,
+        "deadline_remaining_seconds": deadline_remaining_seconds,
+        "ready_to_complete": batch.status == "active" and item_count > 0 and done_count == item_count,
+    })
+
+
+@router.get("/{batch_id}/items", response_model=List[HomeworkItemResponse])
+async def get_batch_items(
+    batch_id: int,
+    status: Optional[str] = None,
+    child=Depends(get_current_child),
+    catalog: SubjectCatalog = Depends(get_subject_catalog),
+    if_none_match: Optional[str] = Header(None),
+    db: Session = Depends(get_db),
+):
+    """获取批次的作业项列表
+
+    支持 If-None-Match：作业项没有变化时返回 304
+    """
+    # 版本探测同时验证批次所有权
+    version = _version_probe(db, child.id, batch_id)
+    if not version[0]:
+        raise HTTPException(status_code=404, detail="批次不存在")
+
+    etag = make_etag("items", batch_id, status, version, catalog.etag)
+    last_modified = _last_modified(version)
+    if etag_matches(if_none_match, etag):
+        return not_modified(etag, last_modified, private=True)
+
+    query = (
+        db.query(HomeworkItem)
+        .options(joinedload(HomeworkItem.subject))
+        .filter(HomeworkItem.batch_id == batch_id)
+    )
 
     if status:
         query = query.filter(HomeworkItem.status == status)
 
     items = query.order_by(HomeworkItem.created_at).all()
-    subjects = {s.id: s for s in db.query(Subject).all()}
 
-    return [_item_to_response(item, subjects[item.subject_id]) for item in items]
+    return _cached_json([item_to_response(item) for item in items], etag, last_modified)
 
 
 @router.post("/{batch_id}/items", response_model=HomeworkItemResponse)
@@ -230,6 +482,7 @@ async def create_item(
     batch_id: int,
     data: HomeworkItemCreate,
     child=Depends(get_current_child),
+    catalog: SubjectCatalog = Depends(get_subject_catalog),
     db: Session = Depends(get_db),
 ):
     """向批次添加作业项"""
@@ -244,24 +497,28 @@ async def create_item(
         raise HTTPException(status_code=404, detail="批次不存在")
 
     # 验证科目
-    subject = db.query(Subject).filter(Subject.id == data.subject_id).first()
-    if not subject:
+    if data.subject_id not in catalog:
         raise HTTPException(status_code=404, detail="科目不存在")
+    subject = catalog.bind(db, [data.subject_id])[data.subject_id]
 
     item = HomeworkItem(
         batch_id=batch_id,
-        subject_id=data.subject_id,
+        subject=subject,
         text=data.text,
         key_concept=data.key_concept,
         source_image_id=data.source_image_id,
         status="todo",
     )
 
+    # INSERT ... RETURNING 取回 id 和时间戳，响应直接由内存对象构建
     db.add(item)
+    # 新作业项的时间戳只精确到秒，同时更新批次时间，保证 ETag 变化
+    batch.updated_at = datetime.utcnow()
+    db.flush()
+    queue_event(db, child.id, "item.created", item_id=item.id, batch_id=batch_id)
     db.commit()
-    db.refresh(item)
 
-    return _item_to_response(item, subject)
+    return item_to_response(item)
 
 
 @router.patch("/{batch_id}/status")
@@ -284,50 +541,30 @@ async def update_batch_status(
     if data.status not in ["draft", "active", "completed"]:
         raise HTTPException(status_code=400, detail="无效的状态")
 
-    if data.status == "active":
-        homework_service = get_homework_service()
-        homework_service.activate_batch(db, batch_id)
-    elif data.status == "completed":
-        batch.status = "completed"
-        batch.completed_at = datetime.utcnow()
-    else:
-        batch.status = data.status
+    homework_service = get_homework_service()
+    try:
+        homework_service.transition_batch(db, batch, data.status)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
     db.commit()
-    db.refresh(batch)
 
-    return {"success": True, "data": _batch_to_response(batch)}
+    # 没有 response_model，直接用 orjson 输出，时间格式与其他接口一致
+    return ORJSONResponse({"success": True, "data": batch_to_response(batch)})
 
 
 @router.delete("/{batch_id}")
 async def delete_batch(
     batch_id: int, child=Depends(get_current_child), db: Session = Depends(get_db)
 ):
-    """删除批次"""
-    batch = (
-        db.query(HomeworkBatch)
-        .filter(HomeworkBatch.id == batch_id, HomeworkBatch.child_id == child.id)
-        .first()
-    )
+    """
+    删除批次
 
-    if not batch:
+    只标记删除（一条条件 UPDATE），批次立即从所有查询中消失；
+    作业项和图片记录由后台批量删除，图片文件只减少引用数，由存储清理回收
+    """
+    if not mark_batches_deleted(db, HomeworkBatch.id == batch_id, HomeworkBatch.child_id == child.id):
         raise HTTPException(status_code=404, detail="批次不存在")
-
-    # 删除关联的图片文件
-    images = db.query(BatchImage).filter(BatchImage.batch_id == batch_id).all()
-    for img in images:
-        import os
-
-        file_path = f"data/uploads/{img.file_path}"
-        if os.path.exists(file_path):
-            os.remove(file_path)
-
-    # 删除数据库中的 BatchImage 记录
-    for img in images:
-        db.delete(img)
-
-    # 删除数据库记录（级联删除会处理 items）
-    db.delete(batch)
     db.commit()
 
     return {"success": True, "message": "批次已删除"}
@@ -352,13 +589,13 @@ async def complete_batch(
     if batch.status != "active":
         raise HTTPException(status_code=400, detail="只能完成进行中的批次")
 
-    # 检查是否所有作业都已完成
+    # 检查所有作业都已完成与状态变更在同一条条件 UPDATE 中完成
     homework_service = get_homework_service()
-    if not homework_service.check_batch_completion(db, batch.id):
-        raise HTTPException(status_code=400, detail="还有作业未完成")
+    try:
+        homework_service.transition_batch(db, batch, "completed", require_all_done=True)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
-    batch.status = "completed"
-    batch.completed_at = datetime.utcnow()
     db.commit()
 
     return {"success": True}
@@ -369,6 +606,7 @@ async def update_batch(
     batch_id: int,
     data: BatchUpdate,
     child=Depends(get_current_child),
+    catalog: SubjectCatalog = Depends(get_subject_catalog),
     db: Session = Depends(get_db),
 ):
     """更新批次信息（名称、截止时间、作业项）
@@ -378,9 +616,10 @@ async def update_batch(
     - 无 id 的项：新建
     - 原有项不在新列表中：删除
     """
-    # 验证批次所有权
+    # 验证批次所有权（同时加载作业项和图片，响应直接由内存构建）
     batch = (
         db.query(HomeworkBatch)
+        .options(_LOAD_ITEMS, _LOAD_IMAGES)
         .filter(HomeworkBatch.id == batch_id, HomeworkBatch.child_id == child.id)
         .first()
     )
@@ -396,78 +635,18 @@ async def update_batch(
 
     # 更新作业项（完全替换）
     if data.items is not None:
-        # 获取现有作业项
-        existing_items = db.query(HomeworkItem).filter(
-            HomeworkItem.batch_id == batch_id
-        ).all()
-        existing_item_ids = {item.id for item in existing_items}
-
-        # 前端发送的作业项 ID 集合
-        request_item_ids = {
-            item.id for item in data.items if item.id is not None
-        }
-
-        # 删除不在新列表中的作业项
-        items_to_delete = existing_item_ids - request_item_ids
-        if items_to_delete:
-            db.query(HomeworkItem).filter(
-                HomeworkItem.id.in_(items_to_delete)
-            ).delete(synchronize_session=False)
-
-        # 获取所有科目
-        subjects = {s.id: s for s in db.query(Subject).all()}
-
-        # 处理新列表中的作业项
+        # 先校验科目
         for item_data in data.items:
-            if item_data.id:
-                # 更新现有作业项
-                item = next((i for i in existing_items if i.id == item_data.id), None)
-                if item:
-                    if item_data.subject_id != item.subject_id:
-                        if item_data.subject_id not in subjects:
-                            raise HTTPException(status_code=404, detail=f"科目 {item_data.subject_id} 不存在")
-                        item.subject_id = item_data.subject_id
-                    if item_data.text is not None:
-                        item.text = item_data.text
-                    if item_data.key_concept is not None:
-                        item.key_concept = item_data.key_concept
-                    if item_data.source_image_id is not None:
-                        item.source_image_id = item_data.source_image_id
-            else:
-                # 创建新作业项
-                if item_data.subject_id not in subjects:
-                    raise HTTPException(status_code=404, detail=f"科目 {item_data.subject_id} 不存在")
-
-                new_item = HomeworkItem(
-                    batch_id=batch_id,
-                    subject_id=item_data.subject_id,
-                    text=item_data.text,
-                    key_concept=item_data.key_concept,
-                    source_image_id=item_data.source_image_id,
-                    status="todo",
-                )
-                db.add(new_item)
+            if item_data.subject_id not in catalog:
+                raise HTTPException(status_code=404, detail=f"科目 {item_data.subject_id} 不存在")
+        subjects = catalog.bind(db, [item_data.subject_id for item_data in data.items])
+
+        homework_service = get_homework_service()
+        homework_service.sync_items(db, batch, data.items, subjects)
 
     # 更新时间戳
     batch.updated_at = datetime.utcnow()
+    queue_event(db, child.id, "batch.updated", batch_id=batch_id)
     db.commit()
-    db.refresh(batch)
-
-    # 重新加载并返回响应
-    items = db.query(HomeworkItem).filter(HomeworkItem.batch_id == batch.id).all()
-    images = db.query(BatchImage).filter(BatchImage.batch_id == batch.id).all()
-    subjects = {s.id: s for s in db.query(Subject).all()}
-
-    return HomeworkBatchResponse(
-        id=batch.id,
-        child_id=batch.child_id,
-        name=batch.name,
-        status=batch.status,
-        deadline_at=batch.deadline_at,
-        completed_at=batch.completed_at,
-        created_at=batch.created_at,
-        updated_at=batch.updated_at,
-        items=[_item_to_response(item, subjects[item.subject_id]) for item in items],
-        images=[_image_to_response(img) for img in images],
-        vlm_parse_result=None
-    )
+
+    return batch_to_response(batch, include_items=True, include_images=True)
@@ -0,0 +1,68 @@
+"""
+实时推送 API（Server-Sent Events）
+"""
+import orjson
+from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi.responses import StreamingResponse
+
+from backend.config import settings
+from backend.api.deps import get_stream_child
+from backend.services.event_bus import Event, get_event_bus
+
+router = APIRouter(prefix="/api/events", tags=["events"])
+
+
+def _format_event(evt: Event) -> bytes:
+    """按 SSE 格式编码一条事件"""
+    data = orjson.dumps(evt.data)
+    return b"id: %d\nevent: %s\ndata: %s\n\n" % (evt.id, evt.type.encode(), data)
+
+
+@router.get("")
+async def stream_events(request: Request, child=Depends(get_stream_child)):
+    """
+    订阅当前孩子的实时事件（text/event-stream）
+
+    - 事件类型：item.status / item.created / item.updated / item.deleted /
+      batch.status / batch.updated / batch.deleted / vlm.started / vlm.finished
+    - resync：积压过多被丢弃，客户端应调用 /api/sync 或重新加载数据
+    - 空闲时每 EVENT_HEARTBEAT 秒发送一行注释作为心跳
+    - EventSource 无法设置请求头，访问令牌可放在查询参数 token 中
+    """
+    bus = get_event_bus()
+    # 连接数超限时直接返回 429；真正的订阅在开始发送后才创建（见 event_stream）
+    try:
+        bus.check_capacity(child.id)
+    except ValueError as e:
+        raise HTTPException(status_code=429, detail=str(e))
+
+    async def event_stream():
+        # 订阅与取消订阅都在生成器内：客户端在开始读取前断开时生成器不会运行，也就不会留下订阅；
+        # 一旦订阅，生成器关闭（断开、取消）时 finally 一定执行
+        try:
+            subscription = bus.subscribe(child.id)
+        except ValueError as e:
+            # 检查之后被其他连接占满（响应头已发送，只能以事件告知）
+            yield b"event: error\ndata: %s\n\n" % orjson.dumps({"detail": str(e)})
+            return
+        try:
+            # 断线后 3 秒重连
+            yield b"retry: 3000\n\n"
+            while not await request.is_disconnected():
+                events = await subscription.next_batch(settings.EVENT_HEARTBEAT)
+                if not events:
+                    yield b": ping\n\n"
+                    continue
+                yield b"".join(_format_event(evt) for evt in events)
+        finally:
+            bus.unsubscribe(subscription)
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            # 关闭 Nginx 代理缓冲，事件立即送达
+            "X-Accel-Buffering": "no",
+        },
+    )
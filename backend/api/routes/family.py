@@ -9,7 +9,8 @@ from sqlalchemy.orm import Session
 from backend.database import get_db
 from backend.models import Family, Child
 from backend.schemas import FamilyCreate, FamilyResponse, ChildResponse
-from backend.api.deps import get_current_family
+from backend.api.deps import get_current_family, get_current_child
+from backend.core.auth_cache import ChildSnapshot, FamilySnapshot
 
 router = APIRouter(prefix="/api/family", tags=["family"])
 
@@ -47,21 +48,24 @@ async def create_family(
     db.add(child)
 
     db.commit()
-    db.refresh(family)
 
-    response = FamilyResponse.model_validate(family)
-    response.child = ChildResponse.model_validate(child)
-    return response
+    return FamilyResponse(
+        id=family.id,
+        name=family.name,
+        access_token=family.access_token,
+        child=ChildResponse.model_validate(child),
+    )
 
 
 @router.get("/current", response_model=FamilyResponse)
 async def get_current_family_info(
-    family: Family = Depends(get_current_family),
-    db: Session = Depends(get_db)
+    family: FamilySnapshot = Depends(get_current_family),
+    child: ChildSnapshot = Depends(get_current_child),
 ):
-    """获取当前家庭信息"""
-    child = db.query(Child).filter(Child.family_id == family.id).first()
-
-    response = FamilyResponse.model_validate(family)
-    response.child = ChildResponse.model_validate(child)
-    return response
+    """获取当前家庭信息（直接来自认证缓存，不再查库）"""
+    return FamilyResponse(
+        id=family.id,
+        name=family.name,
+        access_token=family.access_token,
+        child=ChildResponse.model_validate(child),
+    )
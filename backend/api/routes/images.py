@@ -0,0 +1,108 @@
+"""
+图片 API（派生尺寸；对象存储或 X-Accel-Redirect 时的原图地址）
+"""
+from typing import Optional
+from urllib.parse import quote
+
+from fastapi import APIRouter, Depends, HTTPException, Path as PathParam
+from fastapi.responses import FileResponse, RedirectResponse, Response
+from sqlalchemy.orm import Session
+
+from backend.api.deps import get_media_family
+from backend.config import settings
+from backend.core.auth_cache import FamilySnapshot
+from backend.core.static_files import IMMUTABLE_CACHE_CONTROL
+from backend.core.storage import get_storage
+from backend.database import get_db
+from backend.services.image_store import get_image_store
+from backend.services.image_variants import VARIANTS, get_image_variant_service
+
+router = APIRouter(prefix="/api/images", tags=["images"])
+
+# 存储后端不是本地目录、或需要检查权限时代替 /uploads 静态目录（见 main.py）
+uploads_router = APIRouter(prefix="/uploads", tags=["images"])
+
+
+def object_response(key: str, media_type: Optional[str] = None) -> Response:
+    """
+    返回存储中的对象
+
+    对象存储时重定向到预签名（或公开）地址，由客户端直接下载，应用进程不转发图片字节；
+    重定向本身可以缓存到地址过期前。
+
+    accel 模式下只返回 X-Accel-Redirect 头，由 Nginx 从 internal location 直接发送文件
+    （sendfile，并处理 Range、If-Modified-Since），应用不读文件。
+    """
+    storage = get_storage()
+    accel = settings.UPLOAD_SERVE_MODE == "accel"
+    # 检查了权限的图片只允许浏览器私有缓存，不能被共享缓存（CDN、代理）保存后发给其他人
+    cache_control = IMMUTABLE_CACHE_CONTROL.replace("public", "private") if accel else IMMUTABLE_CACHE_CONTROL
+
+    url = storage.url(key)
+    if url is not None:
+        return RedirectResponse(
+            url,
+            status_code=307,
+            headers={"cache-control": f"{'private' if accel else 'public'}, max-age={storage.url_max_age}"},
+        )
+
+    if accel:
+        # Content-Type 由 Nginx 按扩展名设置，Cache-Control 会原样保留
+        return Response(
+            headers={
+                "x-accel-redirect": f"{settings.UPLOAD_ACCEL_PREFIX}{quote(key)}",
+                "cache-control": cache_control,
+            }
+        )
+
+    path = storage.local_file(key)
+    if path is None or not path.is_file():
+        raise HTTPException(status_code=404, detail="图片不存在")
+    return FileResponse(path, media_type=media_type, headers={"cache-control": cache_control})
+
+
+@router.get("/{sha256}/{variant}.webp")
+async def get_image_variant(
+    sha256: str = PathParam(pattern=r"^[0-9a-f]{64}$"),
+    variant: str = PathParam(),
+    family: Optional[FamilySnapshot] = Depends(get_media_family),
+    db: Session = Depends(get_db),
+):
+    """
+    获取图片的派生尺寸（WebP），尚未生成时当场生成
+
+    与 /uploads 下的原图一样：默认不需要令牌，URL 中的 sha256 不可猜测；
+    accel 模式下只有引用了原图的家庭可以访问。
+    内容由原图决定、不会变化，按不可变资源缓存
+
+    Args:
+        sha256: 原图内容摘要
+        variant: 尺寸名（thumb / medium）
+    """
+    if variant not in VARIANTS:
+        raise HTTPException(status_code=404, detail="图片尺寸不存在")
+    # 无权访问与不存在返回同样的结果，不透露其他家庭的图片是否存在
+    if family is not None and not get_image_store().family_can_read(db, family.id, sha256=sha256):
+        raise HTTPException(status_code=404, detail="图片不存在")
+
+    key = await get_image_variant_service().get(db, sha256, variant)
+    if key is None:
+        raise HTTPException(status_code=404, detail="图片不存在")
+
+    return object_response(key, media_type="image/webp")
+
+
+@uploads_router.get("/{file_path:path}")
+async def get_upload(
+    file_path: str,
+    family: Optional[FamilySnapshot] = Depends(get_media_family),
+    db: Session = Depends(get_db),
+):
+    """
+    原图地址（存储后端为对象存储，或 accel 模式时）
+
+    API 返回的图片地址保持 /uploads/... 不变；accel 模式下先检查图片属于当前家庭
+    """
+    if family is not None and not get_image_store().family_can_read(db, family.id, file_path=file_path):
+        raise HTTPException(status_code=404, detail="图片不存在")
+    return object_response(file_path)
@@ -2,55 +2,33 @@
 作业项管理 API
 """
 from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+from sqlalchemy.orm import Session, contains_eager, joinedload
 from datetime import datetime
 
 from backend.database import get_db
-from backend.models import HomeworkItem, HomeworkBatch, Subject
-from backend.api.deps import get_current_child
+from backend.models import HomeworkItem, HomeworkBatch
+from backend.api.deps import get_current_child, get_subject_catalog
+from backend.api.serializers import item_to_response
+from backend.services.event_bus import queue_event
+from backend.services.subject_catalog import SubjectCatalog
 from backend.schemas import HomeworkItemResponse, HomeworkItemUpdate, HomeworkItemStatusUpdate, HomeworkItemStatusResponse
 
 router = APIRouter(prefix="/api/items", tags=["items"])
 
 
-def _subject_response_dict(subject: Subject) -> dict:
-    """科目转字典"""
-    return {
-        "id": subject.id,
-        "name": subject.name,
-        "color": subject.color,
-        "sort_order": subject.sort_order
-    }
-
-
-def _item_to_response(item: HomeworkItem, subject: Subject) -> HomeworkItemResponse:
-    """作业项转响应"""
-    return HomeworkItemResponse(
-        id=item.id,
-        batch_id=item.batch_id,
-        source_image_id=item.source_image_id,
-        subject=_subject_response_dict(subject),
-        text=item.text,
-        key_concept=item.key_concept,
-        status=item.status,
-        started_at=item.started_at,
-        finished_at=item.finished_at,
-        created_at=item.created_at,
-    )
-
-
 @router.put("/{item_id}", response_model=HomeworkItemResponse)
 async def update_item(
     item_id: int,
     data: HomeworkItemUpdate,
     child=Depends(get_current_child),
+    catalog: SubjectCatalog = Depends(get_subject_catalog),
     db: Session = Depends(get_db)
 ):
     """更新作业项"""
-    # 通过 batch 验证所有权
-    item = db.query(HomeworkItem).join(
-        HomeworkBatch,
-        HomeworkItem.batch_id == HomeworkBatch.id
+    # 通过 batch 验证所有权（批次和科目随作业项一并加载）
+    item = db.query(HomeworkItem).join(HomeworkItem.batch).options(
+        contains_eager(HomeworkItem.batch),
+        joinedload(HomeworkItem.subject),
     ).filter(
         HomeworkItem.id == item_id,
         HomeworkBatch.child_id == child.id
@@ -60,19 +38,20 @@ async def update_item(
         raise HTTPException(status_code=404, detail="作业项不存在")
 
     # 更新字段
-    if data.subject_id is not None:
-        item.subject_id = data.subject_id
+    if data.subject_id is not None and data.subject_id != item.subject_id:
+        if data.subject_id not in catalog:
+            raise HTTPException(status_code=404, detail="科目不存在")
+        item.subject = catalog.bind(db, [data.subject_id])[data.subject_id]
     if data.text is not None:
         item.text = data.text
     if data.key_concept is not None:
         item.key_concept = data.key_concept
 
     item.updated_at = datetime.utcnow()
+    queue_event(db, child.id, "item.updated", item_id=item.id, batch_id=item.batch_id)
     db.commit()
-    db.refresh(item)
 
-    subject = db.query(Subject).filter(Subject.id == item.subject_id).first()
-    return _item_to_response(item, subject)
+    return item_to_response(item)
 
 
 @router.patch("/{item_id}/status", response_model=HomeworkItemStatusResponse)
@@ -86,10 +65,10 @@ async def update_item_status(
     if data.status not in ["todo", "doing", "done"]:
         raise HTTPException(status_code=400, detail="无效的状态")
 
-    # 通过 batch 验证所有权
-    item = db.query(HomeworkItem).join(
-        HomeworkBatch,
-        HomeworkItem.batch_id == HomeworkBatch.id
+    # 通过 batch 验证所有权（批次和科目随作业项一并加载）
+    item = db.query(HomeworkItem).join(HomeworkItem.batch).options(
+        contains_eager(HomeworkItem.batch),
+        joinedload(HomeworkItem.subject),
     ).filter(
         HomeworkItem.id == item_id,
         HomeworkBatch.child_id == child.id
@@ -110,22 +89,24 @@ async def update_item_status(
         item.started_at = None
         item.finished_at = None
 
+    queue_event(
+        db, child.id, "item.status",
+        item_id=item.id, batch_id=item.batch_id, status=item.status,
+    )
     db.commit()
-    db.refresh(item)
 
     # 检查批次是否已准备好完成（全部 done 但还未 completed）
     from backend.services.homework_service import get_homework_service
     homework_service = get_homework_service()
-    batch = db.query(HomeworkBatch).filter(HomeworkBatch.id == item.batch_id).first()
+    batch = item.batch
 
     batch_ready_to_complete = False
     if batch and batch.status == 'active':
         # 检查是否所有作业都已完成，但不自动更新批次状态
         batch_ready_to_complete = homework_service.check_batch_completion(db, batch.id)
 
-    subject = db.query(Subject).filter(Subject.id == item.subject_id).first()
     return HomeworkItemStatusResponse(
-        item=_item_to_response(item, subject),
+        item=item_to_response(item),
         batch_ready_to_complete=batch_ready_to_complete
     )
 
@@ -137,10 +118,10 @@ async def delete_item(
     db: Session = Depends(get_db)
 ):
     """删除作业项"""
-    # 通过 batch 验证所有权
-    item = db.query(HomeworkItem).join(
-        HomeworkBatch,
-        HomeworkItem.batch_id == HomeworkBatch.id
+    # 通过 batch 验证所有权（批次和科目随作业项一并加载）
+    item = db.query(HomeworkItem).join(HomeworkItem.batch).options(
+        contains_eager(HomeworkItem.batch),
+        joinedload(HomeworkItem.subject),
     ).filter(
         HomeworkItem.id == item_id,
         HomeworkBatch.child_id == child.id
@@ -149,6 +130,9 @@ async def delete_item(
     if not item:
         raise HTTPException(status_code=404, detail="作业项不存在")
 
+    # 删除作业项同时更新批次时间，保证批次 ETag 变化
+    item.batch.updated_at = datetime.utcnow()
+    queue_event(db, child.id, "item.deleted", item_id=item.id, batch_id=item.batch_id)
     db.delete(item)
     db.commit()
 
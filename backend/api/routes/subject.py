@@ -1,21 +1,30 @@
 """
 科目相关 API
 """
-from fastapi import APIRouter, Depends
-from sqlalchemy.orm import Session
-from typing import List
+from fastapi import APIRouter, Depends, Header, Response
+from typing import List, Optional
 
-from backend.database import get_db
-from backend.models import Subject
 from backend.schemas import SubjectResponse
+from backend.api.deps import get_subject_catalog
+from backend.api.serializers import subject_to_response
+from backend.api.http_cache import etag_matches, not_modified, set_validators
+from backend.services.subject_catalog import SubjectCatalog
 
 router = APIRouter(prefix="/api/subjects", tags=["subjects"])
 
 
 @router.get("", response_model=List[SubjectResponse])
 async def get_subjects(
-    db: Session = Depends(get_db)
+    response: Response,
+    catalog: SubjectCatalog = Depends(get_subject_catalog),
+    if_none_match: Optional[str] = Header(None),
 ):
-    """获取所有科目列表（系统预定义，所有家庭共享）"""
-    subjects = db.query(Subject).order_by(Subject.sort_order).all()
-    return subjects
+    """获取所有科目列表（系统预定义，所有家庭共享）
+
+    支持 If-None-Match：科目未变化时返回 304
+    """
+    if etag_matches(if_none_match, catalog.etag):
+        return not_modified(catalog.etag)
+
+    set_validators(response, catalog.etag)
+    return [subject_to_response(s) for s in catalog.subjects]
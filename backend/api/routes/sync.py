@@ -0,0 +1,44 @@
+"""
+增量同步 API
+"""
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy.orm import Session
+
+from backend.database import get_db
+from backend.schemas import SyncResponse
+from backend.api.deps import get_current_child
+from backend.api.serializers import (
+    ORJSONResponse,
+    batch_to_record,
+    image_to_response,
+    item_to_slim_response,
+)
+from backend.services.sync_service import get_sync_service
+
+router = APIRouter(prefix="/api/sync", tags=["sync"])
+
+
+@router.get("", response_model=SyncResponse)
+async def sync_changes(
+    since: int = Query(0, ge=0, description="上次同步返回的 cursor，0 表示全量"),
+    limit: int = Query(500, ge=1, le=2000, description="每页最多变更数"),
+    child=Depends(get_current_child),
+    db: Session = Depends(get_db),
+):
+    """
+    获取游标之后新增、修改、删除的批次、作业项和图片
+
+    - 每个实体最多出现一次，内容为当前最新状态
+    - deleted 中是已删除实体的ID；批次被删除时，其作业项和图片也应一并删除
+    - has_more 为 True 时用返回的 cursor 继续请求，直到取完
+    """
+    changes = get_sync_service().changes_since(db, child.id, since, limit)
+
+    return ORJSONResponse({
+        "cursor": changes.cursor,
+        "has_more": changes.has_more,
+        "batches": [batch_to_record(batch) for batch in changes.batches],
+        "items": [item_to_slim_response(item) for item in changes.items],
+        "images": [image_to_response(img) for img in changes.images],
+        "deleted": changes.deleted,
+    })
@@ -2,23 +2,26 @@
 图片上传与批次管理 API
 """
 
+from datetime import datetime
+
 from fastapi import APIRouter, Depends, UploadFile, Form, HTTPException
-from sqlalchemy.orm import Session
+from sqlalchemy.orm import Session, selectinload
 from typing import List
-import os
-import uuid
 
 from backend.database import get_db
-from backend.models import HomeworkBatch, BatchImage, HomeworkItem, Subject
+from backend.models import HomeworkBatch, BatchImage, HomeworkItem
 from backend.services.ocr_service import get_ocr_service
 from backend.services.llm_service import get_llm_service
 from backend.services.homework_service import get_homework_service
-from backend.api.deps import get_current_child
+from backend.api.deps import get_current_child, get_subject_catalog
+from backend.services.image_store import get_image_store
+from backend.services.image_variants import get_image_variant_service
+from backend.api.serializers import batch_to_response, image_to_response, item_to_response
+from backend.services.subject_catalog import SubjectCatalog
 from backend.schemas import (
     UploadDraftResponse,
     DraftBatchInfo,
     BatchImageResponse,
-    HomeworkItemResponse,
     HomeworkBatchResponse,
     DraftConfirmRequest,
     ParsedHomeworkItem,
@@ -28,39 +31,6 @@ from backend.config import settings
 router = APIRouter(prefix="/api/upload", tags=["upload"])
 
 
-def _batch_image_to_response(img: BatchImage) -> BatchImageResponse:
-    """转换批次图片为响应格式"""
-    response = BatchImageResponse.model_validate(img)
-    response.file_path = f"{settings.BASE_URL}/uploads/{img.file_path}"  # type: ignore
-    return response
-
-
-def _subject_response_dict(subject: Subject) -> dict:
-    """科目转字典"""
-    return {
-        "id": subject.id,
-        "name": subject.name,
-        "color": subject.color,
-        "sort_order": subject.sort_order,
-    }
-
-
-def _item_to_response(item: HomeworkItem, subject: Subject) -> HomeworkItemResponse:
-    """作业项转响应"""
-    return HomeworkItemResponse(
-        id=item.id,
-        batch_id=item.batch_id,
-        source_image_id=item.source_image_id,
-        subject=_subject_response_dict(subject),
-        text=item.text,
-        key_concept=item.key_concept,
-        status=item.status,
-        started_at=item.started_at,
-        finished_at=item.finished_at,
-        created_at=item.created_at,
-    )
-
-
 @router.post("/draft", response_model=UploadDraftResponse)
 async def upload_draft_batch(
     files: List[UploadFile],
@@ -81,44 +51,37 @@ async def upload_draft_batch(
 
     homework_service = get_homework_service()
     ocr_service = get_ocr_service()
+    image_store = get_image_store()
+
+    # 保存图片，不符合要求的图片跳过；已有相同内容时不写磁盘
+    stored = await image_store.save_all(files)
+    if not stored:
+        raise HTTPException(
+            status_code=400,
+            detail=f"没有可用的图片（支持 JPG、PNG、WebP，单张不超过 {settings.MAX_UPLOAD_SIZE // (1024 * 1024)}MB）",
+        )
 
     # 创建 draft 批次
     batch = homework_service.create_draft_batch(db, child.id)
+    image_store.register(db, (image for _, _, image in stored))
 
     # 处理每张图片
     uploaded_images = []
     all_ocr_text = []
 
-    for i, file in enumerate(files):
-        # 验证文件类型
-        allowed_types = ["image/jpeg", "image/jpg", "image/png", "image/webp"]
-        if file.content_type not in allowed_types:
-            continue
-
-        # 读取文件
-        content = await file.read()
-        if len(content) > settings.MAX_UPLOAD_SIZE:
-            continue
-
-        # 保存图片
-        file_ext = os.path.splitext(file.filename)[1]
-        filename = f"{uuid.uuid4()}{file_ext}"
-        file_path = settings.UPLOAD_DIR / filename
-
-        with open(file_path, "wb") as f:
-            f.write(content)
-
+    for i, file, image in stored:
         # OCR 识别
-        ocr_result = ocr_service.recognize_image(str(file_path))
+        with image_store.local_path(image.file_path) as path:
+            ocr_result = ocr_service.recognize_image(str(path))
         if ocr_result.success:
             all_ocr_text.append(ocr_result.text)
 
         # 创建图片记录
         batch_image = BatchImage(
             batch_id=batch.id,
-            file_path=filename,
+            file_path=image.file_path,
             file_name=file.filename,
-            file_size=len(content),
+            file_size=image.info.size,
             sort_order=i,
             image_type="homework",  # 默认为作业清单类型
             raw_ocr_text=ocr_result.text,
@@ -131,12 +94,18 @@ async def upload_draft_batch(
     db.flush()
 
     # 构建 response
-    image_responses = [_batch_image_to_response(img) for img in uploaded_images]
+    image_responses = [image_to_response(img) for img in uploaded_images]
 
     # 合并 OCR 文本
     merged_ocr_text = "\n\n".join(all_ocr_text) if all_ocr_text else None
 
     db.commit()
+    await image_store.ensure_saved(stored)
+
+    # 后台生成缩略图
+    variant_service = get_image_variant_service()
+    for _, _, image in stored:
+        variant_service.schedule(image)
 
     return UploadDraftResponse(
         success=True,
@@ -152,6 +121,7 @@ async def upload_draft_batch(
 async def parse_ocr_text(
     batch_id: int = Form(...),
     child=Depends(get_current_child),
+    catalog: SubjectCatalog = Depends(get_subject_catalog),
     db: Session = Depends(get_db),
 ):
     """
@@ -188,8 +158,7 @@ async def parse_ocr_text(
         return []
 
     # 获取科目列表
-    subjects = db.query(Subject).all()
-    subject_dicts = [{"id": s.id, "name": s.name} for s in subjects]
+    subject_dicts = catalog.as_dicts()
 
     # 使用 LLM 服务解析
     llm_service = get_llm_service()
@@ -212,6 +181,7 @@ async def confirm_draft_batch(
     batch_id: int,
     data: DraftConfirmRequest,
     child=Depends(get_current_child),
+    catalog: SubjectCatalog = Depends(get_subject_catalog),
     db: Session = Depends(get_db),
 ):
     """
@@ -224,9 +194,13 @@ async def confirm_draft_batch(
     Returns:
         激活后的批次
     """
-    # 验证批次所有权
+    # 验证批次所有权（同时加载作业项和图片，响应直接由内存构建）
     batch = (
         db.query(HomeworkBatch)
+        .options(
+            selectinload(HomeworkBatch.items).joinedload(HomeworkItem.subject),
+            selectinload(HomeworkBatch.images),
+        )
         .filter(HomeworkBatch.id == batch_id, HomeworkBatch.child_id == child.id)
         .first()
     )
@@ -238,50 +212,29 @@ async def confirm_draft_batch(
         raise HTTPException(status_code=400, detail="只能确认 draft 状态的批次")
 
     # 获取科目
-    subjects = db.query(Subject).all()
-    subject_map = {s.id: s for s in subjects}
-
-    # 创建作业项
     for item_data in data.items:
-        item = HomeworkItem(
-            batch_id=batch.id,
-            subject_id=item_data.subject_id,
-            text=item_data.text,
-            key_concept=item_data.key_concept,
-            source_image_id=item_data.source_image_id,
-            status="todo",
-        )
-        db.add(item)
+        if item_data.subject_id not in catalog:
+            raise HTTPException(status_code=404, detail=f"科目 {item_data.subject_id} 不存在")
+
+    # 批量创建作业项
+    homework_service = get_homework_service()
+    subject_map = catalog.bind(db, [item_data.subject_id for item_data in data.items])
+    homework_service.add_items(db, batch, data.items, subject_map)
 
     # 设置截止时间
     if data.deadline_at:
         batch.deadline_at = data.deadline_at
 
     # 激活批次
-    homework_service = get_homework_service()
-    homework_service.activate_batch(db, batch_id)
+    try:
+        homework_service.activate_batch(db, batch_id)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
     db.commit()
-    db.refresh(batch)
-
-    # 构建响应
-    items = db.query(HomeworkItem).filter(HomeworkItem.batch_id == batch_id).all()
-    images = db.query(BatchImage).filter(BatchImage.batch_id == batch_id).all()
-
-    response = HomeworkBatchResponse(
-        id=batch.id,
-        child_id=batch.child_id,
-        name=batch.name,
-        status=batch.status,
-        deadline_at=batch.deadline_at,
-        completed_at=batch.completed_at,
-        created_at=batch.created_at,
-        updated_at=batch.updated_at,
-        items=[_item_to_response(item, subject_map[item.subject_id]) for item in items],
-        images=[_batch_image_to_response(img) for img in images],
-        vlm_parse_result=None
-    )
-    return response
+
+    # 构建响应（直接由内存对象构建）
+    return batch_to_response(batch, include_items=True, include_images=True)
 
 
 @router.get("/{batch_id}/images", response_model=List[BatchImageResponse])
@@ -306,7 +259,7 @@ async def get_batch_images(
         .all()
     )
 
-    return [_batch_image_to_response(img) for img in images]
+    return [image_to_response(img) for img in images]
 
 
 @router.patch("/{batch_id}/images/{image_id}/type")
@@ -352,9 +305,11 @@ async def update_image_type(
         raise HTTPException(status_code=404, detail="图片不存在")
 
     image.image_type = image_type
+    # 图片没有 updated_at，更新批次的修改时间，批次详情的 ETag 随之变化
+    batch.updated_at = datetime.utcnow()
     db.commit()
 
-    return _batch_image_to_response(image)
+    return image_to_response(image)
 
 
 @router.post("/retry/{image_id}", response_model=BatchImageResponse)
@@ -388,16 +343,15 @@ async def retry_ocr(
 
     # 重试 OCR
     ocr_service = get_ocr_service()
-    file_path = settings.UPLOAD_DIR / image.file_path
-
-    ocr_result = ocr_service.recognize_image(str(file_path))
+    with get_image_store().local_path(image.file_path) as file_path:
+        ocr_result = ocr_service.recognize_image(str(file_path))
 
     # 更新图片记录
     image.raw_ocr_text = ocr_result.text
     image.ocr_status = "success" if ocr_result.success else "failed"
     image.ocr_error = ocr_result.error
+    batch.updated_at = datetime.utcnow()
 
     db.commit()
-    db.refresh(image)
 
-    return _batch_image_to_response(image)
+    return image_to_response(image)
@@ -3,78 +3,151 @@ V1 版本图片上传与批次管理 API
 使用 VLM（视觉语言模型）替代传统 OCR
 """
 import json
-import os
-import uuid
-from typing import List, Optional
+from contextlib import ExitStack
+from datetime import datetime
+from typing import List, Optional, Tuple
 
-from fastapi import APIRouter, Depends, UploadFile, Form, HTTPException
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, File, UploadFile, Form, HTTPException
+from loguru import logger
+from pydantic import TypeAdapter, ValidationError
+from sqlalchemy.orm import Session, selectinload
+from starlette.concurrency import run_in_threadpool
 
 from backend.database import get_db
-from backend.models import HomeworkBatch, BatchImage, HomeworkItem, Subject
+from backend.models import HomeworkBatch, BatchImage, HomeworkItem
 from backend.services.vlm_service import get_vlm_service
 from backend.services.homework_service import get_homework_service
-from backend.api.deps import get_current_child
+from backend.api.deps import get_current_child, get_subject_catalog
+from backend.api.idempotency import IdempotencyGuard, get_idempotency
+from backend.api.serializers import ORJSONResponse, batch_to_response, image_to_response, item_to_response
+from backend.services.subject_catalog import SubjectCatalog
+from backend.services.batch_purge import mark_batches_deleted
+from backend.services.event_bus import queue_event
+from backend.core.uploads import UploadRejected
+from backend.services.image_store import StoredImage, get_image_store
+from backend.services.image_variants import get_image_variant_service
 from backend.schemas import (
     VLMUploadDraftResponse,
     DraftBatchInfo,
     BatchImageResponse,
-    HomeworkItemResponse,
     HomeworkBatchResponse,
     VLMDraftConfirmRequest,
     VLMParsedHomeworkItem,
     ParsedHomeworkItem,
     VLMImageClassification,
+    DraftImageRef,
+    UploadPreflightRequest,
+    UploadPreflightResponse,
 )
 from backend.config import settings
 
 router = APIRouter(prefix="/api/v1/upload", tags=["upload-v1"])
 
+# draft 上传清单
+_MANIFEST_ADAPTER = TypeAdapter(List[DraftImageRef])
+_MAX_MANIFEST_SIZE = 50
 
-def _batch_image_to_response(img: BatchImage) -> BatchImageResponse:
-    """转换批次图片为响应格式"""
-    response = BatchImageResponse.model_validate(img)
-    response.file_path = f"{settings.BASE_URL}/uploads/{img.file_path}"  # type: ignore
-    return response
 
+@router.post("/preflight", response_model=UploadPreflightResponse)
+async def preflight_upload(
+    data: UploadPreflightRequest,
+    child=Depends(get_current_child),
+    db: Session = Depends(get_db),
+):
+    """
+    上传前预检：客户端先报上图片的 sha256，服务器返回哪些已有
 
-def _subject_response_dict(subject: Subject) -> dict:
-    """科目转字典"""
-    return {
-        "id": subject.id,
-        "name": subject.name,
-        "color": subject.color,
-        "sort_order": subject.sort_order,
-    }
-
-
-def _item_to_response(item: HomeworkItem, subject: Subject) -> HomeworkItemResponse:
-    """作业项转响应"""
-    return HomeworkItemResponse(
-        id=item.id,
-        batch_id=item.batch_id,
-        source_image_id=item.source_image_id,
-        subject=_subject_response_dict(subject),
-        text=item.text,
-        key_concept=item.key_concept,
-        status=item.status,
-        started_at=item.started_at,
-        finished_at=item.finished_at,
-        created_at=item.created_at,
+    已有的图片在创建 draft 时用 manifest 中的 sha256 引用，只需上传缺少的文件。
+    只比对当前孩子上传过的图片。
+    """
+    hashes = list(dict.fromkeys(h.lower() for h in data.hashes))
+    owned = get_image_store().find_owned(db, child.id, hashes)
+    return ORJSONResponse(
+        {
+            "known": [h for h in hashes if h in owned],
+            "missing": [h for h in hashes if h not in owned],
+        }
     )
 
 
+async def _collect_draft_images(
+    files: List[UploadFile],
+    manifest: Optional[str],
+    child_id: int,
+    db: Session,
+) -> Tuple[List[Tuple[int, str, StoredImage]], List[Tuple[int, UploadFile, StoredImage]]]:
+    """
+    按上传清单收集 draft 的图片
+
+    没有 manifest 时按 files 的顺序；有 manifest 时按清单顺序，每项引用已有图片（sha256）
+    或本次上传的文件（file 序号）
+
+    Returns:
+        ([(sort_order, 原始文件名, StoredImage)], [本次新存入的 (序号, 上传文件, StoredImage)])
+    """
+    image_store = get_image_store()
+
+    if manifest is None:
+        uploaded = await image_store.save_all(files)
+        return [(i, file.filename, image) for i, file, image in uploaded], uploaded
+
+    try:
+        refs = _MANIFEST_ADAPTER.validate_json(manifest)
+    except ValidationError:
+        raise HTTPException(status_code=400, detail="图片清单格式错误")
+    if len(refs) > _MAX_MANIFEST_SIZE:
+        raise HTTPException(status_code=400, detail=f"一次最多上传 {_MAX_MANIFEST_SIZE} 张图片")
+
+    owned = image_store.find_owned(db, child_id, (ref.sha256 for ref in refs if ref.sha256))
+
+    entries = []
+    uploaded = []
+    for i, ref in enumerate(refs):
+        if (ref.sha256 is None) == (ref.file is None):
+            raise HTTPException(status_code=400, detail="图片清单每项须且只能指定 sha256 或 file 之一")
+
+        if ref.sha256 is not None:
+            image = owned.get(ref.sha256)
+            if image is None:
+                # 预检之后图片被删除，客户端应改为上传文件
+                raise HTTPException(status_code=409, detail=f"图片 {ref.sha256} 不在服务器上，请重新上传")
+            entries.append((i, ref.file_name or f"{ref.sha256[:12]}{image.info.extension}", image))
+            continue
+
+        if ref.file >= len(files):
+            raise HTTPException(status_code=400, detail=f"图片清单引用的文件 {ref.file} 不存在")
+        file = files[ref.file]
+        try:
+            image = await image_store.save(file)
+        except UploadRejected as e:
+            logger.warning(f"[Upload] 跳过 {file.filename}: {e}")
+            continue
+        entries.append((i, file.filename, image))
+        uploaded.append((i, file, image))
+
+    return entries, uploaded
+
+
 @router.post("/draft", response_model=VLMUploadDraftResponse)
 async def upload_draft_batch_vlm(
-    files: List[UploadFile],
+    files: List[UploadFile] = File(default=[]),
+    manifest: Optional[str] = Form(default=None),
     child=Depends(get_current_child),
+    catalog: SubjectCatalog = Depends(get_subject_catalog),
+    idem: IdempotencyGuard = Depends(get_idempotency),
     db: Session = Depends(get_db),
 ):
     """
     上传图片，通过 VLM 解析创建 draft 批次
 
+    Args:
+        files: 上传的图片文件
+        manifest: 可选的图片清单（JSON 数组，见 DraftImageRef），用于引用预检时服务器已有的图片
+
+    带 Idempotency-Key 请求头时，同一个键的重试直接返回首次的结果，不再存图和调用 VLM。
+
     流程：
-    1. 保存所有图片
+    1. 保存所有图片（已有相同内容时不写磁盘）
     2. 调用 VLM 一次性完成：
        - 图片分类（homework / reference）
        - 作业项提取
@@ -82,44 +155,33 @@ async def upload_draft_batch_vlm(
     3. 根据分类结果更新 BatchImage.image_type
     4. 返回完整解析结果
     """
-    if not files:
+    if idem.replay is not None:
+        return idem.replay
+    if not files and manifest is None:
         raise HTTPException(status_code=400, detail="请至少上传一张图片")
 
     homework_service = get_homework_service()
     vlm_service = get_vlm_service()
+    image_store = get_image_store()
+
+    # 先把图片存入（不占用数据库写事务），不符合要求的图片跳过；已有相同内容时不写磁盘
+    entries, uploaded = await _collect_draft_images(files, manifest, child.id, db)
+    if not entries:
+        raise HTTPException(
+            status_code=400,
+            detail=f"没有可用的图片（支持 JPG、PNG、WebP，单张不超过 {settings.MAX_UPLOAD_SIZE // (1024 * 1024)}MB）",
+        )
 
-    # 创建 draft 批次
+    # 创建 draft 批次和图片记录（image_type 先设为 homework，后续由 VLM 修正）
     batch = homework_service.create_draft_batch(db, child.id)
-
-    # 处理每张图片
+    image_store.register(db, (image for _, _, image in entries))
     uploaded_images = []
-    image_paths = []
-
-    for i, file in enumerate(files):
-        # 验证文件类型
-        allowed_types = ["image/jpeg", "image/jpg", "image/png", "image/webp"]
-        if file.content_type not in allowed_types:
-            continue
-
-        # 读取文件
-        content = await file.read()
-        if len(content) > settings.MAX_UPLOAD_SIZE:
-            continue
-
-        # 保存图片
-        file_ext = os.path.splitext(file.filename)[1]
-        filename = f"{uuid.uuid4()}{file_ext}"
-        file_path = settings.UPLOAD_DIR / filename
-
-        with open(file_path, "wb") as f:
-            f.write(content)
-
-        # 创建图片记录（image_type 先设为 homework，后续由 VLM 修正）
+    for i, file_name, image in entries:
         batch_image = BatchImage(
             batch_id=batch.id,
-            file_path=filename,
-            file_name=file.filename,
-            file_size=len(content),
+            file_path=image.file_path,
+            file_name=file_name,
+            file_size=image.info.size,
             sort_order=i,
             image_type="homework",
             raw_ocr_text=None,
@@ -128,24 +190,40 @@ async def upload_draft_batch_vlm(
         )
         db.add(batch_image)
         uploaded_images.append(batch_image)
-        image_paths.append(str(file_path))
 
-    db.flush()
+    # VLM 解析耗时较长，先提交释放 SQLite 写锁，解析期间其他请求仍可写入；
+    # 解析中断时留下的是 pending 状态的草稿，可在编辑页重新确认
+    queue_event(db, child.id, "vlm.started", batch_id=batch.id, image_count=len(uploaded_images))
+    db.commit()
+    # 带幂等键时，解析中断会释放键让客户端重试，重试会新建草稿；先删掉这份，避免留下重复的草稿
+    batch_id = batch.id
+    idem.on_release(
+        lambda session: mark_batches_deleted(session, HomeworkBatch.id == batch_id, HomeworkBatch.status == "draft")
+    )
+    await image_store.ensure_saved(uploaded)
+
+    # 后台生成缩略图，与 VLM 解析并行
+    variant_service = get_image_variant_service()
+    for _, _, image in uploaded:
+        variant_service.schedule(image)
 
     # 获取科目列表
-    subjects = db.query(Subject).all()
-    subject_dicts = [{"id": s.id, "name": s.name} for s in subjects]
-    subject_map = {s.id: s for s in subjects}
+    subject_dicts = catalog.as_dicts()
 
     # 获取原始上传文件名列表，用于 VLM 显示和结果匹配
     original_filenames = [img.file_name for img in uploaded_images]
 
-    # 调用 VLM 服务，传递原始文件名
-    vlm_result = await vlm_service.parse_homework_images(
-        image_paths=image_paths,
-        subjects=subject_dicts,
-        original_filenames=original_filenames
-    )
+    # 调用 VLM 服务，传递原始文件名；对象存储时图片先下载到临时文件，解析完删除
+    with ExitStack() as stack:
+        image_paths = [
+            str(await run_in_threadpool(stack.enter_context, image_store.local_path(image.file_path)))
+            for _, _, image in entries
+        ]
+        vlm_result = await vlm_service.parse_homework_images(
+            image_paths=image_paths,
+            subjects=subject_dicts,
+            original_filenames=original_filenames
+        )
 
     # 构建 VLM 解析结果
     parsed_result = None
@@ -193,7 +271,7 @@ async def upload_draft_batch_vlm(
                 continue
 
             # 查找科目
-            subject = subject_map.get(subject_id)
+            subject = catalog.get(subject_id)
             if subject:
                 # 根据 homeworkFileName 查找 source_image_id
                 homework_file_name = item.get("homeworkFileName")
@@ -241,12 +319,14 @@ async def upload_draft_batch_vlm(
             ensure_ascii=False
         )
 
-    db.commit()
+    # 图片分类和解析结果都属于批次的修改（按微秒记录，同一秒内的两次写入也能区分）
+    batch.updated_at = datetime.utcnow()
+    queue_event(db, child.id, "vlm.finished", batch_id=batch.id, success=vlm_result.success)
 
-    # 构建响应
-    image_responses = [_batch_image_to_response(img) for img in uploaded_images]
+    # 构建响应（带幂等键时与解析结果在同一个事务中保存）
+    image_responses = [image_to_response(img) for img in uploaded_images]
 
-    return VLMUploadDraftResponse(
+    response = idem.respond(db, VLMUploadDraftResponse(
         success=True,
         batch=DraftBatchInfo(
             id=batch.id,
@@ -257,7 +337,9 @@ async def upload_draft_batch_vlm(
         batch_id=batch.id,
         images=image_responses,
         parsed=parsed_result,
-    )
+    ))
+    db.commit()
+    return response
 
 
 @router.post("/{batch_id}/confirm", response_model=HomeworkBatchResponse)
@@ -265,16 +347,26 @@ async def confirm_draft_batch_vlm(
     batch_id: int,
     data: VLMDraftConfirmRequest,
     child=Depends(get_current_child),
+    catalog: SubjectCatalog = Depends(get_subject_catalog),
+    idem: IdempotencyGuard = Depends(get_idempotency),
     db: Session = Depends(get_db),
 ):
     """
     确认 draft 批次，激活并保存作业项
 
-    支持用户修改图片分类和作业项
+    支持用户修改图片分类和作业项。带 Idempotency-Key 请求头时，已成功确认后的重试
+    直接返回首次的结果（而不是“只能确认 draft 状态的批次”）。
     """
-    # 验证批次所有权
+    if idem.replay is not None:
+        return idem.replay
+
+    # 验证批次所有权（同时加载作业项和图片，响应直接由内存构建）
     batch = (
         db.query(HomeworkBatch)
+        .options(
+            selectinload(HomeworkBatch.items).joinedload(HomeworkItem.subject),
+            selectinload(HomeworkBatch.images),
+        )
         .filter(HomeworkBatch.id == batch_id, HomeworkBatch.child_id == child.id)
         .first()
     )
@@ -285,10 +377,16 @@ async def confirm_draft_batch_vlm(
     if batch.status != "draft":
         raise HTTPException(status_code=400, detail="只能确认 draft 状态的批次")
 
+    # 先校验科目（确保在写入作业项、激活批次前发现无效数据）
+    requested_subject_ids = {item_data.subject_id for item_data in data.items}
+    subject_map = catalog.bind(db, requested_subject_ids)
+    missing_subject_ids = requested_subject_ids - subject_map.keys()
+    if missing_subject_ids:
+        raise HTTPException(status_code=404, detail=f"科目 {min(missing_subject_ids)} 不存在")
+
     # 如果用户提供了分类更新，先应用
     if data.image_classification:
-        images = db.query(BatchImage).filter(BatchImage.batch_id == batch_id).all()
-        image_map = {img.sort_order: img for img in images}
+        image_map = {img.sort_order: img for img in batch.images}
 
         for idx in data.image_classification.homework_images:
             if idx in image_map:
@@ -298,83 +396,27 @@ async def confirm_draft_batch_vlm(
             if idx in image_map:
                 image_map[idx].image_type = "reference"
 
-        db.commit()
-
-    # 获取科目
-    subjects = db.query(Subject).all()
-    subject_map = {s.id: s for s in subjects}
-
-    # 创建作业项
-    for item_data in data.items:
-        # 更新 source_image 的 raw_ocr_text，存储 reference 关联
-        source_image_id = item_data.source_image_id
-        if source_image_id:
-            # 从 raw_items 中查找是否有 reference
-            # 这里需要前端传递 reference 关联信息
-            pass
-
-        item = HomeworkItem(
-            batch_id=batch.id,
-            subject_id=item_data.subject_id,
-            text=item_data.text,
-            key_concept=item_data.key_concept,
-            source_image_id=item_data.source_image_id,
-            status="todo",
-        )
-        db.add(item)
+    # 批量创建作业项
+    homework_service = get_homework_service()
+    homework_service.add_items(db, batch, data.items, subject_map)
 
     # 设置截止时间
     if data.deadline_at:
         batch.deadline_at = data.deadline_at
 
-    # 先保存作业项到数据库（此时批次仍是 draft）
-    db.commit()
-
-    # 先查询数据用于构建响应（确保在激活批次前构建响应成功）
-    items = db.query(HomeworkItem).filter(HomeworkItem.batch_id == batch_id).all()
-    images = db.query(BatchImage).filter(BatchImage.batch_id == batch_id).all()
-    subjects = db.query(Subject).all()
-    subject_map = {s.id: s for s in subjects}
-
-    # 先构建响应，确保数据格式正确
-    response = HomeworkBatchResponse(
-        id=batch.id,
-        child_id=batch.child_id,
-        name=batch.name,
-        status=batch.status,
-        deadline_at=batch.deadline_at,
-        completed_at=batch.completed_at,
-        created_at=batch.created_at,
-        updated_at=batch.updated_at,
-        items=[_item_to_response(item, subject_map[item.subject_id]) for item in items],
-        images=[_batch_image_to_response(img) for img in images],
-        vlm_parse_result=None
-    )
-
-    # 响应构建成功后，激活批次（draft → active）
-    homework_service = get_homework_service()
-    homework_service.activate_batch(db, batch_id)
+    # 激活批次（draft → active）
+    try:
+        homework_service.activate_batch(db, batch_id)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
     # 清空 VLM 解析结果（已确认，不再需要）
     batch.vlm_parse_result = None
 
+    # 作业项已通过 INSERT ... RETURNING 取回 id 和时间戳，响应直接由内存构建
+    db.flush()
+    response = idem.respond(db, batch_to_response(batch, include_items=True, include_images=True))
     db.commit()
-    db.refresh(batch)
-
-    # 重新构建响应以反映最新的批次状态
-    response = HomeworkBatchResponse(
-        id=batch.id,
-        child_id=batch.child_id,
-        name=batch.name,
-        status=batch.status,
-        deadline_at=batch.deadline_at,
-        completed_at=batch.completed_at,
-        created_at=batch.created_at,
-        updated_at=batch.updated_at,
-        items=[_item_to_response(item, subject_map[item.subject_id]) for item in items],
-        images=[_batch_image_to_response(img) for img in images],
-        vlm_parse_result=None
-    )
     return response
 
 
@@ -400,7 +442,7 @@ async def get_batch_images(
         .all()
     )
 
-    return [_batch_image_to_response(img) for img in images]
+    return [image_to_response(img) for img in images]
 
 
 @router.patch("/{batch_id}/images/{image_id}/type")
@@ -446,9 +488,12 @@ async def update_image_type(
         raise HTTPException(status_code=404, detail="图片不存在")
 
     image.image_type = image_type
+    # 图片没有 updated_at，更新批次的修改时间，批次详情的 ETag 随之变化
+    batch.updated_at = datetime.utcnow()
+    queue_event(db, child.id, "batch.updated", batch_id=batch_id)
     db.commit()
 
-    return _batch_image_to_response(image)
+    return image_to_response(image)
 
 
 @router.delete("/{batch_id}/images/{image_id}")
@@ -488,15 +533,6 @@ async def delete_batch_image(
     if not image:
         raise HTTPException(status_code=404, detail="图片不存在")
 
-    # 删除文件
-    file_path = settings.UPLOAD_DIR / image.file_path
-    if file_path.exists():
-        try:
-            file_path.unlink()
-        except Exception as e:
-            # 文件删除失败不影响数据库记录删除
-            print(f"Warning: Failed to delete file {file_path}: {e}")
-
     # 删除关联的作业项（如果该图片是 source_image）
     related_items = (
         db.query(HomeworkItem)
@@ -506,7 +542,9 @@ async def delete_batch_image(
     for item in related_items:
         db.delete(item)
 
-    # 删除数据库记录
+    # 删除数据库记录（图片文件可能被其他批次共用，只减少引用数，由 GC 回收）
+    batch.updated_at = datetime.utcnow()
+    queue_event(db, child.id, "batch.updated", batch_id=batch_id)
     db.delete(image)
     db.commit()
 
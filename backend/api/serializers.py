@@ -0,0 +1,129 @@
+"""
+响应序列化
+
+ORM 对象中的数据已经过数据库约束，这里直接构建与 schemas 中响应模型同结构的字典，
+不经过 pydantic 校验；读接口用 ORJSONResponse 直接返回，跳过 FastAPI 的
+response_model 二次校验和序列化（response_model 仍保留用于接口文档）。
+"""
+import orjson
+from fastapi.responses import ORJSONResponse as _ORJSONResponse
+
+from backend.config import settings
+from backend.models import BatchImage, HomeworkBatch, HomeworkItem, Subject
+from backend.services.image_store import blob_sha256
+
+
+class ORJSONResponse(_ORJSONResponse):
+    """orjson 响应
+
+    数据库中的时间均为 UTC（naive），按 UTC 输出并以 'Z' 结尾，
+    与 schemas.BaseResponse 的 json_encoders 输出一致。
+    """
+
+    def render(self, content) -> bytes:
+        return orjson.dumps(
+            content,
+            option=orjson.OPT_NON_STR_KEYS | orjson.OPT_NAIVE_UTC | orjson.OPT_UTC_Z,
+        )
+
+
+def subject_to_response(subject: Subject) -> dict:
+    """科目转响应（SubjectResponse）"""
+    return {
+        "id": subject.id,
+        "name": subject.name,
+        "color": subject.color,
+        "sort_order": subject.sort_order,
+    }
+
+
+def item_to_response(item: HomeworkItem) -> dict:
+    """作业项转响应（HomeworkItemResponse，需预先加载 item.subject）"""
+    return {
+        "id": item.id,
+        "batch_id": item.batch_id,
+        "source_image_id": item.source_image_id,
+        "subject": subject_to_response(item.subject),
+        "text": item.text,
+        "key_concept": item.key_concept,
+        "status": item.status,
+        "started_at": item.started_at,
+        "finished_at": item.finished_at,
+        "created_at": item.created_at,
+    }
+
+
+def item_to_slim_response(item: HomeworkItem) -> dict:
+    """作业项转精简响应（HomeworkItemSlimResponse，科目只给 subject_id）"""
+    return {
+        "id": item.id,
+        "batch_id": item.batch_id,
+        "source_image_id": item.source_image_id,
+        "subject_id": item.subject_id,
+        "text": item.text,
+        "key_concept": item.key_concept,
+        "status": item.status,
+        "started_at": item.started_at,
+        "finished_at": item.finished_at,
+        "created_at": item.created_at,
+    }
+
+
+def image_to_response(img: BatchImage) -> dict:
+    """图片转响应（BatchImageResponse，file_path 转为完整 URL，并附带缩略图 URL）"""
+    sha256 = blob_sha256(img.file_path)
+    return {
+        "id": img.id,
+        "batch_id": img.batch_id,
+        "file_path": f"{settings.BASE_URL}/uploads/{img.file_path}",
+        "thumbnail_url": f"{settings.BASE_URL}/api/images/{sha256}/thumb.webp" if sha256 else None,
+        "medium_url": f"{settings.BASE_URL}/api/images/{sha256}/medium.webp" if sha256 else None,
+        "file_name": img.file_name,
+        "file_size": img.file_size,
+        "sort_order": img.sort_order,
+        "image_type": img.image_type,
+        "raw_ocr_text": img.raw_ocr_text,
+        "ocr_status": img.ocr_status,
+        "ocr_error": img.ocr_error,
+        "created_at": img.created_at,
+    }
+
+
+def batch_to_record(batch: HomeworkBatch) -> dict:
+    """批次自身字段，不含关联（SyncBatchRecord）"""
+    return {
+        "id": batch.id,
+        "child_id": batch.child_id,
+        "name": batch.name,
+        "status": batch.status,
+        "deadline_at": batch.deadline_at,
+        "completed_at": batch.completed_at,
+        "created_at": batch.created_at,
+        "updated_at": batch.updated_at,
+    }
+
+
+def batch_to_response(
+    batch: HomeworkBatch,
+    include_items: bool = False,
+    include_images: bool = False,
+) -> dict:
+    """批次转响应（HomeworkBatchResponse，不包含 vlm_parse_result）
+
+    include_items / include_images 为 True 时需预先加载对应关联，避免逐条懒加载
+    """
+    return {
+        **batch_to_record(batch),
+        "items": [item_to_response(item) for item in batch.items] if include_items else [],
+        "images": [image_to_response(img) for img in batch.images] if include_images else [],
+        "vlm_parse_result": None,
+    }
+
+
+def batch_to_summary(batch: HomeworkBatch, item_count: int, done_count: int) -> dict:
+    """批次转摘要响应（HomeworkBatchSummaryResponse，只含计数）"""
+    return {
+        **batch_to_record(batch),
+        "item_count": item_count,
+        "done_count": done_count,
+    }
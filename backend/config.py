@@ -22,6 +22,42 @@ class Settings(BaseSettings):
     # 文件存储
     UPLOAD_DIR: Path = Path("./data/uploads")
     MAX_UPLOAD_SIZE: int = 10 * 1024 * 1024  # 10MB
+    IMAGE_GC_GRACE: int = 3600  # 秒，图片内容不再被引用后保留多久才删除文件
+    IMAGE_VARIANT_WORKERS: int = 2  # 后台生成缩略图的线程数
+    DRAFT_TTL: int = 7 * 24 * 3600  # 秒，草稿多久没有更新后自动删除，0 表示不删除
+    JANITOR_INTERVAL: int = 3600  # 秒，后台清理过期草稿和图片文件的间隔，0 表示只在启动时执行
+    JANITOR_DRY_RUN: bool = False  # 只统计可回收的内容，不删除（日志和 /api/health 中查看）
+    PURGE_CHUNK_SIZE: int = 100  # 后台删除已软删除批次时，每个事务处理的批次数
+    IDEMPOTENCY_TTL: int = 24 * 3600  # 秒，Idempotency-Key 及其响应保留多久（期间重试直接返回首次的响应）
+    IDEMPOTENCY_LOCK_TIMEOUT: int = 300  # 秒，首个请求超过多久未完成视为中断，允许重试接管（应大于 VLM_TIMEOUT）
+    # 存储后端：local（UPLOAD_DIR）或 s3（S3 兼容对象存储，需要安装 boto3）
+    STORAGE_BACKEND: str = "local"
+    S3_BUCKET: str = ""
+    S3_PREFIX: str = ""  # 键前缀，如 "homework/"
+    S3_ENDPOINT_URL: str = ""  # MinIO 等非 AWS 服务的地址，如 http://127.0.0.1:9000
+    S3_REGION: str = ""
+    S3_ACCESS_KEY: str = ""  # 留空时使用 boto3 默认凭证链（环境变量、~/.aws、实例角色）
+    S3_SECRET_KEY: str = ""
+    S3_PUBLIC_URL: str = ""  # 桶或 CDN 的公开地址，填写后不再生成预签名 URL
+    S3_PRESIGN_EXPIRES: int = 3600  # 秒，预签名 URL 有效期
+    # 图片访问：static（/uploads 静态目录，知道 URL 即可访问）
+    # 或 accel（应用检查令牌和归属后用 X-Accel-Redirect 交给 Nginx 发送文件，见 docs/deploy.md）
+    UPLOAD_SERVE_MODE: str = "static"
+    UPLOAD_ACCEL_PREFIX: str = "/_protected/uploads/"  # Nginx 中 internal location 的路径
+    STATIC_CACHE_DIR: Path = Path("./data/static")  # 前端文件预压缩结果
+    FRONTEND_WATCH: bool = False  # 监视前端文件变化并刷新（serve --reload 时自动开启）
+
+    # 响应压缩（br 需要安装 brotli，否则只用 gzip）
+    COMPRESSION_MIN_SIZE: int = 1024  # 字节
+
+    # 认证缓存（访问令牌 → 家庭/孩子快照）
+    AUTH_CACHE_SIZE: int = 1024
+    AUTH_CACHE_TTL: int = 300  # 秒
+
+    # 实时推送（SSE）
+    EVENT_MAX_PENDING: int = 100  # 每个连接最多积压的事件数，超过后改发 resync
+    EVENT_MAX_SUBSCRIBERS: int = 20  # 每个孩子最多同时在线的连接数
+    EVENT_HEARTBEAT: int = 15  # 秒，空闲时发送心跳，防止代理断开连接
 
     # CORS（逗号分隔的字符串）
     CORS_ORIGINS: str = "http://localhost:8000,http://127.0.0.1:8000"
@@ -8,6 +8,13 @@ from backend.core.request import (
     generate_request_id,
     configure_logger_with_request_id,
 )
+from backend.core.auth_cache import (
+    AuthCache,
+    AuthEntry,
+    FamilySnapshot,
+    ChildSnapshot,
+    get_auth_cache,
+)
 
 __all__ = [
     "request_id_var",
@@ -15,4 +22,9 @@ __all__ = [
     "set_request_id",
     "generate_request_id",
     "configure_logger_with_request_id",
+    "AuthCache",
+    "AuthEntry",
+    "FamilySnapshot",
+    "ChildSnapshot",
+    "get_auth_cache",
 ]
@@ -0,0 +1,144 @@
+"""
+前端资源清单与 HTML 页面缓存
+
+- 资源清单：按文件内容摘要生成带指纹的 URL（js/api.js → js/api.1a2b3c4d.js），
+  内容不变 URL 就不变，可以放心让浏览器长期缓存
+- HTML 页面：启动时读入内存，把其中引用的 ./frontend/... 改写为带指纹的 URL，
+  并预先压缩好，请求时不读磁盘
+- 开发模式（--reload）下轮询前端目录，文件变化后重新构建
+"""
+import asyncio
+import hashlib
+import os
+import re
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+from loguru import logger
+
+from backend.core.compression import SUPPORTED_ENCODINGS, compress
+from backend.core.static_files import PrecompressedStaticFiles
+
+# HTML 中对前端资源的引用，如 src="./frontend/js/api.js"
+_ASSET_REF = re.compile(r'(?P<attr>src|href)="(?P<prefix>\.?/?frontend/)(?P<path>[^"?#]+)"')
+
+
+class AssetManifest:
+    """
+    资源清单：源文件相对路径 ↔ 带指纹的相对路径
+
+    Args:
+        directory: 前端目录
+    """
+
+    def __init__(self, directory: str):
+        self.directory = Path(directory)
+        self.urls: Dict[str, str] = {}
+        self._sources: Dict[str, str] = {}
+
+    def build(self) -> None:
+        """扫描目录，为所有非 HTML 文件生成带指纹的路径"""
+        urls = {}
+        for path in sorted(self.directory.rglob("*")):
+            if not path.is_file() or path.suffix == ".html":
+                continue
+            relative = path.relative_to(self.directory).as_posix()
+            digest = hashlib.sha256(path.read_bytes()).hexdigest()[:8]
+            stem, dot, suffix = relative.rpartition(".")
+            urls[relative] = f"{stem}.{digest}.{suffix}" if dot else f"{relative}.{digest}"
+        self.urls = urls
+        self._sources = {fingerprinted: source for source, fingerprinted in urls.items()}
+
+    def source_for(self, fingerprinted: str) -> Optional[str]:
+        """带指纹的路径 → 源文件相对路径，不是当前清单中的指纹时返回 None"""
+        return self._sources.get(fingerprinted)
+
+    def rewrite_html(self, html: str) -> str:
+        """把 HTML 中的资源引用改写为带指纹的 URL（清单中没有的引用保持不变）"""
+
+        def _replace(match: re.Match) -> str:
+            fingerprinted = self.urls.get(match["path"])
+            if fingerprinted is None:
+                return match[0]
+            return f'{match["attr"]}="{match["prefix"]}{fingerprinted}"'
+
+        return _ASSET_REF.sub(_replace, html)
+
+
+@dataclass(frozen=True)
+class HtmlShell:
+    """内存中的 HTML 页面（引用已改写）"""
+    body: bytes
+    # 各编码共用一个弱 ETag
+    etag: str
+    # {编码: 压缩后的内容}
+    encoded: Dict[str, bytes] = field(default_factory=dict)
+
+
+class FrontendAssets:
+    """
+    前端资源：资源清单 + HTML 页面缓存 + 预压缩静态文件
+
+    Args:
+        directory: 前端目录
+        cache_dir: 预压缩文件存放目录
+    """
+
+    def __init__(self, directory: str, cache_dir: Path):
+        self.directory = directory
+        self.manifest = AssetManifest(directory)
+        self.static_files = PrecompressedStaticFiles(
+            directory=directory, cache_dir=cache_dir, manifest=self.manifest
+        )
+        self._shells: Dict[str, HtmlShell] = {}
+        self._signature: Tuple = ()
+
+    def build(self) -> None:
+        """重新生成资源清单、预压缩文件和 HTML 页面缓存"""
+        self.manifest.build()
+        created = self.static_files.precompress()
+
+        shells = {}
+        for path in sorted(Path(self.directory).glob("*.html")):
+            body = self.manifest.rewrite_html(path.read_text(encoding="utf-8")).encode("utf-8")
+            shells[path.stem] = HtmlShell(
+                body=body,
+                etag=f'W/"{hashlib.sha256(body).hexdigest()[:16]}"',
+                encoded={encoding: compress(body, encoding) for encoding in SUPPORTED_ENCODINGS},
+            )
+        self._shells = shells
+        self._signature = self._scan()
+        logger.info(
+            f"[FrontendAssets] {len(self.manifest.urls)} 个资源，{len(shells)} 个页面，"
+            f"新压缩 {created} 个文件"
+        )
+
+    def get_shell(self, name: str) -> Optional[HtmlShell]:
+        """按页面名（不含 .html）获取 HTML 页面"""
+        return self._shells.get(name)
+
+    def _scan(self) -> Tuple:
+        """目录中所有文件的 (路径, 修改时间, 大小)，用于判断是否有变化"""
+        signature = []
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                stat = os.stat(os.path.join(root, name))
+                signature.append((root, name, stat.st_mtime_ns, stat.st_size))
+        return tuple(sorted(signature))
+
+    async def watch(self, interval: float = 1.0) -> None:
+        """
+        轮询前端目录，有变化时重新构建（仅开发模式使用）
+
+        uvicorn --reload 只监视 Python 文件，前端文件改动需要靠这里刷新
+        """
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                if self._scan() != self._signature:
+                    logger.info("[FrontendAssets] 前端文件有变化，重新构建")
+                    self.build()
+            except OSError as e:
+                # 编辑器保存文件时可能短暂不存在，下一轮再试
+                logger.warning(f"[FrontendAssets] 重新构建失败: {e}")
@@ -0,0 +1,169 @@
+"""
+访问令牌认证缓存
+进程内 LRU + TTL 缓存：token → (家庭, 孩子) 快照，避免每个请求都查两次数据库
+"""
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Optional, Set
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from backend.models import Family, Child
+
+
+@dataclass(frozen=True)
+class FamilySnapshot:
+    """家庭快照（与会话无关的只读对象）"""
+    id: int
+    name: str
+    access_token: str
+
+
+@dataclass(frozen=True)
+class ChildSnapshot:
+    """孩子快照（与会话无关的只读对象）"""
+    id: int
+    family_id: int
+    name: str
+
+
+@dataclass(frozen=True)
+class AuthEntry:
+    """一个令牌对应的认证结果"""
+    family: FamilySnapshot
+    child: Optional[ChildSnapshot]
+
+
+class AuthCache:
+    """
+    认证缓存
+
+    - 容量超限时淘汰最久未使用的令牌
+    - 条目过期后重新查库
+    - 家庭或孩子发生变更并提交后，按家庭ID失效
+    """
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 300):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, tuple[float, AuthEntry]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._hit_seconds = 0.0
+        self._miss_seconds = 0.0
+
+    def get(self, token: str) -> Optional[AuthEntry]:
+        """获取未过期的缓存条目"""
+        with self._lock:
+            cached = self._entries.get(token)
+            if cached is None:
+                return None
+            expires_at, entry = cached
+            if expires_at <= time.monotonic():
+                del self._entries[token]
+                return None
+            self._entries.move_to_end(token)
+            return entry
+
+    def put(self, token: str, entry: AuthEntry) -> None:
+        """写入缓存条目"""
+        with self._lock:
+            self._entries[token] = (time.monotonic() + self.ttl, entry)
+            self._entries.move_to_end(token)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def invalidate_families(self, family_ids: Set[int]) -> None:
+        """使指定家庭的所有令牌失效"""
+        if not family_ids:
+            return
+        with self._lock:
+            stale = [
+                token for token, (_, entry) in self._entries.items()
+                if entry.family.id in family_ids
+            ]
+            for token in stale:
+                del self._entries[token]
+
+    def clear(self) -> None:
+        """清空缓存"""
+        with self._lock:
+            self._entries.clear()
+
+    def record(self, hit: bool, seconds: float) -> None:
+        """记录一次查找的命中情况和耗时"""
+        with self._lock:
+            if hit:
+                self._hits += 1
+                self._hit_seconds += seconds
+            else:
+                self._misses += 1
+                self._miss_seconds += seconds
+
+    def stats(self) -> dict:
+        """命中率和平均耗时"""
+        with self._lock:
+            total = self._hits + self._misses
+            return {
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+                "ttl": self.ttl,
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_rate": round(self._hits / total, 4) if total else 0.0,
+                "avg_hit_ms": round(1000 * self._hit_seconds / self._hits, 3) if self._hits else 0.0,
+                "avg_miss_ms": round(1000 * self._miss_seconds / self._misses, 3) if self._misses else 0.0,
+            }
+
+
+# 全局单例
+_auth_cache = None
+
+
+def get_auth_cache() -> AuthCache:
+    """获取认证缓存单例"""
+    global _auth_cache
+    if _auth_cache is None:
+        from backend.config import settings
+
+        _auth_cache = AuthCache(
+            maxsize=settings.AUTH_CACHE_SIZE,
+            ttl=settings.AUTH_CACHE_TTL,
+        )
+    return _auth_cache
+
+
+# ==================== 变更失效 ====================
+# flush 时记下变更涉及的家庭ID，提交成功后再失效：
+# 如果在提交前失效，其他请求可能又把旧数据读回缓存
+
+_PENDING_KEY = "auth_cache_family_ids"
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_changed_families(session, flush_context):
+    family_ids = session.info.setdefault(_PENDING_KEY, set())
+    for obj in list(session.dirty) + list(session.deleted):
+        if isinstance(obj, Family):
+            family_ids.add(obj.id)
+        elif isinstance(obj, Child):
+            family_ids.add(obj.family_id)
+    for obj in session.new:
+        if isinstance(obj, Child):
+            family_ids.add(obj.family_id)
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_changed_families(session):
+    family_ids = session.info.pop(_PENDING_KEY, None)
+    if family_ids:
+        get_auth_cache().invalidate_families(family_ids)
+
+
+@event.listens_for(Session, "after_soft_rollback")
+def _discard_changed_families(session, previous_transaction):
+    session.info.pop(_PENDING_KEY, None)
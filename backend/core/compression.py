@@ -0,0 +1,88 @@
+"""
+响应压缩编解码
+根据 Accept-Encoding 协商 br / gzip；brotli 为可选依赖，未安装时只提供 gzip
+"""
+import gzip
+from typing import Iterable, Optional
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - 取决于运行环境
+    brotli = None
+
+
+# 按优先级排列（同等 q 值时优先 br）
+SUPPORTED_ENCODINGS = ("br", "gzip") if brotli is not None else ("gzip",)
+
+# 预压缩文件后缀
+ENCODING_SUFFIXES = {"br": ".br", "gzip": ".gz"}
+
+# 值得压缩的内容类型（图片等已压缩格式不再压缩）
+_COMPRESSIBLE_TYPES = (
+    "text/",
+    "application/json",
+    "application/javascript",
+    "application/xml",
+    "image/svg+xml",
+)
+
+
+def is_compressible(content_type: str) -> bool:
+    """内容类型是否值得压缩"""
+    return content_type.startswith(_COMPRESSIBLE_TYPES) and not content_type.startswith(
+        "text/event-stream"
+    )
+
+
+def negotiate_encoding(
+    accept_encoding: str,
+    available: Iterable[str] = SUPPORTED_ENCODINGS,
+) -> Optional[str]:
+    """
+    根据 Accept-Encoding 选择编码
+
+    Args:
+        accept_encoding: 请求头 Accept-Encoding，如 "gzip, deflate, br;q=0.9"
+        available: 可提供的编码，按优先级排列
+
+    Returns:
+        选中的编码，客户端都不接受时返回 None
+    """
+    if not accept_encoding:
+        return None
+
+    weights = {}
+    for part in accept_encoding.lower().split(","):
+        name, _, params = part.strip().partition(";")
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        weights[name.strip()] = q
+
+    best, best_q = None, 0.0
+    for encoding in available:
+        q = weights.get(encoding, weights.get("*", 0.0))
+        if q > best_q:
+            best, best_q = encoding, q
+    return best
+
+
+def compress(data: bytes, encoding: str, level: Optional[int] = None) -> bytes:
+    """
+    按指定编码压缩
+
+    Args:
+        data: 原始数据
+        encoding: "br" 或 "gzip"
+        level: 压缩级别（br 为 quality 0-11，gzip 为 1-9），为空时取最高级别
+    """
+    if encoding == "br":
+        return brotli.compress(data, quality=11 if level is None else level)
+    if encoding == "gzip":
+        # mtime=0 保证相同内容压缩结果一致
+        return gzip.compress(data, compresslevel=9 if level is None else level, mtime=0)
+    raise ValueError(f"不支持的压缩编码: {encoding}")
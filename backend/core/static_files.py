@@ -0,0 +1,130 @@
+"""
+预压缩静态文件
+启动时把前端 JS/CSS/HTML 压缩一次（.br / .gz 存在缓存目录），
+请求时按 Accept-Encoding 直接返回压缩好的文件，不再逐请求压缩；
+带指纹的 URL（见 backend.core.assets）按不可变资源长期缓存
+"""
+import mimetypes
+import os
+from pathlib import Path
+from typing import TYPE_CHECKING, Dict, Optional, Tuple
+
+from starlette.datastructures import Headers
+from starlette.responses import FileResponse, Response
+from starlette.staticfiles import NotModifiedResponse, StaticFiles
+from starlette.types import Scope
+
+# 带指纹的 URL 内容永不变化；其他 URL 每次使用前回源校验
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+REVALIDATE_CACHE_CONTROL = "no-cache"
+
+from backend.core.compression import (
+    ENCODING_SUFFIXES,
+    SUPPORTED_ENCODINGS,
+    compress,
+    is_compressible,
+    negotiate_encoding,
+)
+
+if TYPE_CHECKING:
+    from backend.core.assets import AssetManifest
+
+
+class PrecompressedStaticFiles(StaticFiles):
+    """
+    支持预压缩文件的 StaticFiles
+
+    Args:
+        directory: 静态文件目录
+        cache_dir: 预压缩文件存放目录（按相对路径镜像，文件名追加 .br / .gz）
+        manifest: 资源清单（AssetManifest），用于把带指纹的路径映射回源文件
+    """
+
+    def __init__(self, *, directory: str, cache_dir: Path, manifest: Optional["AssetManifest"] = None, **kwargs):
+        super().__init__(directory=directory, **kwargs)
+        self.cache_dir = Path(cache_dir)
+        self.manifest = manifest
+        # {源文件绝对路径: {编码: (压缩文件路径, stat)}}
+        self._variants: Dict[str, Dict[str, Tuple[str, os.stat_result]]] = {}
+
+    def precompress(self) -> int:
+        """
+        预压缩目录下所有可压缩文件，已是最新的压缩文件直接复用
+
+        Returns:
+            本次新生成的压缩文件数
+        """
+        # 与 StaticFiles.lookup_path 返回的路径保持一致，才能按路径命中
+        resolve = os.path.abspath if self.follow_symlink else os.path.realpath
+        root = Path(resolve(self.directory))
+        variants: Dict[str, Dict[str, Tuple[str, os.stat_result]]] = {}
+        created = 0
+
+        for path in sorted(root.rglob("*")):
+            if not path.is_file():
+                continue
+            if not is_compressible(mimetypes.guess_type(path.name)[0] or ""):
+                continue
+
+            source_stat = path.stat()
+            data = None
+            for encoding in SUPPORTED_ENCODINGS:
+                target = self.cache_dir / f"{path.relative_to(root)}{ENCODING_SUFFIXES[encoding]}"
+                if not target.exists() or target.stat().st_mtime < source_stat.st_mtime:
+                    if data is None:
+                        data = path.read_bytes()
+                    compressed = compress(data, encoding)
+                    if len(compressed) >= len(data):
+                        continue
+                    target.parent.mkdir(parents=True, exist_ok=True)
+                    tmp = target.with_name(target.name + ".tmp")
+                    tmp.write_bytes(compressed)
+                    tmp.replace(target)
+                    created += 1
+                variants.setdefault(str(path), {})[encoding] = (str(target), target.stat())
+
+        self._variants = variants
+        return created
+
+    async def get_response(self, path: str, scope: Scope) -> Response:
+        source = self.manifest.source_for(Path(path).as_posix()) if self.manifest else None
+        response = await super().get_response(source or path, scope)
+        response.headers["cache-control"] = (
+            IMMUTABLE_CACHE_CONTROL if source else REVALIDATE_CACHE_CONTROL
+        )
+        return response
+
+    def file_response(
+        self,
+        full_path,
+        stat_result: os.stat_result,
+        scope: Scope,
+        status_code: int = 200,
+    ) -> Response:
+        variants = self._variants.get(str(full_path))
+        if not variants or status_code != 200:
+            return super().file_response(full_path, stat_result, scope, status_code)
+
+        request_headers = Headers(scope=scope)
+        encoding = negotiate_encoding(
+            request_headers.get("accept-encoding", ""),
+            [e for e in SUPPORTED_ENCODINGS if e in variants],
+        )
+        compressed_path, compressed_stat = variants[encoding] if encoding else (None, None)
+
+        # 源文件在预压缩之后被修改过（开发时），退回原文件
+        if compressed_stat is None or compressed_stat.st_mtime < stat_result.st_mtime:
+            response = super().file_response(full_path, stat_result, scope, status_code)
+            response.headers.add_vary_header("Accept-Encoding")
+            return response
+
+        response = FileResponse(
+            compressed_path,
+            stat_result=compressed_stat,
+            method=scope["method"],
+            media_type=mimetypes.guess_type(str(full_path))[0] or "text/plain",
+            headers={"content-encoding": encoding, "vary": "Accept-Encoding"},
+        )
+        if self.is_not_modified(response.headers, request_headers):
+            return NotModifiedResponse(response.headers)
+        return response
@@ -0,0 +1,293 @@
+"""
+上传文件存储后端
+
+- LocalStorage：本地目录（默认，单机部署）
+- S3Storage：S3 兼容对象存储（AWS S3、MinIO、各云厂商 OSS 的 S3 接口），需要安装 boto3
+
+对象用相对路径作为键，如 blobs/ab/cd/<sha256>.jpg。读写都是流式的，不把整个文件读入内存；
+写入是原子的（本地先写临时文件再重命名，S3 上传完成才可见）。
+对象存储时客户端通过预签名 URL（或公开地址）直接下载，应用进程不转发图片字节。
+"""
+import os
+import shutil
+import tempfile
+import uuid
+from abc import ABC, abstractmethod
+from contextlib import closing, contextmanager
+from dataclasses import dataclass
+from pathlib import Path, PurePosixPath
+from typing import BinaryIO, Iterator, Optional
+
+try:
+    import boto3
+    from botocore.config import Config as BotoConfig
+    from botocore.exceptions import ClientError
+except ImportError:  # pragma: no cover - 取决于运行环境
+    boto3 = None
+
+# 每次读写的块大小
+CHUNK_SIZE = 64 * 1024
+
+# 写入中的临时文件后缀
+PARTIAL_SUFFIX = ".part"
+
+# 存入对象存储的内容都按内容寻址，可以长期缓存
+_OBJECT_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+
+@dataclass(frozen=True)
+class StoredObject:
+    """存储中的一个对象"""
+    key: str
+    size: int
+    modified: float  # 时间戳（秒）
+
+
+class Storage(ABC):
+    """存储后端接口"""
+
+    # 客户端可以缓存 url() 返回的地址多少秒
+    url_max_age: int = 0
+
+    @abstractmethod
+    def exists(self, key: str) -> bool:
+        """对象是否存在"""
+
+    @abstractmethod
+    def put(self, key: str, source: BinaryIO, content_type: Optional[str] = None) -> None:
+        """
+        从文件对象当前位置流式写入（原子，写完才可见；已存在时覆盖）
+
+        同一个键可能被并发写入（相同内容的重复上传、重试），实现须保证每次写入都成功，
+        且最终的对象是某一次写入的完整内容
+        """
+
+    @abstractmethod
+    def open(self, key: str) -> BinaryIO:
+        """流式读取（调用方负责关闭）"""
+
+    @abstractmethod
+    def delete(self, key: str) -> None:
+        """删除对象，不存在时忽略"""
+
+    @abstractmethod
+    def iter_objects(self, prefix: str) -> Iterator[StoredObject]:
+        """列出键以 prefix 开头的对象"""
+
+    @abstractmethod
+    def url(self, key: str) -> Optional[str]:
+        """客户端直接下载的地址（预签名或公开 URL）；返回 None 表示由应用提供文件"""
+
+    def local_file(self, key: str) -> Optional[Path]:
+        """对象在本地磁盘上的路径，不在本地时返回 None"""
+        return None
+
+    @contextmanager
+    def local_path(self, key: str) -> Iterator[Path]:
+        """
+        以本地文件的形式使用对象（VLM、OCR、Pillow 需要文件路径）
+
+        对象不在本地时下载到临时文件，退出时删除
+        """
+        local = self.local_file(key)
+        if local is not None:
+            yield local
+            return
+
+        fd, tmp = tempfile.mkstemp(suffix=PurePosixPath(key).suffix)
+        try:
+            with os.fdopen(fd, "wb") as f, closing(self.open(key)) as source:
+                shutil.copyfileobj(source, f, CHUNK_SIZE)
+            yield Path(tmp)
+        finally:
+            os.unlink(tmp)
+
+
+class LocalStorage(Storage):
+    """
+    本地目录存储
+
+    Args:
+        root: 存储目录
+    """
+
+    def __init__(self, root: Path):
+        self.root = Path(root)
+
+    def _path(self, key: str) -> Path:
+        return self.root / key
+
+    def exists(self, key: str) -> bool:
+        return self._path(key).exists()
+
+    def put(self, key: str, source: BinaryIO, content_type: Optional[str] = None) -> None:
+        target = self._path(key)
+        target.parent.mkdir(parents=True, exist_ok=True)
+        # 每次写入用独立的临时文件：同一内容被并发上传时各写各的，先后重命名为同一份完整内容；
+        # 共用一个临时文件会互相截断，重命名出不完整的文件，或后一个重命名时找不到文件
+        tmp = target.with_name(f"{target.name}.{uuid.uuid4().hex}{PARTIAL_SUFFIX}")
+        try:
+            with open(tmp, "xb") as f:
+                shutil.copyfileobj(source, f, CHUNK_SIZE)
+            os.replace(tmp, target)
+        except BaseException:
+            tmp.unlink(missing_ok=True)
+            raise
+
+    def open(self, key: str) -> BinaryIO:
+        return open(self._path(key), "rb")
+
+    def delete(self, key: str) -> None:
+        self._path(key).unlink(missing_ok=True)
+
+    def iter_objects(self, prefix: str) -> Iterator[StoredObject]:
+        # os.scandir 逐个目录流式遍历，目录项自带类型，不必为每个文件额外 stat 判断
+        pending = [self._path(prefix)]
+        while pending:
+            try:
+                entries = os.scandir(pending.pop())
+            except (FileNotFoundError, NotADirectoryError):
+                continue
+            with entries:
+                for entry in entries:
+                    if entry.is_dir(follow_symlinks=False):
+                        pending.append(Path(entry.path))
+                    elif entry.is_file(follow_symlinks=False):
+                        try:
+                            stat = entry.stat()
+                        except FileNotFoundError:  # 遍历期间被删除
+                            continue
+                        yield StoredObject(
+                            key=Path(entry.path).relative_to(self.root).as_posix(),
+                            size=stat.st_size,
+                            modified=stat.st_mtime,
+                        )
+
+    def url(self, key: str) -> Optional[str]:
+        return None
+
+    def local_file(self, key: str) -> Optional[Path]:
+        return self._path(key)
+
+
+class S3Storage(Storage):
+    """
+    S3 兼容对象存储
+
+    Args:
+        bucket: 存储桶
+        prefix: 键前缀（如 "homework/"），同一个桶存放多套数据时使用
+        endpoint_url: 服务地址，MinIO 等非 AWS 服务需要填写
+        region: 区域
+        access_key / secret_key: 访问密钥，留空时使用 boto3 默认的凭证链
+        public_url: 桶（或 CDN）的公开访问地址，填写后直接返回公开 URL，不再预签名
+        presign_expires: 预签名 URL 有效期（秒）
+    """
+
+    def __init__(
+        self,
+        bucket: str,
+        prefix: str = "",
+        endpoint_url: Optional[str] = None,
+        region: Optional[str] = None,
+        access_key: Optional[str] = None,
+        secret_key: Optional[str] = None,
+        public_url: Optional[str] = None,
+        presign_expires: int = 3600,
+    ):
+        if boto3 is None:
+            raise RuntimeError("使用 S3 存储需要安装 boto3（pip install 'homework-keeper[s3]'）")
+        self.bucket = bucket
+        self.prefix = prefix
+        self.public_url = public_url.rstrip("/") if public_url else None
+        self.presign_expires = presign_expires
+        # 公开地址不会过期；预签名地址留出余量，避免客户端拿到缓存的重定向时已经过期
+        self.url_max_age = 86400 if self.public_url else presign_expires // 2
+        self.client = boto3.client(
+            "s3",
+            endpoint_url=endpoint_url or None,
+            region_name=region or None,
+            aws_access_key_id=access_key or None,
+            aws_secret_access_key=secret_key or None,
+            # MinIO 等自建服务通常不支持虚拟主机风格的地址
+            config=BotoConfig(
+                signature_version="s3v4",
+                s3={"addressing_style": "path" if endpoint_url else "auto"},
+            ),
+        )
+
+    def _key(self, key: str) -> str:
+        return f"{self.prefix}{key}"
+
+    def exists(self, key: str) -> bool:
+        try:
+            self.client.head_object(Bucket=self.bucket, Key=self._key(key))
+        except ClientError as e:
+            if e.response["Error"]["Code"] in ("404", "NoSuchKey", "NotFound"):
+                return False
+            raise
+        return True
+
+    def put(self, key: str, source: BinaryIO, content_type: Optional[str] = None) -> None:
+        extra = {"CacheControl": _OBJECT_CACHE_CONTROL}
+        if content_type:
+            extra["ContentType"] = content_type
+        # upload_fileobj 按块读取，大文件自动分片上传
+        self.client.upload_fileobj(source, self.bucket, self._key(key), ExtraArgs=extra)
+
+    def open(self, key: str) -> BinaryIO:
+        return self.client.get_object(Bucket=self.bucket, Key=self._key(key))["Body"]
+
+    def delete(self, key: str) -> None:
+        self.client.delete_object(Bucket=self.bucket, Key=self._key(key))
+
+    def iter_objects(self, prefix: str) -> Iterator[StoredObject]:
+        paginator = self.client.get_paginator("list_objects_v2")
+        for page in paginator.paginate(Bucket=self.bucket, Prefix=self._key(prefix)):
+            for obj in page.get("Contents", []):
+                yield StoredObject(
+                    key=obj["Key"][len(self.prefix):],
+                    size=obj["Size"],
+                    modified=obj["LastModified"].timestamp(),
+                )
+
+    def url(self, key: str) -> Optional[str]:
+        if self.public_url:
+            return f"{self.public_url}/{self._key(key)}"
+        return self.client.generate_presigned_url(
+            "get_object",
+            Params={"Bucket": self.bucket, "Key": self._key(key)},
+            ExpiresIn=self.presign_expires,
+        )
+
+
+def create_storage(settings) -> Storage:
+    """按配置创建存储后端"""
+    if settings.STORAGE_BACKEND == "local":
+        return LocalStorage(settings.UPLOAD_DIR)
+    if settings.STORAGE_BACKEND == "s3":
+        return S3Storage(
+            bucket=settings.S3_BUCKET,
+            prefix=settings.S3_PREFIX,
+            endpoint_url=settings.S3_ENDPOINT_URL,
+            region=settings.S3_REGION,
+            access_key=settings.S3_ACCESS_KEY,
+            secret_key=settings.S3_SECRET_KEY,
+            public_url=settings.S3_PUBLIC_URL,
+            presign_expires=settings.S3_PRESIGN_EXPIRES,
+        )
+    raise ValueError(f"未知的存储后端: {settings.STORAGE_BACKEND}")
+
+
+# 全局单例
+_storage = None
+
+
+def get_storage() -> Storage:
+    """获取存储后端单例"""
+    global _storage
+    if _storage is None:
+        from backend.config import settings
+
+        _storage = create_storage(settings)
+    return _storage
@@ -0,0 +1,98 @@
+"""
+上传文件检查
+multipart 上传的图片按块读取，不把整个文件读入内存：
+按文件头（magic bytes）识别图片格式，不信任客户端声明的 content_type 和扩展名；
+边读边计算 sha256、边检查大小，超过上限立即中止。读取在线程池中完成，不阻塞事件循环。
+写入见 backend.core.storage。
+"""
+import hashlib
+from dataclasses import dataclass
+from typing import BinaryIO, Optional
+
+from fastapi import UploadFile
+from starlette.concurrency import run_in_threadpool
+
+from backend.core.storage import CHUNK_SIZE
+
+# 识别格式需要的文件头长度
+_SNIFF_SIZE = 12
+
+# 允许上传的图片格式：媒体类型 → 保存时使用的扩展名
+IMAGE_EXTENSIONS = {
+    "image/jpeg": ".jpg",
+    "image/png": ".png",
+    "image/webp": ".webp",
+}
+
+
+class UploadRejected(ValueError):
+    """上传文件不符合要求（格式不支持、超过大小限制、空文件）"""
+
+
+@dataclass(frozen=True)
+class UploadInfo:
+    """上传文件的内容信息"""
+    size: int
+    sha256: str
+    media_type: str
+
+    @property
+    def extension(self) -> str:
+        return IMAGE_EXTENSIONS[self.media_type]
+
+
+def sniff_image_type(head: bytes) -> Optional[str]:
+    """
+    按文件头识别图片格式
+
+    Args:
+        head: 文件开头至少 12 个字节
+
+    Returns:
+        媒体类型，不是支持的图片格式时返回 None
+    """
+    if head.startswith(b"\xff\xd8\xff"):
+        return "image/jpeg"
+    if head.startswith(b"\x89PNG\r\n\x1a\n"):
+        return "image/png"
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return "image/webp"
+    return None
+
+
+def inspect_file(source: BinaryIO, max_size: int) -> UploadInfo:
+    """
+    识别格式并计算 sha256（同步，只读不写）
+
+    Raises:
+        UploadRejected: 格式不支持、超过大小限制或空文件
+    """
+    source.seek(0)
+    head = source.read(_SNIFF_SIZE)
+    if not head:
+        raise UploadRejected("文件为空")
+    media_type = sniff_image_type(head)
+    if media_type is None:
+        raise UploadRejected("不支持的图片格式")
+
+    digest = hashlib.sha256()
+    size = 0
+    chunk = head
+    while chunk:
+        size += len(chunk)
+        if size > max_size:
+            raise UploadRejected(f"文件超过 {max_size // (1024 * 1024)}MB 限制")
+        digest.update(chunk)
+        chunk = source.read(CHUNK_SIZE)
+
+    return UploadInfo(size=size, sha256=digest.hexdigest(), media_type=media_type)
+
+
+async def inspect_upload(file: UploadFile, max_size: int) -> UploadInfo:
+    """
+    识别上传文件的格式并计算 sha256
+
+    Raises:
+        UploadRejected: 格式不支持、超过大小限制或空文件
+    """
+    return await run_in_threadpool(inspect_file, file.file, max_size)
@@ -1,10 +1,12 @@
 """
 数据库连接管理
 """
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker, Session
+from sqlalchemy import create_engine, event, inspect, text
+from sqlalchemy.orm import ORMExecuteState, sessionmaker, Session, with_loader_criteria
 from pathlib import Path
 
+from backend.models import HomeworkBatch
+
 # 数据库目录
 DB_DIR = Path("./data")
 DB_DIR.mkdir(exist_ok=True)
@@ -20,7 +22,10 @@ engine = create_engine(
 )
 
 # 创建会话工厂
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+# expire_on_commit=False：提交后保留内存中的对象状态，响应可直接由内存构建，无需 refresh 重新查询
+SessionLocal = sessionmaker(
+    autocommit=False, autoflush=False, expire_on_commit=False, bind=engine
+)
 
 
 def get_db() -> Session:
@@ -32,6 +37,42 @@ def get_db() -> Session:
         db.close()
 
 
+@event.listens_for(Session, "do_orm_execute")
+def _hide_deleted_batches(state: ORMExecuteState) -> None:
+    """
+    所有 ORM 查询、批量更新和删除都排除已软删除的批次（包括 join 和关系加载）
+
+    需要看到已删除批次的地方（后台清理）使用 execution_options(include_deleted=True)
+    """
+    if state.is_column_load or state.execution_options.get("include_deleted", False):
+        return
+    state.statement = state.statement.options(
+        with_loader_criteria(HomeworkBatch, HomeworkBatch.deleted_at.is_(None), include_aliases=True)
+    )
+
+
+def lock_writes(db: Session) -> None:
+    """
+    在当前事务中提前取得 SQLite 写锁（不修改任何行），提交或回滚时释放
+
+    先查询后按结果写入/删除文件时使用：持锁期间其他写事务的提交会等待，查询结果不会过时
+    """
+    db.execute(text("UPDATE families SET id = id WHERE 0"))
+
+
+def _add_missing_columns(metadata) -> None:
+    """为已存在的表补建模型中新增的列（只支持可为空、无默认值的列）"""
+    inspector = inspect(engine)
+    with engine.begin() as conn:
+        for table in metadata.sorted_tables:
+            existing = {column["name"] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing:
+                    continue
+                column_type = column.type.compile(dialect=engine.dialect)
+                conn.execute(text(f'ALTER TABLE {table.name} ADD COLUMN "{column.name}" {column_type}'))
+
+
 def init_db():
     """初始化数据库表和默认数据"""
     from backend.models import Base, Family, Child, Subject
@@ -39,6 +80,25 @@ def init_db():
     # 创建所有表
     Base.metadata.create_all(bind=engine)
 
+    # create_all 不会为已存在的表补建新列和新索引，这里逐个检查创建
+    _add_missing_columns(Base.metadata)
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(bind=engine, checkfirst=True)
+
+    # 增量同步的变更日志触发器
+    from backend.services.sync_service import install_sync_triggers
+    install_sync_triggers(engine)
+
+    # 图片引用计数触发器；旧版按 uuid 命名的图片迁入内容寻址存储
+    from backend.services.image_store import get_image_store, install_blob_triggers
+    install_blob_triggers(engine)
+    db = SessionLocal()
+    try:
+        get_image_store().migrate_legacy_files(db)
+    finally:
+        db.close()
+
     # 检查是否已有数据
     db = SessionLocal()
     try:
@@ -1,15 +1,21 @@
 """
 FastAPI 应用入口
 """
-from fastapi import FastAPI
+import asyncio
+
+from fastapi import FastAPI, HTTPException, Request, Response
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse
 from fastapi.middleware.cors import CORSMiddleware
 from pathlib import Path
 
 from backend.config import settings
-from backend.api.routes import batch, items, subject, analytics, family, v1_upload
-from backend.middleware import RequestIdMiddleware
+from backend.api.routes import batch, items, subject, analytics, events, family, images, sync, v1_upload
+from backend.api.serializers import ORJSONResponse
+from backend.api.http_cache import etag_matches, not_modified, set_validators
+from backend.middleware import CompressionMiddleware, RequestIdMiddleware
+from backend.core.assets import FrontendAssets
+from backend.core.compression import negotiate_encoding
+from backend.core.storage import LocalStorage, get_storage
 from backend.core.request import configure_logger_with_request_id
 
 # 配置日志（包含 request-id）
@@ -20,9 +26,14 @@ from loguru import logger
 # 创建 FastAPI 应用
 app = FastAPI(
     title=settings.APP_NAME,
-    debug=settings.DEBUG
+    debug=settings.DEBUG,
+    # orjson 序列化大列表明显快于标准库 json
+    default_response_class=ORJSONResponse,
 )
 
+# 响应压缩（最内层，Request-ID 日志中的耗时包含压缩时间）
+app.add_middleware(CompressionMiddleware, minimum_size=settings.COMPRESSION_MIN_SIZE)
+
 # 注册 Request-ID 中间件（必须在 CORS 之前）
 app.add_middleware(RequestIdMiddleware)
 
@@ -41,53 +52,134 @@ app.include_router(items.router)
 app.include_router(subject.router)
 app.include_router(analytics.router)
 app.include_router(family.router)
+app.include_router(sync.router)
+app.include_router(events.router)
 # V1 路由（使用 VLM）
 app.include_router(v1_upload.router)
-
-# 挂载静态文件目录
-app.mount("/uploads", StaticFiles(directory=str(settings.UPLOAD_DIR)), name="uploads")
-app.mount("/frontend", StaticFiles(directory="frontend"), name="frontend")
+app.include_router(images.router)
+
+# 上传的图片：本地目录直接作为静态目录；对象存储时重定向到预签名地址；
+# accel 模式下检查权限后交给 Nginx 发送
+storage = get_storage()
+if isinstance(storage, LocalStorage) and settings.UPLOAD_SERVE_MODE != "accel":
+    app.mount("/uploads", StaticFiles(directory=str(storage.root)), name="uploads")
+else:
+    app.include_router(images.uploads_router)
+# 前端资源启动时构建：带指纹的 URL 长期缓存，.br / .gz 预压缩，HTML 页面常驻内存
+frontend = FrontendAssets("frontend", cache_dir=settings.STATIC_CACHE_DIR)
+app.mount("/frontend", frontend.static_files, name="frontend")
+
+
+def html_page(name: str, request: Request) -> Response:
+    """返回内存中的 HTML 页面（资源引用已改写为带指纹的 URL）"""
+    shell = frontend.get_shell(name)
+    if shell is None:
+        raise HTTPException(status_code=404, detail="页面不存在")
+
+    if etag_matches(request.headers.get("if-none-match"), shell.etag):
+        response = not_modified(shell.etag)
+        response.headers["Vary"] = "Accept-Encoding"
+        return response
+
+    encoding = negotiate_encoding(request.headers.get("accept-encoding", ""), tuple(shell.encoded))
+    response = Response(
+        shell.encoded[encoding] if encoding else shell.body,
+        media_type="text/html",
+    )
+    set_validators(response, shell.etag)
+    response.headers["Vary"] = "Accept-Encoding"
+    if encoding:
+        response.headers["Content-Encoding"] = encoding
+    return response
 
 
 @app.get("/")
-async def index():
+async def index(request: Request):
     """主页 - 返回前端页面"""
-    return FileResponse("frontend/index.html")
+    return html_page("index", request)
 
 
 # HTML 页面路由（新增页面时在此添加）
 @app.get("/today.html")
-async def today_page():
-    return FileResponse("frontend/today.html")
+async def today_page(request: Request):
+    return html_page("today", request)
 
 
 @app.get("/registry.html")
-async def registry_page():
-    return FileResponse("frontend/registry.html")
+async def registry_page(request: Request):
+    return html_page("registry", request)
 
 
 @app.get("/{file_name:path}.html")
-async def html_files(file_name: str):
+async def html_files(file_name: str, request: Request):
     """通用 HTML 文件路由 - 新增页面无需再添加路由"""
-    return FileResponse(f"frontend/{file_name}.html")
+    return html_page(file_name, request)
 
 
 @app.get("/family/{token}")
-async def family_index(token: str):
+async def family_index(token: str, request: Request):
     """家庭访问入口 - 返回前端页面（token 由前端使用）"""
-    return FileResponse("frontend/index.html")
+    return html_page("index", request)
+
+
+@app.get("/api/health")
+async def health():
+    """健康检查 - 附带认证缓存命中率和耗时、实时推送在线连接数、存储清理、批次清理状态和幂等重试命中数"""
+    from backend.core.auth_cache import get_auth_cache
+    from backend.services.event_bus import get_event_bus
+    from backend.services.batch_purge import get_batch_purger
+    from backend.services.idempotency import get_idempotency_service
+    from backend.services.janitor import get_storage_janitor
+    return {
+        "status": "ok",
+        "auth_cache": get_auth_cache().stats(),
+        "events": get_event_bus().stats(),
+        "janitor": get_storage_janitor().stats(),
+        "purge": get_batch_purger().stats(),
+        "idempotency": get_idempotency_service().stats(),
+    }
 
 
 @app.on_event("startup")
 async def startup_event():
     """应用启动时的初始化"""
     from backend.database import init_db
+    from backend.services.batch_purge import get_batch_purger
+    from backend.services.janitor import get_storage_janitor
     init_db()
+    # 已删除批次、过期草稿和图片文件的清理在后台执行，不阻塞启动
+    # 事件循环只持有任务的弱引用，保存在 app.state 上防止被回收，关闭时取消
+    app.state.background_tasks = [
+        asyncio.create_task(get_batch_purger().run_forever(), name="batch-purger"),
+        asyncio.create_task(
+            get_storage_janitor().run_forever(dry_run=settings.JANITOR_DRY_RUN), name="storage-janitor"
+        ),
+    ]
+    frontend.build()
+    if settings.FRONTEND_WATCH:
+        app.state.background_tasks.append(asyncio.create_task(frontend.watch(), name="frontend-watch"))
     logger.info("Application started successfully")
 
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    """应用关闭时取消后台任务并等待其退出"""
+    tasks = getattr(app.state, "background_tasks", [])
+    for task in tasks:
+        task.cancel()
+    results = await asyncio.gather(*tasks, return_exceptions=True)
+    for task, result in zip(tasks, results):
+        if isinstance(result, Exception):
+            logger.opt(exception=result).error(f"后台任务 {task.get_name()} 异常退出: {result}")
+    app.state.background_tasks = []
+
+
 if __name__ == "__main__":
+    import os
     import uvicorn
+
+    # 自动重载时同时监视前端文件
+    os.environ["FRONTEND_WATCH"] = "true"
     uvicorn.run(
         "backend.main:app",
         host="0.0.0.0",
@@ -2,5 +2,6 @@
 中间件模块
 """
 from backend.middleware.request_id import RequestIdMiddleware
+from backend.middleware.compression import CompressionMiddleware
 
-__all__ = ["RequestIdMiddleware"]
+__all__ = ["RequestIdMiddleware", "CompressionMiddleware"]
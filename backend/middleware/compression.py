@@ -0,0 +1,87 @@
+"""
+响应压缩中间件
+
+功能：
+1. 按 Accept-Encoding 协商 br / gzip
+2. 只压缩一次性发送、超过阈值、内容类型可压缩的响应（JSON、HTML 等）
+3. 已带 Content-Encoding 的响应（如预压缩静态文件）原样透传
+4. 分块发送的流式响应（SSE、大文件）不缓冲，原样透传
+"""
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from backend.core.compression import compress, is_compressible, negotiate_encoding
+
+
+class CompressionMiddleware:
+    """
+    响应压缩中间件
+
+    Args:
+        app: 下游 ASGI 应用
+        minimum_size: 小于该字节数的响应不压缩
+        gzip_level: gzip 压缩级别（1-9）
+        brotli_quality: brotli 压缩质量（0-11），动态响应取较低值以节省 CPU
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        minimum_size: int = 1024,
+        gzip_level: int = 6,
+        brotli_quality: int = 4,
+    ):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.levels = {"gzip": gzip_level, "br": brotli_quality}
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        encoding = negotiate_encoding(Headers(scope=scope).get("accept-encoding", ""))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start_message: Message = {}
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal start_message
+            # 响应头要等看到第一段响应体后才能决定是否压缩
+            if message["type"] == "http.response.start":
+                start_message = message
+                return
+
+            if message["type"] != "http.response.body" or not start_message:
+                await send(message)
+                return
+
+            start, start_message = start_message, {}
+            headers = MutableHeaders(scope=start)
+            body = message.get("body", b"")
+
+            if (
+                message.get("more_body", False)
+                or "content-encoding" in headers
+                or len(body) < self.minimum_size
+                or not is_compressible(headers.get("content-type", ""))
+            ):
+                await send(start)
+                await send(message)
+                return
+
+            compressed = compress(body, encoding, self.levels[encoding])
+            headers["content-encoding"] = encoding
+            headers["content-length"] = str(len(compressed))
+            headers.add_vary_header("Accept-Encoding")
+            # 压缩后字节不同，强 ETag 降为弱 ETag
+            etag = headers.get("etag")
+            if etag and not etag.startswith("W/"):
+                headers["etag"] = f"W/{etag}" if etag.startswith('"') else f'W/"{etag}"'
+
+            await send(start)
+            await send({"type": "http.response.body", "body": compressed})
+
+        await self.app(scope, receive, send_wrapper)
@@ -6,17 +6,21 @@ Request-ID 追踪中间件
 2. 如果没有则生成新的 UUID
 3. 将 request-id 存储到 contextvars 中
 4. 在响应头中返回 X-Request-ID
+5. 记录请求开始、完成日志及耗时
+
+纯 ASGI 实现：不像 BaseHTTPMiddleware 那样为每个响应额外包一层任务和流，
+流式响应（SSE、大文件下载）的数据会原样逐块透传。
 """
-from fastapi import Request
-from starlette.middleware.base import BaseHTTPMiddleware
-from starlette.types import ASGIApp
-from typing import Callable
+import time
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
 
-from backend.core.request import get_request_id, set_request_id, generate_request_id
+from backend.core.request import request_id_var, generate_request_id
 from loguru import logger
 
 
-class RequestIdMiddleware(BaseHTTPMiddleware):
+class RequestIdMiddleware:
     """
     Request-ID 追踪中间件
 
@@ -30,49 +34,55 @@ class RequestIdMiddleware(BaseHTTPMiddleware):
     RESPONSE_HEADER = "x-request-id"
 
     def __init__(self, app: ASGIApp):
-        super().__init__(app)
+        self.app = app
 
-    async def dispatch(
-        self, request: Request, call_next: Callable
-    ) -> ASGIApp:
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
         """
         处理请求，注入 request-id
 
         Args:
-            request: FastAPI/Starlette 请求对象
-            call_next: 下一个中间件/路由处理器
-
-        Returns:
-            响应对象，带有 X-Request-ID 头
+            scope: ASGI 连接信息
+            receive: 接收消息的可调用对象
+            send: 发送消息的可调用对象
         """
-        # 1. 尝试从请求头获取现有的 request-id
-        request_id = request.headers.get(self.RESPONSE_HEADER, "")
+        if scope["type"] not in ("http", "websocket"):
+            await self.app(scope, receive, send)
+            return
+
+        # 1. 尝试从请求头获取现有的 request-id，没有则生成新的
+        request_id = Headers(scope=scope).get(self.RESPONSE_HEADER, "") or generate_request_id()
 
-        # 2. 如果没有则生成新的
-        if not request_id:
-            request_id = generate_request_id()
+        # 2. 存储到 contextvars（供日志和业务代码使用），请求结束后还原
+        token = request_id_var.set(request_id)
 
-        # 3. 存储到 contextvars（供日志和业务代码使用）
-        set_request_id(request_id)
+        method = scope.get("method", "WS")
+        path = scope["path"]
+        status_code = None
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status_code
+            # 3. 在响应开始时追加 request-id 响应头
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                MutableHeaders(scope=message)[self.RESPONSE_HEADER] = request_id
+            await send(message)
 
         # 4. 记录请求开始日志
-        logger.info(
-            f"Request started: {request.method} {request.url.path}",
-        )
+        logger.info(f"Request started: {method} {path}")
+        start = time.perf_counter()
 
         # 5. 调用下一个处理器
         try:
-            response = await call_next(request)
+            await self.app(scope, receive, send_wrapper)
         except Exception as e:
-            logger.error(f"Request failed with exception: {e}")
+            duration_ms = (time.perf_counter() - start) * 1000
+            logger.error(f"Request failed with exception: {e} ({duration_ms:.1f}ms)")
             raise
-
-        # 6. 将 request-id 添加到响应头
-        response.headers[self.RESPONSE_HEADER] = request_id
-
-        # 7. 记录请求完成日志
-        logger.info(
-            f"Request completed: {request.method} {request.url.path} - {response.status_code}",
-        )
-
-        return response
+        else:
+            # 6. 记录请求完成日志（响应体已全部发送）
+            duration_ms = (time.perf_counter() - start) * 1000
+            logger.info(
+                f"Request completed: {method} {path} - {status_code} ({duration_ms:.1f}ms)"
+            )
+        finally:
+            request_id_var.reset(token)
@@ -1,14 +1,18 @@
 """
 SQLAlchemy 数据模型
 """
-from sqlalchemy import Column, Integer, String, Text, DateTime
+from sqlalchemy import Boolean, Column, Integer, String, Text, DateTime, Index, ForeignKey, UniqueConstraint
+from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from datetime import datetime
 
 
 class Base:
     """所有模型的基类"""
-    pass
+
+    # 插入/更新时通过 RETURNING 一并取回服务端默认值（id、created_at、updated_at），
+    # 避免提交后再次查询
+    __mapper_args__ = {"eager_defaults": True}
 
 
 # 导入 SQLAlchemy 的 Base
@@ -34,7 +38,7 @@ class Child(Base):
     __tablename__ = "children"
 
     id = Column(Integer, primary_key=True, autoincrement=True)
-    family_id = Column(Integer, nullable=False)
+    family_id = Column(Integer, ForeignKey("families.id"), nullable=False)
     name = Column(String(50), nullable=False)
 
 
@@ -53,9 +57,13 @@ class Subject(Base):
 class HomeworkBatch(Base):
     """作业批次表"""
     __tablename__ = "homework_batches"
+    __table_args__ = (
+        # 批次列表按 (created_at, id) 游标分页
+        Index("ix_homework_batches_child_created", "child_id", "created_at", "id"),
+    )
 
     id = Column(Integer, primary_key=True, autoincrement=True)
-    child_id = Column(Integer, nullable=False)
+    child_id = Column(Integer, ForeignKey("children.id"), nullable=False)
 
     # 批次信息
     name = Column(String(100), nullable=False)
@@ -71,16 +79,34 @@ class HomeworkBatch(Base):
     # VLM 解析结果（JSON 格式存储，用于草稿恢复）
     vlm_parse_result = Column(Text, nullable=True)
 
+    # 软删除时间：删除接口只做标记，所有 ORM 查询自动排除（见 database.py），
+    # 作业项和图片记录由后台清理任务批量删除（见 services/batch_purge.py）
+    deleted_at = Column(DateTime, nullable=True, index=True)
+
+    # 关联关系（删除批次时级联删除作业项和图片记录）
+    items = relationship(
+        "HomeworkItem",
+        back_populates="batch",
+        order_by="HomeworkItem.id",
+        cascade="all, delete-orphan",
+    )
+    images = relationship(
+        "BatchImage",
+        back_populates="batch",
+        order_by="BatchImage.sort_order",
+        cascade="all, delete-orphan",
+    )
+
 
 class BatchImage(Base):
     """批次图片表"""
     __tablename__ = "batch_images"
 
     id = Column(Integer, primary_key=True, autoincrement=True)
-    batch_id = Column(Integer, nullable=False)
+    batch_id = Column(Integer, ForeignKey("homework_batches.id"), nullable=False, index=True)
 
     # 图片信息
-    file_path = Column(String(255), nullable=False)
+    file_path = Column(String(255), nullable=False, index=True)  # 指向 image_blobs.file_path
     file_name = Column(String(255), nullable=False)
     file_size = Column(Integer)
     sort_order = Column(Integer, default=0)
@@ -95,15 +121,39 @@ class BatchImage(Base):
 
     created_at = Column(DateTime, server_default=func.current_timestamp())
 
+    batch = relationship("HomeworkBatch", back_populates="images")
+
+
+class ImageBlob(Base):
+    """
+    图片内容表（按内容寻址存储）
+
+    同一内容只存一份文件，路径由 sha256 决定（blobs/ab/cd/<sha256>.<ext>），
+    batch_images.file_path 指向这里的 file_path。ref_count 由数据库触发器随 batch_images
+    的插入、删除维护（见 services/image_store.py），降为 0 后由 GC 在保留期过后删除文件。
+    """
+    __tablename__ = "image_blobs"
+    __table_args__ = (
+        Index("ix_image_blobs_released", "ref_count", "released_at"),
+    )
+
+    sha256 = Column(String(64), primary_key=True)
+    file_path = Column(String(255), unique=True, nullable=False)
+    size = Column(Integer, nullable=False)
+    media_type = Column(String(32), nullable=False)
+    ref_count = Column(Integer, nullable=False, default=0)
+    released_at = Column(DateTime)  # 引用数降为 0 的时间
+    created_at = Column(DateTime, server_default=func.current_timestamp())
+
 
 class HomeworkItem(Base):
     """作业项表"""
     __tablename__ = "homework_items"
 
     id = Column(Integer, primary_key=True, autoincrement=True)
-    batch_id = Column(Integer, nullable=False)
+    batch_id = Column(Integer, ForeignKey("homework_batches.id"), nullable=False, index=True)
     source_image_id = Column(Integer)  # 来源图片，手动添加时为空
-    subject_id = Column(Integer, nullable=False)
+    subject_id = Column(Integer, ForeignKey("subjects.id"), nullable=False)
 
     # 作业内容
     text = Column(Text, nullable=False)
@@ -116,3 +166,54 @@ class HomeworkItem(Base):
 
     created_at = Column(DateTime, server_default=func.current_timestamp())
     updated_at = Column(DateTime, server_default=func.current_timestamp(), onupdate=func.current_timestamp())
+
+    batch = relationship("HomeworkBatch", back_populates="items")
+    subject = relationship("Subject")
+
+
+# ==================== 同步相关表 ====================
+
+class SyncChange(Base):
+    """
+    变更日志（增量同步）
+
+    每个批次/作业项/图片一行，由数据库触发器维护（见 services/sync_service.py）：
+    插入、更新、删除时用 INSERT OR REPLACE 重写该行，seq 随之递增；删除后保留为墓碑（deleted=1）。
+    """
+    __tablename__ = "sync_changes"
+    __table_args__ = (
+        UniqueConstraint("entity", "entity_id", name="uq_sync_changes_entity"),
+        Index("ix_sync_changes_child_seq", "child_id", "seq"),
+        # AUTOINCREMENT 保证 seq 单调递增、不会复用
+        {"sqlite_autoincrement": True},
+    )
+
+    seq = Column(Integer, primary_key=True, autoincrement=True)
+    entity = Column(String(10), nullable=False)  # batch/item/image
+    entity_id = Column(Integer, nullable=False)
+    child_id = Column(Integer)
+    batch_id = Column(Integer)
+    deleted = Column(Boolean, nullable=False, default=False)
+    changed_at = Column(DateTime, server_default=func.current_timestamp())
+
+
+class IdempotencyKey(Base):
+    """
+    幂等键（客户端重试去重，见 services/idempotency.py）
+
+    客户端为一次上传/确认生成 Idempotency-Key 并在重试时复用；首个请求处理期间为 pending，
+    完成后保存响应，同一个键的重试直接返回保存的响应。超过 IDEMPOTENCY_TTL 后由存储清理删除。
+    """
+    __tablename__ = "idempotency_keys"
+    __table_args__ = (
+        UniqueConstraint("child_id", "key", name="uq_idempotency_keys_child_key"),
+    )
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    child_id = Column(Integer, nullable=False)
+    key = Column(String(255), nullable=False)
+    fingerprint = Column(String(64), nullable=False)  # 请求内容摘要，同一个键用于不同请求时拒绝
+    status = Column(String(10), nullable=False, default="pending")  # pending/done
+    status_code = Column(Integer)
+    response_body = Column(Text)
+    created_at = Column(DateTime, nullable=False, index=True)
@@ -2,7 +2,7 @@
 Pydantic 数据验证模型
 """
 from pydantic import BaseModel, Field
-from typing import Optional, List
+from typing import Dict, Optional, List
 from datetime import datetime
 
 
@@ -40,7 +40,9 @@ class BatchImageResponse(BaseResponse):
     """批次图片响应"""
     id: int
     batch_id: int
-    file_path: str
+    file_path: str  # 原图 URL
+    thumbnail_url: Optional[str] = None  # 缩略图 URL（WebP，旧图片未迁移时为空）
+    medium_url: Optional[str] = None  # 中等尺寸 URL（WebP，用于全屏查看）
     file_name: str
     file_size: Optional[int] = None
     sort_order: int
@@ -65,6 +67,20 @@ class HomeworkItemResponse(BaseResponse):
     created_at: datetime
 
 
+class HomeworkItemSlimResponse(BaseResponse):
+    """作业项精简响应（科目只给 subject_id，科目信息由 subjects 侧载字典提供）"""
+    id: int
+    batch_id: int
+    source_image_id: Optional[int] = None
+    subject_id: int
+    text: str
+    key_concept: Optional[str] = None
+    status: str
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    created_at: datetime
+
+
 class HomeworkBatchResponse(BaseResponse):
     """作业批次响应"""
     id: int
@@ -80,6 +96,99 @@ class HomeworkBatchResponse(BaseResponse):
     vlm_parse_result: Optional[dict] = None  # draft 状态时返回 VLM 解析结果
 
 
+class HomeworkBatchSummaryResponse(BaseResponse):
+    """作业批次摘要响应（只含计数，不含作业项）"""
+    id: int
+    child_id: int
+    name: str
+    status: str
+    deadline_at: Optional[datetime] = None
+    completed_at: Optional[datetime] = None
+    created_at: datetime
+    updated_at: datetime
+    item_count: int = 0
+    done_count: int = 0
+
+
+class SparseBatchResponse(BaseResponse):
+    """稀疏批次（?fields= / ?include=）：id 总是返回，其余字段只在 fields 中指定时返回"""
+    id: int
+    child_id: Optional[int] = None
+    name: Optional[str] = None
+    status: Optional[str] = None
+    deadline_at: Optional[datetime] = None
+    completed_at: Optional[datetime] = None
+    created_at: Optional[datetime] = None
+    updated_at: Optional[datetime] = None
+    vlm_parse_result: Optional[dict] = None
+    items: Optional[List[HomeworkItemSlimResponse]] = None  # include=items
+    images: Optional[List[BatchImageResponse]] = None  # include=images
+
+
+class SparseBatchListResponse(BaseResponse):
+    """指定 fields / include 时的批次列表响应"""
+    batches: List[SparseBatchResponse]
+    subjects: Optional[Dict[str, SubjectResponse]] = None  # include=subjects，以科目 id 为键
+
+
+class SparseBatchDetailResponse(BaseResponse):
+    """指定 fields / include 时的批次详情响应"""
+    batch: SparseBatchResponse
+    subjects: Optional[Dict[str, SubjectResponse]] = None  # include=subjects，以科目 id 为键
+
+
+class BatchSummaryPage(BaseResponse):
+    """批次摘要分页响应（游标分页）"""
+    batches: List[HomeworkBatchSummaryResponse]
+    next_cursor: Optional[str] = None  # 为空表示没有更多数据
+
+
+class TodayItemGroups(BaseResponse):
+    """按状态分组的作业项"""
+    todo: List[HomeworkItemResponse] = []
+    doing: List[HomeworkItemResponse] = []
+    done: List[HomeworkItemResponse] = []
+
+
+class TodayViewResponse(BaseResponse):
+    """今日作业页面聚合响应（一次请求取回页面所需的全部数据）"""
+    batch: HomeworkBatchSummaryResponse
+    items: TodayItemGroups
+    images: List[BatchImageResponse] = []  # homework 在前，reference 在后，各自按 sort_order 排序
+    server_time: datetime  # 服务器当前时间，前端据此校正本地时钟
+    deadline_remaining_seconds: Optional[int] = None  # 距截止的秒数，已逾期为负数
+    ready_to_complete: bool = False  # active 批次且全部作业项已 done
+
+
+class SyncBatchRecord(BaseResponse):
+    """增量同步中的批次（不含作业项和图片，二者单独同步）"""
+    id: int
+    child_id: int
+    name: str
+    status: str
+    deadline_at: Optional[datetime] = None
+    completed_at: Optional[datetime] = None
+    created_at: datetime
+    updated_at: datetime
+
+
+class SyncDeleted(BaseResponse):
+    """增量同步中的墓碑（已删除的实体ID）"""
+    batches: List[int] = []
+    items: List[int] = []
+    images: List[int] = []
+
+
+class SyncResponse(BaseResponse):
+    """增量同步响应"""
+    cursor: int  # 下次请求的 since
+    has_more: bool = False  # 为 True 时应立即用新游标继续请求
+    batches: List[SyncBatchRecord] = []
+    items: List[HomeworkItemSlimResponse] = []  # 科目信息从 /api/subjects 获取
+    images: List[BatchImageResponse] = []
+    deleted: SyncDeleted
+
+
 # ==================== 请求模型 ====================
 
 class HomeworkItemCreate(BaseModel):
@@ -200,7 +309,7 @@ class VLMImageClassification(BaseModel):
 class VLMParseResult(BaseModel):
     """VLM 完整解析结果"""
     success: bool
-    classification: VLMImageClassification
+    classification: Optional[VLMImageClassification] = None  # 解析失败时为空
     items: List[ParsedHomeworkItem]  # 映射后的作业项
     raw_items: List[VLMParsedHomeworkItem]  # 原始 VLM 返回
     unmatched_subjects: List[str] = []  # 未匹配的科目名（需要用户处理）
@@ -216,6 +325,28 @@ class VLMUploadDraftResponse(BaseResponse):
     parsed: Optional[VLMParseResult] = None
 
 
+class UploadPreflightRequest(BaseModel):
+    """上传预检请求"""
+    hashes: List[str] = Field(max_length=50)  # 待上传图片的 sha256（十六进制小写）
+
+
+class UploadPreflightResponse(BaseResponse):
+    """上传预检响应"""
+    known: List[str]  # 服务器已有，上传时用 sha256 引用即可
+    missing: List[str]  # 需要上传文件
+
+
+class DraftImageRef(BaseModel):
+    """
+    draft 上传清单中的一张图片（按顺序排列）
+
+    sha256 与 file 二选一：sha256 引用服务器已有的图片，file 为本次上传文件在 files 中的序号
+    """
+    sha256: Optional[str] = Field(default=None, pattern=r"^[0-9a-f]{64}$")
+    file: Optional[int] = Field(default=None, ge=0)
+    file_name: Optional[str] = Field(default=None, max_length=255)  # 引用已有图片时的原始文件名
+
+
 class VLMDraftConfirmRequest(BaseModel):
     """确认 VLM draft 批次请求"""
     items: List[HomeworkItemCreate]
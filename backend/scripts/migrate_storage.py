@@ -0,0 +1,90 @@
+"""
+把本地上传目录中的图片复制到当前配置的存储后端（如切换到 S3 / MinIO 之前）
+
+用法:
+  uv run migrate-storage                      # 从 UPLOAD_DIR 复制到 STORAGE_BACKEND 配置的存储
+  uv run migrate-storage --workers 16 --dry-run
+
+只复制内容寻址的 blobs/ 和派生图片 variants/，目标中已存在且大小相同的对象跳过，可以反复执行；
+旧版按 uuid 命名的图片在应用启动时直接迁入新存储，不需要这里处理。
+复制完成、应用切换到新存储并确认无误后，本地目录可以手动删除。
+"""
+import sys
+import argparse
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+# 添加项目根目录到路径
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+
+from backend.config import settings
+from backend.core.storage import PARTIAL_SUFFIX, LocalStorage, Storage, StoredObject, get_storage
+from backend.core.uploads import IMAGE_EXTENSIONS
+from backend.services.image_store import BLOB_DIR, VARIANT_DIR
+
+# 扩展名 → 媒体类型
+_MEDIA_TYPES = {ext: media_type for media_type, ext in IMAGE_EXTENSIONS.items()}
+
+
+def copy_object(source: LocalStorage, target: Storage, obj: StoredObject) -> None:
+    """复制一个对象（流式，不读入内存）"""
+    media_type = _MEDIA_TYPES.get(Path(obj.key).suffix)
+    with source.open(obj.key) as f:
+        target.put(obj.key, f, media_type)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="把本地上传目录中的图片复制到配置的存储后端")
+    parser.add_argument("--source", type=Path, default=settings.UPLOAD_DIR, help="本地上传目录（默认 UPLOAD_DIR）")
+    parser.add_argument("--workers", type=int, default=8, help="并行上传数（默认 8）")
+    parser.add_argument("--dry-run", action="store_true", help="只统计，不复制")
+    args = parser.parse_args()
+
+    source = LocalStorage(args.source)
+    target = get_storage()
+    if isinstance(target, LocalStorage) and target.root.resolve() == source.root.resolve():
+        print("错误: 目标存储就是源目录，请先配置 STORAGE_BACKEND")
+        sys.exit(1)
+
+    objects = [
+        obj
+        for prefix in (BLOB_DIR, VARIANT_DIR)
+        for obj in source.iter_objects(f"{prefix}/")
+        if not obj.key.endswith(PARTIAL_SUFFIX)
+    ]
+    # 一次列出目标中已有的对象，避免逐个 HEAD
+    existing = {
+        obj.key: obj.size
+        for prefix in (BLOB_DIR, VARIANT_DIR)
+        for obj in target.iter_objects(f"{prefix}/")
+    }
+    pending = [obj for obj in objects if existing.get(obj.key) != obj.size]
+    total_bytes = sum(obj.size for obj in pending)
+    print(f"源目录: {source.root}，共 {len(objects)} 个文件，需要复制 {len(pending)} 个（{total_bytes / 1024 / 1024:.1f}MB）")
+    if args.dry_run or not pending:
+        return
+
+    started = time.perf_counter()
+    copied = failed = 0
+    with ThreadPoolExecutor(max_workers=args.workers) as executor:
+        futures = {executor.submit(copy_object, source, target, obj): obj for obj in pending}
+        for future, obj in futures.items():
+            try:
+                future.result()
+                copied += 1
+            except Exception as e:
+                failed += 1
+                print(f"  ✗ {obj.key}: {e}")
+
+    elapsed = time.perf_counter() - started
+    print(
+        f"✓ 复制 {copied} 个文件（{total_bytes / 1024 / 1024:.1f}MB），失败 {failed} 个，"
+        f"用时 {elapsed:.1f}s（{total_bytes / 1024 / 1024 / max(elapsed, 1e-6):.1f}MB/s）"
+    )
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -2,6 +2,7 @@
 启动开发服务器
 用法: uv run serve [--reload]
 """
+import os
 import uvicorn
 import sys
 
@@ -9,6 +10,9 @@ import sys
 def main():
     """启动 FastAPI 开发服务器"""
     reload = "--reload" in sys.argv
+    if reload:
+        # uvicorn 只监视 Python 文件，前端文件由应用自己轮询刷新（子进程继承环境变量）
+        os.environ["FRONTEND_WATCH"] = "true"
     uvicorn.run(
         "backend.main:app",
         host="0.0.0.0",
@@ -0,0 +1,52 @@
+"""
+手动执行一次存储清理（过期草稿、不再被引用的图片、残留文件）
+
+用法:
+  uv run storage-gc --dry-run          # 只统计可回收的内容
+  uv run storage-gc                    # 删除
+  uv run storage-gc --draft-ttl-days 3 # 临时指定草稿保留天数
+
+应用运行时后台已按 JANITOR_INTERVAL 定时执行，这里用于查看或立即执行。
+"""
+import sys
+import argparse
+from pathlib import Path
+
+# 添加项目根目录到路径
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+
+from backend.services.batch_purge import get_batch_purger
+from backend.services.janitor import get_storage_janitor
+
+
+def main():
+    parser = argparse.ArgumentParser(description="清理过期草稿和不再使用的图片文件")
+    parser.add_argument("--dry-run", action="store_true", help="只统计，不删除")
+    parser.add_argument("--draft-ttl-days", type=float, help="草稿多少天没有更新后删除（默认按 DRAFT_TTL）")
+    parser.add_argument("--verbose", "-v", action="store_true", help="列出每个文件")
+    args = parser.parse_args()
+
+    janitor = get_storage_janitor()
+    if args.draft_ttl_days is not None:
+        janitor.draft_ttl = int(args.draft_ttl_days * 24 * 3600)
+
+    report = janitor.run(dry_run=args.dry_run)
+    # 应用中由后台任务删除已软删除的批次，这里直接执行
+    purged = 0 if args.dry_run else get_batch_purger().purge_pending()
+    garbage = report.garbage
+    action = "可回收" if args.dry_run else "已回收"
+    print(f"过期草稿: {report.drafts} 个（{report.draft_images} 张图片，解析结果 {report.parse_result_bytes / 1024:.1f}KB）")
+    if not args.dry_run:
+        print(f"已清理的删除批次: {purged} 个")
+    print(f"不再被引用的图片: {len(garbage.released)} 个")
+    print(f"残留文件: {len(garbage.orphans)} 个")
+    if args.verbose:
+        for key in garbage.released + garbage.orphans:
+            print(f"  {key}")
+    print(f"{action}: {report.freed_bytes / 1024 / 1024:.1f}MB，用时 {report.seconds:.2f}s")
+    if args.dry_run and report.drafts:
+        print("（过期草稿的图片在删除草稿、过了 IMAGE_GC_GRACE 后才计入）")
+
+
+if __name__ == "__main__":
+    main()
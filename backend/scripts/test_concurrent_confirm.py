@@ -0,0 +1,111 @@
+#!/usr/bin/env python
+"""
+并发确认压力测试：同一个孩子的多个 draft 批次同时确认，检查任何时刻最多只有一个 active 批次
+
+在临时目录中新建数据库运行，不影响 data/ 中的数据。每轮先创建若干 draft 批次，
+再用同样数量的线程同时调用 POST /api/v1/upload/{batch_id}/confirm。
+
+用法:
+    uv run python -m backend.scripts.test_concurrent_confirm
+    uv run python -m backend.scripts.test_concurrent_confirm --rounds 50 --threads 32
+
+全部轮次都只有一个 active 批次时退出码为 0，否则为 1。
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import threading
+from pathlib import Path
+
+# 添加项目根目录到路径
+PROJECT_ROOT = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(PROJECT_ROOT))
+
+# 数据库和上传目录都是相对路径（./data），导入应用前切换到临时目录；前端目录链接过去供应用挂载
+_workdir = Path(tempfile.mkdtemp(prefix="homework-stress-"))
+(_workdir / "frontend").symlink_to(PROJECT_ROOT.resolve() / "frontend")
+os.chdir(_workdir)
+
+from fastapi.testclient import TestClient
+from loguru import logger
+
+from backend.database import SessionLocal, init_db
+from backend.main import app
+from backend.models import Child, Family, HomeworkBatch, Subject
+from backend.services.homework_service import get_homework_service
+
+
+def run_round(client: TestClient, headers: dict, child_id: int, subject_id: int, threads: int) -> tuple:
+    """
+    执行一轮并发确认
+
+    Returns:
+        (成功确认数, 失败的响应 [(状态码, 内容)], 结束时 active 批次数)
+    """
+    homework_service = get_homework_service()
+    with SessionLocal() as db:
+        batch_ids = [homework_service.create_draft_batch(db, child_id).id for _ in range(threads)]
+        db.commit()
+
+    barrier = threading.Barrier(threads)
+    results = []
+
+    def confirm(batch_id: int):
+        barrier.wait()
+        response = client.post(
+            f"/api/v1/upload/{batch_id}/confirm",
+            headers=headers,
+            json={"items": [{"subject_id": subject_id, "text": f"作业 {batch_id}"}]},
+        )
+        results.append((response.status_code, response.text))
+
+    workers = [threading.Thread(target=confirm, args=(batch_id,)) for batch_id in batch_ids]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+
+    with SessionLocal() as db:
+        active = (
+            db.query(HomeworkBatch)
+            .filter(HomeworkBatch.child_id == child_id, HomeworkBatch.status == "active")
+            .count()
+        )
+    ok = sum(1 for status, _ in results if status == 200)
+    return ok, [r for r in results if r[0] != 200], active
+
+
+def main():
+    parser = argparse.ArgumentParser(description="并发确认 draft 批次，检查最多只有一个 active 批次")
+    parser.add_argument("--rounds", type=int, default=20, help="轮数（默认 20）")
+    parser.add_argument("--threads", type=int, default=16, help="每轮并发确认的批次数（默认 16）")
+    args = parser.parse_args()
+
+    logger.remove()
+    init_db()
+    with SessionLocal() as db:
+        family = db.query(Family).first()
+        child = db.query(Child).filter(Child.family_id == family.id).first()
+        subject = db.query(Subject).first()
+        headers = {"X-Access-Token": family.access_token}
+        child_id, subject_id = child.id, subject.id
+
+    client = TestClient(app)
+    failed_rounds = 0
+    for i in range(1, args.rounds + 1):
+        ok, errors, active = run_round(client, headers, child_id, subject_id, args.threads)
+        status = "✓" if active == 1 and not errors else "✗"
+        print(f"{status} 第 {i} 轮: {ok}/{args.threads} 个确认成功，active 批次 {active} 个")
+        for code, body in errors[:3]:
+            print(f"    {code}: {body[:200]}")
+        if active != 1 or errors:
+            failed_rounds += 1
+
+    print(f"\n{args.rounds - failed_rounds}/{args.rounds} 轮通过")
+    sys.exit(1 if failed_rounds else 0)
+
+
+if __name__ == "__main__":
+    main()
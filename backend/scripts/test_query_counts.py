@@ -0,0 +1,145 @@
+#!/usr/bin/env python
+"""
+接口 SQL 查询数检查：各接口的查询数固定，不随批次、作业项、图片的数量增长（防止退化为 N+1）
+
+在临时目录中新建数据库运行，不影响 data/ 中的数据。建两个家庭：
+一个只有 1 个批次、2 个作业项、1 张图片，另一个有 15 个批次、每批 25 个作业项、4 张图片，
+对每个接口分别统计两边执行的 SQL 语句数（SQLAlchemy before_cursor_execute 事件），
+要求两边相同且等于 EXPECTED 中的值。
+
+用法:
+    uv run python -m backend.scripts.test_query_counts
+    uv run python -m backend.scripts.test_query_counts -v    # 列出每条 SQL
+
+有意修改了接口的查询方式时，同步更新 EXPECTED。全部符合时退出码为 0，否则为 1。
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+# 添加项目根目录到路径
+PROJECT_ROOT = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(PROJECT_ROOT))
+
+# 数据库和上传目录都是相对路径（./data），导入应用前切换到临时目录；前端目录链接过去供应用挂载
+_workdir = Path(tempfile.mkdtemp(prefix="homework-queries-"))
+(_workdir / "frontend").symlink_to(PROJECT_ROOT.resolve() / "frontend")
+os.chdir(_workdir)
+
+from fastapi.testclient import TestClient
+from loguru import logger
+from sqlalchemy import event
+
+from backend.database import SessionLocal, engine, init_db
+from backend.main import app
+from backend.models import BatchImage, Child, Family, HomeworkBatch, HomeworkItem, Subject
+
+# 接口 → 每次请求的 SQL 语句数（认证缓存、科目目录已预热）
+EXPECTED = {
+    "GET /api/batches": 3,
+    "GET /api/batches?fields=name,status&include=items,images,subjects": 4,
+    "GET /api/batches/{batch_id}": 4,
+    "GET /api/batches/{batch_id}/items": 2,
+    "GET /api/batches/{batch_id}/today": 3,
+    "PUT /api/items/{item_id}": 2,
+    "PATCH /api/items/{item_id}/status": 3,
+}
+
+
+def seed(name: str, token: str, batches: int, items: int, images: int) -> dict:
+    """创建一个家庭及其批次数据，返回请求用的参数"""
+    with SessionLocal() as db:
+        subject_ids = [subject_id for (subject_id,) in db.query(Subject.id)]
+        family = Family(name=name, access_token=token)
+        db.add(family)
+        db.flush()
+        child = Child(family_id=family.id, name=name)
+        db.add(child)
+        db.flush()
+
+        last = None
+        for b in range(batches):
+            batch = HomeworkBatch(child_id=child.id, name=f"{name} {b}", status="active" if b == batches - 1 else "completed")
+            batch.items = [
+                HomeworkItem(subject_id=subject_ids[i % len(subject_ids)], text=f"作业 {i}")
+                for i in range(items)
+            ]
+            batch.images = [
+                BatchImage(file_path=f"{name}-{b}-{i}.jpg", file_name=f"{i}.jpg", sort_order=i)
+                for i in range(images)
+            ]
+            db.add(batch)
+            last = batch
+        db.commit()
+        return {"headers": {"X-Access-Token": token}, "batch_id": last.id, "item_id": last.items[0].id}
+
+
+def requests_for(params: dict) -> dict:
+    """接口 → 发出请求的函数"""
+    batch_id, item_id = params["batch_id"], params["item_id"]
+    return {
+        "GET /api/batches": lambda c, h: c.get("/api/batches", headers=h),
+        "GET /api/batches?fields=name,status&include=items,images,subjects": lambda c, h: c.get(
+            "/api/batches", params={"fields": "name,status", "include": "items,images,subjects"}, headers=h
+        ),
+        "GET /api/batches/{batch_id}": lambda c, h: c.get(f"/api/batches/{batch_id}", headers=h),
+        "GET /api/batches/{batch_id}/items": lambda c, h: c.get(f"/api/batches/{batch_id}/items", headers=h),
+        "GET /api/batches/{batch_id}/today": lambda c, h: c.get(f"/api/batches/{batch_id}/today", headers=h),
+        "PUT /api/items/{item_id}": lambda c, h: c.put(f"/api/items/{item_id}", json={"text": "修改"}, headers=h),
+        "PATCH /api/items/{item_id}/status": lambda c, h: c.patch(
+            f"/api/items/{item_id}/status", json={"status": "done"}, headers=h
+        ),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="检查各接口的 SQL 查询数固定，不随数据量增长")
+    parser.add_argument("--verbose", "-v", action="store_true", help="列出每条 SQL")
+    args = parser.parse_args()
+
+    logger.remove()
+    init_db()
+    small = seed("small", "small-token", batches=1, items=2, images=1)
+    large = seed("large", "large-token", batches=15, items=25, images=4)
+
+    statements = []
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _count(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    client = TestClient(app)
+    # 预热认证缓存和科目目录，之后的请求只统计接口本身的查询
+    for params in (small, large):
+        client.get("/api/subjects", headers=params["headers"])
+        client.get("/api/batches/current", headers=params["headers"])
+
+    failed = 0
+    small_requests, large_requests = requests_for(small), requests_for(large)
+    for name, expected in EXPECTED.items():
+        counts = []
+        for params, requests in ((small, small_requests), (large, large_requests)):
+            statements.clear()
+            response = requests[name](client, params["headers"])
+            if response.status_code != 200:
+                print(f"✗ {name}: HTTP {response.status_code} {response.text[:200]}")
+                failed += 1
+                break
+            counts.append(len(statements))
+            if args.verbose:
+                for statement in statements:
+                    print(f"    {' '.join(statement.split())[:160]}")
+        else:
+            ok = counts[0] == counts[1] == expected
+            failed += not ok
+            print(f"{'✓' if ok else '✗'} {name}: {counts[0]} / {counts[1]} 条（小 / 大数据集），预期 {expected}")
+
+    print(f"\n{len(EXPECTED) - failed}/{len(EXPECTED)} 个接口符合")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,166 @@
+"""
+批次软删除与后台清理
+
+删除批次时只标记 deleted_at（一条条件 UPDATE），批次随即从所有 ORM 查询中消失（见 database.py），
+同步日志记为墓碑；作业项、图片记录和批次本身由后台任务按块批量删除：
+- 每块 PURGE_CHUNK_SIZE 个批次一个事务，每张表一条 DELETE ... WHERE batch_id IN (...)
+- 先删子表：同步日志触发器要通过批次查到 child_id
+- 图片记录删除后引用数由触发器减少，文件过了保留期由存储清理（janitor）回收
+- 失败时回滚并按指数退避重试；标记保存在数据库中，进程重启后继续清理
+"""
+import asyncio
+from datetime import datetime
+from typing import List, Optional
+
+from loguru import logger
+from sqlalchemy import delete, event, update
+from sqlalchemy.engine import Row
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+
+from backend.database import SessionLocal
+from backend.models import BatchImage, HomeworkBatch, HomeworkItem
+from backend.services.event_bus import queue_event
+
+_PURGE_KEY = "batch_purge_pending"
+
+
+def mark_batches_deleted(db: Session, *criteria) -> List[Row]:
+    """
+    软删除符合条件的批次（已删除的不会重复标记），提交后唤醒后台清理
+
+    Args:
+        db: 数据库会话（由调用方提交）
+        *criteria: HomeworkBatch 上的过滤条件
+
+    Returns:
+        [(id, child_id)]，没有符合条件的批次时为空
+    """
+    rows = db.execute(
+        update(HomeworkBatch)
+        .where(*criteria)
+        .values(deleted_at=datetime.utcnow())
+        .returning(HomeworkBatch.id, HomeworkBatch.child_id)
+    ).all()
+    for batch_id, child_id in rows:
+        queue_event(db, child_id, "batch.deleted", batch_id=batch_id)
+    if rows:
+        db.info[_PURGE_KEY] = True
+    return rows
+
+
+class BatchPurger:
+    """
+    已软删除批次的后台清理
+
+    Args:
+        chunk_size: 每个事务删除的批次数
+        retry_base: 失败后第一次重试的等待秒数，之后每次翻倍
+        retry_max: 重试等待的上限（秒）
+    """
+
+    def __init__(self, chunk_size: int = 100, retry_base: float = 5, retry_max: float = 600):
+        self.chunk_size = chunk_size
+        self.retry_base = retry_base
+        self.retry_max = retry_max
+        self.purged = 0
+        self.failures = 0
+        self.last_error: Optional[str] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._wakeup: Optional[asyncio.Event] = None
+
+    def purge_pending(self) -> int:
+        """
+        删除所有已标记的批次（同步，在线程池中调用）
+
+        Returns:
+            本次删除的批次数
+        """
+        purged = 0
+        with SessionLocal() as db:
+            while True:
+                batch_ids = [
+                    batch_id
+                    for (batch_id,) in db.query(HomeworkBatch.id)
+                    .filter(HomeworkBatch.deleted_at.isnot(None))
+                    .order_by(HomeworkBatch.id)
+                    .limit(self.chunk_size)
+                    .execution_options(include_deleted=True)
+                ]
+                if not batch_ids:
+                    break
+                try:
+                    self._purge_chunk(db, batch_ids)
+                except Exception:
+                    db.rollback()
+                    raise
+                purged += len(batch_ids)
+                self.purged += len(batch_ids)
+
+        if purged:
+            logger.info(f"[BatchPurge] 已清理 {purged} 个已删除的批次")
+        return purged
+
+    def _purge_chunk(self, db: Session, batch_ids: List[int]) -> None:
+        db.execute(delete(HomeworkItem).where(HomeworkItem.batch_id.in_(batch_ids)))
+        db.execute(delete(BatchImage).where(BatchImage.batch_id.in_(batch_ids)))
+        db.execute(
+            delete(HomeworkBatch)
+            .where(HomeworkBatch.id.in_(batch_ids), HomeworkBatch.deleted_at.isnot(None))
+            .execution_options(include_deleted=True)
+        )
+        db.commit()
+
+    def wake(self) -> None:
+        """有新的删除时唤醒后台任务（任意线程均可调用）"""
+        if self._loop is None or self._loop.is_closed():
+            return
+        self._loop.call_soon_threadsafe(self._wakeup.set)
+
+    async def run_forever(self) -> None:
+        """后台任务（启动时创建）：启动时清理一次遗留的标记，之后等待唤醒；失败时退避重试"""
+        self._loop = asyncio.get_running_loop()
+        self._wakeup = asyncio.Event()
+        while True:
+            self._wakeup.clear()
+            try:
+                await run_in_threadpool(self.purge_pending)
+                self.failures, self.last_error, timeout = 0, None, None
+            except Exception as e:
+                self.failures += 1
+                self.last_error = str(e)
+                timeout = min(self.retry_base * 2 ** (self.failures - 1), self.retry_max)
+                logger.warning(f"[BatchPurge] 清理失败（第 {self.failures} 次），{timeout:.0f}s 后重试: {e}")
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+
+    def stats(self) -> dict:
+        """清理进度"""
+        return {"purged": self.purged, "failures": self.failures, "last_error": self.last_error}
+
+
+# 全局单例
+_batch_purger = None
+
+
+def get_batch_purger() -> BatchPurger:
+    """获取批次清理单例"""
+    global _batch_purger
+    if _batch_purger is None:
+        from backend.config import settings
+
+        _batch_purger = BatchPurger(chunk_size=settings.PURGE_CHUNK_SIZE)
+    return _batch_purger
+
+
+@event.listens_for(Session, "after_commit")
+def _wake_purger(session):
+    if session.info.pop(_PURGE_KEY, False):
+        get_batch_purger().wake()
+
+
+@event.listens_for(Session, "after_soft_rollback")
+def _discard_purge(session, previous_transaction):
+    session.info.pop(_PURGE_KEY, None)
@@ -0,0 +1,215 @@
+"""
+进程内事件总线
+按孩子ID发布作业项、批次和 VLM 解析事件，推送给同一孩子的所有在线设备（SSE）
+
+- 写操作通过 queue_event() 把事件挂在会话上，提交成功后才发布，回滚则丢弃
+- 每个订阅者的待发送队列有上限：客户端消费太慢时清空队列，改发一条 resync 事件，
+  客户端收到后用 /api/sync 补齐，服务端内存不会随积压增长
+- 单进程内有效；多 worker 部署时各 worker 只推送本进程内发生的变更
+"""
+import asyncio
+import itertools
+import threading
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Any, Deque, Dict, List, Optional, Set
+
+from loguru import logger
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+
+@dataclass(frozen=True)
+class Event:
+    """一条推送事件"""
+    id: int
+    type: str  # item.status / item.created / batch.status / vlm.finished ...
+    data: Dict[str, Any] = field(default_factory=dict)
+
+
+class Subscription:
+    """
+    一个在线连接的订阅
+
+    只能在事件循环线程中使用；空闲时只占用一个空队列和一个 asyncio.Event
+    """
+
+    def __init__(self, child_id: int, max_pending: int):
+        self.child_id = child_id
+        self.max_pending = max_pending
+        self._pending: Deque[Event] = deque()
+        self._wakeup = asyncio.Event()
+        self.lagged = False
+        self.dropped = 0
+
+    def push(self, evt: Event) -> None:
+        """放入待发送队列，超过上限时清空并标记为需要重新同步"""
+        if self.lagged:
+            self.dropped += 1
+        elif len(self._pending) >= self.max_pending:
+            self.dropped += len(self._pending) + 1
+            self._pending.clear()
+            self.lagged = True
+        else:
+            self._pending.append(evt)
+        self._wakeup.set()
+
+    async def next_batch(self, timeout: float) -> List[Event]:
+        """
+        等待并取出所有待发送事件
+
+        Returns:
+            事件列表；超时返回空列表（调用方发送心跳）
+        """
+        if not self._pending and not self.lagged:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout)
+            except asyncio.TimeoutError:
+                return []
+        self._wakeup.clear()
+
+        if self.lagged:
+            dropped, self.dropped, self.lagged = self.dropped, 0, False
+            return [Event(id=0, type="resync", data={"dropped": dropped})]
+
+        events = list(self._pending)
+        self._pending.clear()
+        return events
+
+
+class EventBus:
+    """进程内事件总线（按孩子ID分发）"""
+
+    def __init__(self, max_pending: int = 100, max_subscribers_per_child: int = 20):
+        self.max_pending = max_pending
+        self.max_subscribers_per_child = max_subscribers_per_child
+        self._subscribers: Dict[int, Set[Subscription]] = {}
+        self._ids = itertools.count(1)
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._lock = threading.Lock()
+
+    def check_capacity(self, child_id: int) -> None:
+        """
+        检查孩子的在线连接数是否已达上限（不占用名额，订阅时还会再检查一次）
+
+        Raises:
+            ValueError: 该孩子的在线连接数已达上限
+        """
+        with self._lock:
+            if len(self._subscribers.get(child_id, ())) >= self.max_subscribers_per_child:
+                raise ValueError("在线连接过多，请关闭其他页面后重试")
+
+    def subscribe(self, child_id: int) -> Subscription:
+        """
+        订阅孩子的事件（在事件循环中调用）
+
+        Raises:
+            ValueError: 该孩子的在线连接数已达上限
+        """
+        self._loop = asyncio.get_running_loop()
+        with self._lock:
+            subscribers = self._subscribers.setdefault(child_id, set())
+            if len(subscribers) >= self.max_subscribers_per_child:
+                if not subscribers:
+                    del self._subscribers[child_id]
+                raise ValueError("在线连接过多，请关闭其他页面后重试")
+            subscription = Subscription(child_id, self.max_pending)
+            subscribers.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        """取消订阅"""
+        with self._lock:
+            subscribers = self._subscribers.get(subscription.child_id)
+            if subscribers is None:
+                return
+            subscribers.discard(subscription)
+            if not subscribers:
+                del self._subscribers[subscription.child_id]
+
+    def publish(self, child_id: int, event_type: str, **data) -> None:
+        """
+        发布事件（任意线程均可调用）
+
+        没有订阅者时直接返回，不产生任何开销
+        """
+        if child_id not in self._subscribers or self._loop is None:
+            return
+
+        evt = Event(id=next(self._ids), type=event_type, data=data)
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+
+        if running is self._loop:
+            self._deliver(child_id, evt)
+        elif not self._loop.is_closed():
+            self._loop.call_soon_threadsafe(self._deliver, child_id, evt)
+
+    def _deliver(self, child_id: int, evt: Event) -> None:
+        with self._lock:
+            subscribers = list(self._subscribers.get(child_id, ()))
+        for subscription in subscribers:
+            subscription.push(evt)
+
+    def stats(self) -> dict:
+        """在线连接数"""
+        with self._lock:
+            return {
+                "children": len(self._subscribers),
+                "subscribers": sum(len(s) for s in self._subscribers.values()),
+            }
+
+
+# 全局单例
+_event_bus = None
+
+
+def get_event_bus() -> EventBus:
+    """获取事件总线单例"""
+    global _event_bus
+    if _event_bus is None:
+        from backend.config import settings
+
+        _event_bus = EventBus(
+            max_pending=settings.EVENT_MAX_PENDING,
+            max_subscribers_per_child=settings.EVENT_MAX_SUBSCRIBERS,
+        )
+    return _event_bus
+
+
+# ==================== 提交后发布 ====================
+
+_PENDING_KEY = "event_bus_pending"
+
+
+def queue_event(db: Session, child_id: int, event_type: str, **data) -> None:
+    """
+    登记一条事件，会话提交成功后发布，回滚时丢弃
+
+    Args:
+        db: 数据库会话
+        child_id: 孩子ID
+        event_type: 事件类型
+        **data: 事件数据（需可 JSON 序列化）
+    """
+    db.info.setdefault(_PENDING_KEY, []).append((child_id, event_type, data))
+
+
+@event.listens_for(Session, "after_commit")
+def _publish_queued_events(session):
+    pending = session.info.pop(_PENDING_KEY, None)
+    if not pending:
+        return
+    bus = get_event_bus()
+    for child_id, event_type, data in pending:
+        try:
+            bus.publish(child_id, event_type, **data)
+        except Exception as e:  # 推送失败不影响已提交的写操作
+            logger.warning(f"[EventBus] 发布事件失败 {event_type}: {e}")
+
+
+@event.listens_for(Session, "after_soft_rollback")
+def _discard_queued_events(session, previous_transaction):
+    session.info.pop(_PENDING_KEY, None)
@@ -2,12 +2,25 @@
 作业批次管理服务
 """
 from datetime import datetime, timedelta, date, timezone
-from typing import List, Optional
+from typing import Dict, List, Optional, Sequence
+from sqlalchemy import and_, delete, exists, insert, select, update
 from sqlalchemy.orm import Session
+from sqlalchemy.orm.attributes import set_committed_value
 import pytz
 
 from backend.models import HomeworkBatch, BatchImage, HomeworkItem, Child, Subject
 from backend.services.holiday_service import get_holiday_service
+from backend.services.event_bus import queue_event
+
+
+# 批次状态流转表：目标状态 → 允许的当前状态
+# 与 PATCH /status 原有的语义一致：三种状态之间可以任意变更（退回 draft 重新编辑、重新激活已完成的批次）；
+# 只能完成进行中的批次、只能确认 draft 批次等限制由各自的接口检查
+BATCH_TRANSITIONS: Dict[str, tuple] = {
+    "draft": ("draft", "active", "completed"),
+    "active": ("draft", "active", "completed"),
+    "completed": ("draft", "active", "completed"),
+}
 
 
 class HomeworkService:
@@ -104,18 +117,19 @@ class HomeworkService:
 
         return batch
 
-    def get_active_batch(self, db: Session, child_id: int) -> Optional[HomeworkBatch]:
+    def get_active_batch(self, db: Session, child_id: int, *load_options) -> Optional[HomeworkBatch]:
         """
         获取当前 active 状态的批次
 
         Args:
             db: 数据库会话
             child_id: 孩子ID
+            load_options: 关联预加载选项（如 selectinload(HomeworkBatch.items)）
 
         Returns:
             active 批次，不存在则返回 None
         """
-        return db.query(HomeworkBatch).filter(
+        return db.query(HomeworkBatch).options(*load_options).filter(
             HomeworkBatch.child_id == child_id,
             HomeworkBatch.status == 'active'
         ).first()
@@ -136,18 +150,95 @@ class HomeworkService:
             HomeworkBatch.status.in_(['draft', 'active'])
         ).order_by(HomeworkBatch.created_at.desc()).first()
 
-    def complete_active_batch(self, db: Session, child_id: int) -> None:
+    def complete_active_batch(
+        self, db: Session, child_id: int, exclude_batch_id: Optional[int] = None
+    ) -> None:
         """
         完成当前的 active 批次
 
+        单条条件 UPDATE 完成，不先查询再修改，避免并发请求各自读到旧状态。
+
         Args:
             db: 数据库会话
             child_id: 孩子ID
+            exclude_batch_id: 不参与完成的批次ID（即将被激活的批次）
         """
-        active_batch = self.get_active_batch(db, child_id)
-        if active_batch:
-            active_batch.status = 'completed'
-            active_batch.completed_at = datetime.utcnow()
+        now = datetime.utcnow()
+        stmt = update(HomeworkBatch).where(
+            HomeworkBatch.child_id == child_id,
+            HomeworkBatch.status == 'active',
+        )
+        if exclude_batch_id is not None:
+            stmt = stmt.where(HomeworkBatch.id != exclude_batch_id)
+
+        # 条件都是简单比较，evaluate 可以直接同步会话中已加载的批次对象
+        completed_ids = db.execute(
+            stmt.values(status='completed', completed_at=now, updated_at=now)
+            .returning(HomeworkBatch.id),
+            execution_options={"synchronize_session": "evaluate"},
+        ).scalars().all()
+        for batch_id in completed_ids:
+            queue_event(db, child_id, "batch.status", batch_id=batch_id, status='completed')
+
+    def transition_batch(
+        self,
+        db: Session,
+        batch: HomeworkBatch,
+        to_status: str,
+        require_all_done: bool = False,
+    ) -> HomeworkBatch:
+        """
+        按状态流转表变更批次状态
+
+        先按流转表检查当前状态，状态变更是一条 UPDATE ... WHERE id = ? AND status = 读到的状态，
+        影响行数不为 1 说明状态已被其他请求修改，抛出 ValueError，调用方不提交即可回滚。
+
+        Args:
+            db: 数据库会话
+            batch: 批次对象
+            to_status: 目标状态
+            require_all_done: 完成批次时是否要求所有作业项都已 done（同一条 UPDATE 中判断）
+
+        Returns:
+            变更后的批次
+        """
+        allowed = BATCH_TRANSITIONS.get(to_status)
+        if allowed is None:
+            raise ValueError("无效的状态")
+        if batch.status not in allowed:
+            raise ValueError(f"批次不能从 {batch.status} 变为 {to_status}")
+
+        now = datetime.utcnow()
+        values = {"status": to_status, "updated_at": now}
+        # 以读到的状态为条件：期间被其他请求改过状态时影响行数为 0
+        criteria = [HomeworkBatch.id == batch.id, HomeworkBatch.status == batch.status]
+
+        if to_status == 'active':
+            # 设置 deadline（如果还没有），重新激活时清除完成时间
+            values["deadline_at"] = batch.deadline_at or self.calculate_deadline()
+            values["completed_at"] = None
+            # 完成之前的 active 批次（与激活在同一事务中）
+            self.complete_active_batch(db, batch.child_id, exclude_batch_id=batch.id)
+        elif to_status == 'completed':
+            values["completed_at"] = now
+            if require_all_done:
+                criteria.append(self._all_items_done(batch.id))
+
+        result = db.execute(
+            update(HomeworkBatch).where(*criteria).values(**values),
+            execution_options={"synchronize_session": False},
+        )
+        if result.rowcount != 1:
+            current = db.scalar(select(HomeworkBatch.status).where(HomeworkBatch.id == batch.id))
+            if require_all_done and current == 'active':
+                raise ValueError("还有作业未完成")
+            raise ValueError("批次状态已变更，请刷新后重试")
+
+        # UPDATE 已写入这些值，同步到内存对象，不再标记为脏
+        for key, value in values.items():
+            set_committed_value(batch, key, value)
+        queue_event(db, batch.child_id, "batch.status", batch_id=batch.id, status=to_status)
+        return batch
 
     def activate_batch(self, db: Session, batch_id: int) -> HomeworkBatch:
         """
@@ -160,29 +251,23 @@ class HomeworkService:
         Returns:
             激活后的批次
         """
-        batch = db.query(HomeworkBatch).filter(
-            HomeworkBatch.id == batch_id
-        ).first()
+        # 批次通常已在会话中，get() 直接命中 identity map，无需再次查询
+        batch = db.get(HomeworkBatch, batch_id)
 
         if not batch:
             raise ValueError(f"批次 {batch_id} 不存在")
 
-        # 获取该批次的孩子
-        child_id = batch.child_id
-
-        # 完成之前的 active 批次
-        self.complete_active_batch(db, child_id)
+        return self.transition_batch(db, batch, 'active')
 
-        # 设置 deadline（如果还没有）
-        if batch.deadline_at is None:
-            batch.deadline_at = self.calculate_deadline()
-
-        # 激活当前批次
-        batch.status = 'active'
-        batch.updated_at = datetime.utcnow()
-
-        db.flush()
-        return batch
+    def _all_items_done(self, batch_id: int):
+        """批次至少有一个作业项，且没有未 done 的作业项"""
+        return and_(
+            exists().where(HomeworkItem.batch_id == batch_id),
+            ~exists().where(
+                HomeworkItem.batch_id == batch_id,
+                HomeworkItem.status != 'done',
+            ),
+        )
 
     def check_batch_completion(self, db: Session, batch_id: int) -> bool:
         """
@@ -195,14 +280,121 @@ class HomeworkService:
         Returns:
             是否完成
         """
-        items = db.query(HomeworkItem).filter(
-            HomeworkItem.batch_id == batch_id
-        ).all()
+        return bool(db.scalar(select(self._all_items_done(batch_id))))
+
+    def add_items(
+        self,
+        db: Session,
+        batch: HomeworkBatch,
+        items: Sequence,
+        subjects: Dict[int, Subject],
+    ) -> List[HomeworkItem]:
+        """
+        批量新增作业项（单条 INSERT ... RETURNING，多行 VALUES）
 
+        新作业项会追加到 batch.items（不触发懒加载或额外 flush）
+
+        Args:
+            db: 数据库会话
+            batch: 批次对象
+            items: 作业项数据（需有 subject_id / text / key_concept / source_image_id）
+            subjects: 科目映射 {id: Subject}，调用方需保证包含所有 subject_id
+
+        Returns:
+            新建的作业项（按 id 排序）
+        """
         if not items:
-            return False
+            return []
+
+        rows = [
+            {
+                "batch_id": batch.id,
+                "subject_id": item.subject_id,
+                "text": item.text,
+                "key_concept": item.key_concept,
+                "source_image_id": item.source_image_id,
+                "status": "todo",
+            }
+            for item in items
+        ]
+        new_items = sorted(
+            db.scalars(insert(HomeworkItem).returning(HomeworkItem), rows),
+            key=lambda item: item.id,
+        )
+
+        for item in new_items:
+            set_committed_value(item, "subject", subjects[item.subject_id])
+        set_committed_value(batch, "items", list(batch.items) + new_items)
+
+        return new_items
+
+    def sync_items(
+        self,
+        db: Session,
+        batch: HomeworkBatch,
+        items: Sequence,
+        subjects: Dict[int, Subject],
+    ) -> None:
+        """
+        将批次作业项同步为给定列表（完全替换策略）
+
+        用哈希表一次算出增 / 改 / 删三类变更，再分别批量执行：
+        - 删除：一条 DELETE ... WHERE id IN (...)
+        - 更新：按变更的字段组合分组，每组一条 executemany UPDATE
+        - 新增：一条 INSERT ... RETURNING
 
-        return all(item.status == 'done' for item in items)
+        Args:
+            db: 数据库会话
+            batch: 批次对象（items 应已预加载）
+            items: 作业项数据，有 id 的更新、无 id 的新建；不属于该批次的 id 会被忽略
+            subjects: 科目映射 {id: Subject}，调用方需保证包含所有 subject_id
+        """
+        existing = {item.id: item for item in batch.items}
+        keep_ids = {item.id for item in items if item.id}
+
+        # 删除
+        delete_ids = existing.keys() - keep_ids
+        if delete_ids:
+            db.execute(delete(HomeworkItem).where(HomeworkItem.id.in_(delete_ids)))
+
+        # 更新：只写入实际变化的字段
+        now = datetime.utcnow()
+        updates = []
+        for data in items:
+            item = existing.get(data.id) if data.id else None
+            if item is None:
+                continue
+
+            changes = {}
+            if data.subject_id != item.subject_id:
+                changes["subject_id"] = data.subject_id
+            for field in ("text", "key_concept", "source_image_id"):
+                value = getattr(data, field)
+                if value is not None and value != getattr(item, field):
+                    changes[field] = value
+
+            if changes:
+                changes["updated_at"] = now
+                updates.append((item, changes))
+
+        if updates:
+            # executemany 只合并相邻且字段相同的行，先按字段组合排序
+            updates.sort(key=lambda update_: sorted(update_[1]))
+            db.execute(
+                update(HomeworkItem),
+                [{"id": item.id, **changes} for item, changes in updates],
+            )
+            # 同步内存对象，响应可直接由内存构建
+            for item, changes in updates:
+                for field, value in changes.items():
+                    set_committed_value(item, field, value)
+                set_committed_value(item, "subject", subjects[item.subject_id])
+
+        kept = [item for item_id, item in existing.items() if item_id not in delete_ids]
+        set_committed_value(batch, "items", kept)
+
+        # 新增
+        self.add_items(db, batch, [data for data in items if not data.id], subjects)
 
     def update_batch_completion(self, db: Session, batch: HomeworkBatch) -> None:
         """
@@ -212,10 +404,14 @@ class HomeworkService:
             db: 数据库会话
             batch: 批次对象
         """
-        if self.check_batch_completion(db, batch.id):
-            if batch.status != 'completed':
-                batch.status = 'completed'
-                batch.completed_at = datetime.utcnow()
+        if batch.status != 'active':
+            return
+
+        # 作业项未全部完成时条件 UPDATE 不命中，保持原状态即可
+        try:
+            self.transition_batch(db, batch, 'completed', require_all_done=True)
+        except ValueError:
+            pass
 
 
 # 全局单例
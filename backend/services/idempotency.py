@@ -0,0 +1,143 @@
+"""
+幂等键（Idempotency-Key）
+
+移动网络不稳定时客户端会重试上传和确认；每次重试都重新存图、调用 VLM 或重复写入作业项。
+客户端为一次操作生成 Idempotency-Key，重试时复用：
+- 首个请求插入 pending 记录后处理，响应与业务数据在同一个事务中保存
+- 完成后的重试直接返回保存的响应（响应头 Idempotent-Replayed: true），不再执行任何业务逻辑
+- 首个请求还在处理时，重试返回 409 和 Retry-After；超过 lock_timeout 仍未完成的视为中断，由重试接管
+- 同一个键用于内容不同的请求返回 422
+- 请求失败（抛出异常）时删除 pending 记录，客户端可以用同一个键重试
+记录超过 ttl 后由存储清理（janitor）删除。请求摘要和路由依赖见 api/idempotency.py。
+"""
+from datetime import datetime, timedelta
+
+from fastapi import HTTPException
+from sqlalchemy import delete, update
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy.orm import Session
+
+from backend.models import IdempotencyKey
+
+# 首个请求仍在处理时，建议客户端等待的秒数
+RETRY_AFTER = 2
+
+
+class IdempotencyService:
+    """
+    幂等键记录
+
+    Args:
+        ttl: 记录保留时间（秒）
+        lock_timeout: pending 记录超过多久视为首个请求已中断（秒），应大于最长的处理时间
+    """
+
+    def __init__(self, ttl: int, lock_timeout: int):
+        self.ttl = ttl
+        self.lock_timeout = lock_timeout
+        self.replayed = 0
+
+    def begin(self, db: Session, child_id: int, key: str, fingerprint: str) -> IdempotencyKey:
+        """
+        开始处理一个带幂等键的请求
+
+        Returns:
+            status 为 pending 时记录已提交，由本请求处理；为 done 时包含保存的响应
+        """
+        now = datetime.utcnow()
+        record_id = db.execute(
+            insert(IdempotencyKey)
+            .values(child_id=child_id, key=key, fingerprint=fingerprint, status="pending", created_at=now)
+            .on_conflict_do_nothing()
+            .returning(IdempotencyKey.id)
+        ).scalar()
+        if record_id is not None:
+            db.commit()
+            return IdempotencyKey(id=record_id, child_id=child_id, key=key, fingerprint=fingerprint, status="pending")
+
+        record = (
+            db.query(IdempotencyKey)
+            .filter(IdempotencyKey.child_id == child_id, IdempotencyKey.key == key)
+            .one()
+        )
+        if record.created_at < now - timedelta(seconds=self.ttl):
+            # 已过期但还没被清理：当作新键
+            return self._take_over(db, record, fingerprint, now)
+        if record.fingerprint != fingerprint:
+            db.rollback()
+            raise HTTPException(status_code=422, detail="Idempotency-Key 已用于其他请求")
+        if record.status == "done":
+            db.rollback()
+            self.replayed += 1
+            return record
+        if record.created_at < now - timedelta(seconds=self.lock_timeout):
+            return self._take_over(db, record, fingerprint, now)
+
+        db.rollback()
+        raise HTTPException(
+            status_code=409,
+            detail="相同的请求正在处理中，请稍后重试",
+            headers={"Retry-After": str(RETRY_AFTER)},
+        )
+
+    def _take_over(
+        self, db: Session, record: IdempotencyKey, fingerprint: str, now: datetime
+    ) -> IdempotencyKey:
+        """接管过期或中断的记录（条件更新，并发重试中只有一个成功）"""
+        taken = db.execute(
+            update(IdempotencyKey)
+            .where(IdempotencyKey.id == record.id, IdempotencyKey.created_at == record.created_at)
+            .values(fingerprint=fingerprint, status="pending", status_code=None, response_body=None, created_at=now)
+        ).rowcount
+        db.commit()
+        if not taken:
+            raise HTTPException(
+                status_code=409,
+                detail="相同的请求正在处理中，请稍后重试",
+                headers={"Retry-After": str(RETRY_AFTER)},
+            )
+        return record
+
+    def complete(self, db: Session, record_id: int, status_code: int, body: bytes) -> None:
+        """保存响应（记入当前事务，由调用方与业务数据一起提交）"""
+        db.execute(
+            update(IdempotencyKey)
+            .where(IdempotencyKey.id == record_id)
+            .values(status="done", status_code=status_code, response_body=body.decode())
+        )
+
+    def release(self, db: Session, record_id: int) -> None:
+        """请求失败时删除 pending 记录，允许用同一个键重试"""
+        db.execute(
+            delete(IdempotencyKey)
+            .where(IdempotencyKey.id == record_id, IdempotencyKey.status == "pending")
+        )
+        db.commit()
+
+    def purge_expired(self, db: Session, dry_run: bool = False) -> int:
+        """删除过期记录（由存储清理定时调用，调用方提交）"""
+        expired = IdempotencyKey.created_at < datetime.utcnow() - timedelta(seconds=self.ttl)
+        if dry_run:
+            return db.query(IdempotencyKey.id).filter(expired).count()
+        return db.execute(delete(IdempotencyKey).where(expired)).rowcount
+
+    def stats(self) -> dict:
+        """重试命中次数"""
+        return {"replayed": self.replayed}
+
+
+# 全局单例
+_idempotency_service = None
+
+
+def get_idempotency_service() -> IdempotencyService:
+    """获取幂等键服务单例"""
+    global _idempotency_service
+    if _idempotency_service is None:
+        from backend.config import settings
+
+        _idempotency_service = IdempotencyService(
+            ttl=settings.IDEMPOTENCY_TTL,
+            lock_timeout=settings.IDEMPOTENCY_LOCK_TIMEOUT,
+        )
+    return _idempotency_service
@@ -0,0 +1,416 @@
+"""
+图片存储服务（按内容寻址、去重）
+
+- 文件按 sha256 存放在存储后端（本地目录或对象存储，见 backend.core.storage）的
+  blobs/ab/cd/<sha256>.<ext>，同一内容只存一份；重复上传只读一遍计算摘要，不再写入
+- 每份内容在 image_blobs 中有一行，ref_count 由 batch_images 上的数据库触发器维护，
+  ORM 级联删除、批量 SQL 等写入路径都会计入
+- 删除图片记录只减少引用数，文件由 collect_garbage() 在保留期过后统一删除
+
+GC 与上传并发时：GC 在持有 SQLite 写锁的事务中删除记录和对象，上传在写锁下提交引用，二者串行；
+上传提交后再确认一次文件存在（ensure_saved），恰好被 GC 删掉时重写。
+"""
+import itertools
+import os
+import sys
+import time
+from contextlib import AbstractContextManager
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from pathlib import Path, PurePosixPath
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+from fastapi import UploadFile
+from loguru import logger
+from sqlalchemy import delete, text
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+
+from backend.core.storage import Storage, StoredObject, get_storage
+from backend.core.uploads import UploadInfo, UploadRejected, inspect_file, inspect_upload
+from backend.database import lock_writes
+from backend.models import BatchImage, Child, HomeworkBatch, ImageBlob
+
+# 存储中存放内容寻址文件的前缀
+BLOB_DIR = "blobs"
+# 缩略图等派生图片的子目录（variants/<尺寸名>/ab/cd/<sha256>.webp）
+VARIANT_DIR = "variants"
+# GC 每次查询数据库的文件数（SQLite 单条语句最多 999 个参数）
+GC_CHUNK_SIZE = 500
+# 旧版图片文件的扩展名（上传时沿用客户端文件名的扩展名）
+_LEGACY_SUFFIXES = {".jpg", ".jpeg", ".png", ".webp", ".gif", ".bmp", ".heic"}
+
+
+def blob_sha256(file_path: str) -> Optional[str]:
+    """batch_images.file_path → 内容 sha256；尚未迁入内容寻址存储的旧路径返回 None"""
+    if not file_path.startswith(f"{BLOB_DIR}/"):
+        return None
+    return PurePosixPath(file_path).stem
+
+# batch_images 增删改时维护 image_blobs.ref_count；引用数降为 0 时记下时间，供 GC 判断保留期
+_BLOB_TRIGGERS = (
+    "CREATE TRIGGER IF NOT EXISTS trg_blob_ref_insert AFTER INSERT ON batch_images BEGIN "
+    "UPDATE image_blobs SET ref_count = ref_count + 1, released_at = NULL "
+    "WHERE file_path = NEW.file_path; "
+    "END",
+    "CREATE TRIGGER IF NOT EXISTS trg_blob_ref_delete AFTER DELETE ON batch_images BEGIN "
+    "UPDATE image_blobs SET ref_count = ref_count - 1, "
+    "released_at = CASE WHEN ref_count <= 1 THEN CURRENT_TIMESTAMP ELSE released_at END "
+    "WHERE file_path = OLD.file_path; "
+    "END",
+    "CREATE TRIGGER IF NOT EXISTS trg_blob_ref_update AFTER UPDATE OF file_path ON batch_images "
+    "WHEN OLD.file_path IS NOT NEW.file_path BEGIN "
+    "UPDATE image_blobs SET ref_count = ref_count - 1, "
+    "released_at = CASE WHEN ref_count <= 1 THEN CURRENT_TIMESTAMP ELSE released_at END "
+    "WHERE file_path = OLD.file_path; "
+    "UPDATE image_blobs SET ref_count = ref_count + 1, released_at = NULL "
+    "WHERE file_path = NEW.file_path; "
+    "END",
+)
+
+
+def install_blob_triggers(engine: Engine) -> None:
+    """创建图片引用计数触发器（幂等，启动时调用）"""
+    with engine.begin() as conn:
+        for statement in _BLOB_TRIGGERS:
+            conn.execute(text(statement))
+
+
+@dataclass(frozen=True)
+class StoredImage:
+    """已存入的图片"""
+    file_path: str  # 相对上传目录的路径，写入 batch_images.file_path
+    info: UploadInfo
+    created: bool  # 本次新写入存储；False 表示内容已存在，未写入
+
+
+@dataclass
+class GarbageReport:
+    """一次 GC 的结果"""
+    released: List[str] = field(default_factory=list)  # 不再被引用且过了保留期的内容
+    orphans: List[str] = field(default_factory=list)  # 存储中没有记录的文件（上传中途失败的残留）
+    freed_bytes: int = 0
+
+
+class ImageStore:
+    """
+    按内容寻址的图片存储
+
+    Args:
+        storage: 存储后端
+        max_size: 单个文件最大字节数
+        gc_grace: 内容不再被引用后保留的秒数
+        legacy_root: 旧版按 uuid 命名的图片所在的本地上传目录（迁移用）
+    """
+
+    def __init__(self, storage: Storage, max_size: int, gc_grace: int, legacy_root: Optional[Path] = None):
+        self.storage = storage
+        self.max_size = max_size
+        self.gc_grace = gc_grace
+        self.legacy_root = Path(legacy_root) if legacy_root else None
+
+    def blob_path(self, info: UploadInfo) -> str:
+        """内容对应的相对路径（按摘要前两级分目录，避免单目录文件过多）"""
+        sha = info.sha256
+        return f"{BLOB_DIR}/{sha[:2]}/{sha[2:4]}/{sha}{info.extension}"
+
+    def variant_key(self, sha256: str, variant: str) -> str:
+        """派生图片在存储中的键"""
+        return f"{VARIANT_DIR}/{variant}/{sha256[:2]}/{sha256[2:4]}/{sha256}.webp"
+
+    def local_path(self, file_path: str) -> AbstractContextManager:
+        """以本地文件的形式使用图片（VLM、OCR 需要文件路径），对象存储时下载到临时文件"""
+        return self.storage.local_path(file_path)
+
+    def url(self, file_path: str) -> Optional[str]:
+        """客户端直接下载的地址；None 表示由应用提供文件"""
+        return self.storage.url(file_path)
+
+    async def _put(self, file: UploadFile, image: StoredImage) -> None:
+        file.file.seek(0)
+        await run_in_threadpool(self.storage.put, image.file_path, file.file, image.info.media_type)
+
+    async def save(self, file: UploadFile) -> StoredImage:
+        """
+        存入一个上传文件，内容已存在时不写入
+
+        Raises:
+            UploadRejected: 格式不支持、超过大小限制或空文件
+        """
+        info = await inspect_upload(file, self.max_size)
+        file_path = self.blob_path(info)
+        created = not await run_in_threadpool(self.storage.exists, file_path)
+        image = StoredImage(file_path=file_path, info=info, created=created)
+        if created:
+            await self._put(file, image)
+        return image
+
+    async def save_all(self, files: List[UploadFile]) -> List[Tuple[int, UploadFile, StoredImage]]:
+        """
+        依次存入多个上传文件，跳过不符合要求的文件
+
+        Returns:
+            [(在 files 中的序号, 上传文件, StoredImage)]
+        """
+        stored = []
+        for i, file in enumerate(files):
+            try:
+                stored.append((i, file, await self.save(file)))
+            except UploadRejected as e:
+                logger.warning(f"[ImageStore] 跳过 {file.filename}: {e}")
+        return stored
+
+    def register(self, db: Session, images: Iterable[StoredImage]) -> None:
+        """
+        登记图片内容
+
+        须与引用它们的 batch_images 在同一事务中、且在其插入之前调用，
+        插入触发器才能把引用计入；已登记的内容保持不变
+        """
+        rows = {
+            image.info.sha256: {
+                "sha256": image.info.sha256,
+                "file_path": image.file_path,
+                "size": image.info.size,
+                "media_type": image.info.media_type,
+                "ref_count": 0,
+                # 没有被引用时按已释放处理，过了保留期由 GC 回收
+                "released_at": datetime.utcnow(),
+            }
+            for image in images
+        }
+        if rows:
+            db.execute(sqlite_insert(ImageBlob).values(list(rows.values())).on_conflict_do_nothing())
+
+    def find_owned(self, db: Session, child_id: int, hashes: Iterable[str]) -> Dict[str, StoredImage]:
+        """
+        在孩子上传过的图片中按 sha256 查找
+
+        只比对该孩子自己的图片：既不向其他家庭透露服务器上是否有某张图片，
+        也保证返回的内容仍被引用、不会被 GC 回收
+
+        Returns:
+            {sha256: StoredImage}
+        """
+        hashes = set(hashes)
+        if not hashes:
+            return {}
+        blobs = (
+            db.query(ImageBlob)
+            .join(BatchImage, BatchImage.file_path == ImageBlob.file_path)
+            .join(HomeworkBatch, HomeworkBatch.id == BatchImage.batch_id)
+            .filter(HomeworkBatch.child_id == child_id, ImageBlob.sha256.in_(hashes))
+            .distinct()
+            .all()
+        )
+        return {
+            blob.sha256: StoredImage(
+                file_path=blob.file_path,
+                info=UploadInfo(size=blob.size, sha256=blob.sha256, media_type=blob.media_type),
+                created=False,
+            )
+            for blob in blobs
+        }
+
+    def family_can_read(
+        self,
+        db: Session,
+        family_id: int,
+        file_path: Optional[str] = None,
+        sha256: Optional[str] = None,
+    ) -> bool:
+        """
+        家庭是否有权查看图片（家庭中任一孩子的批次引用了它）
+
+        Args:
+            file_path: batch_images.file_path（原图）
+            sha256: 内容摘要（派生图片）
+        """
+        query = (
+            db.query(BatchImage.id)
+            .join(HomeworkBatch, HomeworkBatch.id == BatchImage.batch_id)
+            .join(Child, Child.id == HomeworkBatch.child_id)
+            .filter(Child.family_id == family_id)
+        )
+        if file_path is not None:
+            query = query.filter(BatchImage.file_path == file_path)
+        elif sha256 is not None:
+            query = query.join(ImageBlob, ImageBlob.file_path == BatchImage.file_path).filter(
+                ImageBlob.sha256 == sha256
+            )
+        else:
+            return False
+        return db.query(query.exists()).scalar()
+
+    async def ensure_saved(self, stored: Iterable[Tuple[int, UploadFile, StoredImage]]) -> None:
+        """提交后确认文件都在；极少数情况下恰好被并发的 GC 删除，此时用上传内容重写"""
+        for _, file, image in stored:
+            if not await run_in_threadpool(self.storage.exists, image.file_path):
+                logger.warning(f"[ImageStore] {image.file_path} 在提交前被回收，重新写入")
+                await self._put(file, image)
+
+    def collect_garbage(self, db: Session, dry_run: bool = False) -> GarbageReport:
+        """
+        删除不再被引用、且过了保留期的图片文件，以及存储中没有记录的残留文件
+        （上传中途失败留下的文件、原图已回收的派生图片、没有被引用的旧版文件）
+
+        Args:
+            db: 数据库会话（非 dry_run 时会提交）
+            dry_run: 只统计，不删除
+
+        Returns:
+            GarbageReport
+        """
+        report = GarbageReport()
+        cutoff = datetime.utcnow() - timedelta(seconds=self.gc_grace)
+        expired = (ImageBlob.ref_count <= 0, ImageBlob.released_at < cutoff)
+
+        # 非 dry_run 时 DELETE 会取得写锁并持有到提交，期间的上传提交会等待，不会与删除文件交错
+        if dry_run:
+            rows = db.query(ImageBlob.file_path, ImageBlob.size).filter(*expired).all()
+        else:
+            rows = db.execute(
+                delete(ImageBlob).where(*expired).returning(ImageBlob.file_path, ImageBlob.size)
+            ).all()
+        for file_path, size in rows:
+            report.released.append(file_path)
+            report.freed_bytes += size
+            if not dry_run:
+                self.storage.delete(file_path)
+        if not dry_run:
+            db.commit()
+
+        # 没有记录的内容文件、原图已不在记录中的派生图片、没有被引用的旧版文件：
+        # 流式遍历存储，每 GC_CHUNK_SIZE 个超过保留期的文件查一次数据库，内存占用与文件总数无关。
+        # 每块在写锁下查询并删除，与上传提交串行（理由同上），写锁只持有一块的时间
+        mtime_cutoff = time.time() - self.gc_grace
+        for objects, find_known, remove in self._sweep_sources():
+            stale = (obj for obj in objects if obj.modified < mtime_cutoff)
+            for chunk in _chunked(stale, GC_CHUNK_SIZE):
+                if not dry_run:
+                    lock_writes(db)
+                known = find_known(db, [obj.key for obj in chunk])
+                for obj in chunk:
+                    if obj.key in known:
+                        continue
+                    report.orphans.append(obj.key)
+                    report.freed_bytes += obj.size
+                    if not dry_run:
+                        remove(obj.key)
+                if not dry_run:
+                    db.commit()
+
+        if report.released or report.orphans:
+            logger.info(
+                f"[ImageStore] GC{'（dry run）' if dry_run else ''}: "
+                f"{len(report.released)} 个已释放，{len(report.orphans)} 个残留，"
+                f"{report.freed_bytes / 1024 / 1024:.1f}MB"
+            )
+        return report
+
+    def _sweep_sources(self) -> Iterator[Tuple[Iterable[StoredObject], Callable, Callable]]:
+        """GC 遍历的文件来源：(文件迭代器, 按键批量查询仍有记录的键, 删除函数)"""
+        yield self.storage.iter_objects(f"{BLOB_DIR}/"), _known_blobs, self.storage.delete
+        yield self.storage.iter_objects(f"{VARIANT_DIR}/"), _known_variants, self.storage.delete
+        if self.legacy_root is not None:
+            yield self._legacy_files(), _known_legacy, lambda key: (self.legacy_root / key).unlink(missing_ok=True)
+
+    def _legacy_files(self) -> Iterator[StoredObject]:
+        """本地上传目录顶层的旧版图片文件（按 uuid 命名，不在 blobs/ 等子目录中）"""
+        try:
+            entries = os.scandir(self.legacy_root)
+        except FileNotFoundError:
+            return
+        with entries:
+            for entry in entries:
+                if not entry.is_file(follow_symlinks=False) or Path(entry.name).suffix.lower() not in _LEGACY_SUFFIXES:
+                    continue
+                stat = entry.stat()
+                yield StoredObject(key=entry.name, size=stat.st_size, modified=stat.st_mtime)
+
+    def migrate_legacy_files(self, db: Session) -> int:
+        """
+        把旧版按 uuid 命名的图片迁入内容寻址存储（幂等，启动时调用）
+
+        旧文件在本地上传目录中：先写入存储并提交记录，再删除旧文件，中途退出时旧文件仍在，下次启动重做即可
+
+        Returns:
+            迁移的文件数
+        """
+        legacy_paths = [
+            file_path
+            for (file_path,) in db.query(BatchImage.file_path)
+            .filter(~BatchImage.file_path.startswith(f"{BLOB_DIR}/"))
+            .distinct()
+        ]
+        if not legacy_paths or self.legacy_root is None:
+            return 0
+
+        migrated = []
+        for old_path in legacy_paths:
+            source = self.legacy_root / old_path
+            try:
+                with open(source, "rb") as f:
+                    info = inspect_file(f, sys.maxsize)
+                    new_path = self.blob_path(info)
+                    if not self.storage.exists(new_path):
+                        f.seek(0)
+                        self.storage.put(new_path, f, info.media_type)
+            except (OSError, UploadRejected) as e:
+                logger.warning(f"[ImageStore] 跳过旧图片 {old_path}: {e}")
+                continue
+
+            self.register(db, [StoredImage(file_path=new_path, info=info, created=False)])
+            db.query(BatchImage).filter(BatchImage.file_path == old_path).update(
+                {BatchImage.file_path: new_path}, synchronize_session=False
+            )
+            migrated.append(source)
+
+        db.commit()
+        for source in migrated:
+            source.unlink(missing_ok=True)
+        if migrated:
+            logger.info(f"[ImageStore] 已迁移 {len(migrated)} 个旧图片文件")
+        return len(migrated)
+
+
+def _chunked(iterable: Iterable, size: int) -> Iterator[list]:
+    iterator = iter(iterable)
+    while chunk := list(itertools.islice(iterator, size)):
+        yield chunk
+
+
+def _known_blobs(db: Session, keys: List[str]) -> Set[str]:
+    return {key for (key,) in db.query(ImageBlob.file_path).filter(ImageBlob.file_path.in_(keys))}
+
+
+def _known_variants(db: Session, keys: List[str]) -> Set[str]:
+    # variants/<尺寸名>/ab/cd/<sha256>.webp → sha256
+    hashes = {PurePosixPath(key).name.split(".", 1)[0]: key for key in keys}
+    found = {sha for (sha,) in db.query(ImageBlob.sha256).filter(ImageBlob.sha256.in_(hashes))}
+    return {key for key in keys if PurePosixPath(key).name.split(".", 1)[0] in found}
+
+
+def _known_legacy(db: Session, keys: List[str]) -> Set[str]:
+    return {key for (key,) in db.query(BatchImage.file_path).filter(BatchImage.file_path.in_(keys))}
+
+
+# 全局单例
+_image_store = None
+
+
+def get_image_store() -> ImageStore:
+    """获取图片存储单例"""
+    global _image_store
+    if _image_store is None:
+        from backend.config import settings
+
+        _image_store = ImageStore(
+            storage=get_storage(),
+            max_size=settings.MAX_UPLOAD_SIZE,
+            gc_grace=settings.IMAGE_GC_GRACE,
+            legacy_root=settings.UPLOAD_DIR,
+        )
+    return _image_store
@@ -0,0 +1,124 @@
+"""
+派生图片服务（缩略图、中等尺寸）
+
+列表和图片条只需要小图，不必下载几 MB 的原图：
+- 上传提交后在后台线程池中生成各尺寸的 WebP
+- 旧图片（或后台尚未生成完）在第一次请求时生成，同一张图同一尺寸并发请求只生成一次
+- 派生图片按原图 sha256 命名，内容不会变化，可以按不可变资源长期缓存
+- 与原图存在同一个存储后端中；对象存储时在内存中编码后直接上传
+"""
+import asyncio
+import io
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, Optional, Tuple
+
+from loguru import logger
+from PIL import Image, ImageOps
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+
+from backend.models import ImageBlob
+from backend.services.image_store import ImageStore, StoredImage, get_image_store
+
+# 尺寸名 → (最长边像素, WebP 质量)
+# thumb：图片条、编辑页缩略图（12rem 方框按 2 倍屏裁切）；medium：全屏查看
+VARIANTS: Dict[str, Tuple[int, int]] = {
+    "thumb": (480, 70),
+    "medium": (1600, 80),
+}
+
+
+class ImageVariantService:
+    """
+    派生图片服务
+
+    Args:
+        store: 图片存储
+        workers: 后台生成线程数（Pillow 解码、缩放、编码时释放 GIL）
+    """
+
+    def __init__(self, store: ImageStore, workers: int = 2):
+        self.store = store
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="image-variant")
+        self._pending: Dict[Tuple[str, str], Future] = {}
+        self._lock = threading.Lock()
+
+    def schedule(self, image: StoredImage) -> None:
+        """在后台生成一张图片的所有尺寸（上传提交后调用）"""
+        for variant in VARIANTS:
+            self._submit(image.info.sha256, image.file_path, variant)
+
+    async def get(self, db: Session, sha256: str, variant: str) -> Optional[str]:
+        """
+        获取派生图片，不存在时生成（等待后台正在进行的生成）
+
+        Returns:
+            存储中的键；原图不存在或无法解码时返回 None
+        """
+        key = self.store.variant_key(sha256, variant)
+        if await run_in_threadpool(self.store.storage.exists, key):
+            return key
+
+        blob = db.get(ImageBlob, sha256)
+        if blob is None:
+            return None
+        try:
+            await asyncio.wrap_future(self._submit(sha256, blob.file_path, variant))
+        except Exception:
+            # 失败原因已在 _finished 中记录
+            return None
+        return key
+
+    def _submit(self, sha256: str, file_path: str, variant: str) -> Future:
+        key = (sha256, variant)
+        with self._lock:
+            future = self._pending.get(key)
+            if future is None:
+                future = self._executor.submit(self._generate, sha256, file_path, variant)
+                self._pending[key] = future
+                future.add_done_callback(lambda f: self._finished(key, f))
+        return future
+
+    def _finished(self, key: Tuple[str, str], future: Future) -> None:
+        with self._lock:
+            self._pending.pop(key, None)
+        if future.exception() is not None:
+            logger.warning(f"[ImageVariant] 生成 {key[1]} 失败 {key[0]}: {future.exception()}")
+
+    def _generate(self, sha256: str, file_path: str, variant: str) -> None:
+        """在线程池中执行：生成一个尺寸的 WebP"""
+        storage = self.store.storage
+        key = self.store.variant_key(sha256, variant)
+        if storage.exists(key):
+            return
+
+        max_side, quality = VARIANTS[variant]
+        buffer = io.BytesIO()
+        with self.store.local_path(file_path) as source, Image.open(source) as img:
+            # JPEG 解码时直接按 1/2、1/4、1/8 缩小，省去大部分解码时间和内存
+            img.draft("RGB", (max_side, max_side))
+            img = ImageOps.exif_transpose(img)
+            if img.mode not in ("RGB", "RGBA"):
+                img = img.convert("RGBA" if "transparency" in img.info or "A" in img.getbands() else "RGB")
+            img.thumbnail((max_side, max_side), Image.Resampling.LANCZOS, reducing_gap=2.0)
+            img.save(buffer, "WEBP", quality=quality, method=4)
+
+        buffer.seek(0)
+        storage.put(key, buffer, "image/webp")
+
+
+# 全局单例
+_image_variant_service = None
+
+
+def get_image_variant_service() -> ImageVariantService:
+    """获取派生图片服务单例"""
+    global _image_variant_service
+    if _image_variant_service is None:
+        from backend.config import settings
+
+        _image_variant_service = ImageVariantService(
+            store=get_image_store(), workers=settings.IMAGE_VARIANT_WORKERS
+        )
+    return _image_variant_service
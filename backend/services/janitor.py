@@ -0,0 +1,176 @@
+"""
+存储清理（后台定时任务）
+
+- 过期草稿：超过 DRAFT_TTL 没有更新的草稿批次软删除，作业项、图片记录和 VLM 解析结果
+  由批次清理任务批量删除（见 batch_purge），图片引用数随之减少
+- 图片 GC：不再被引用的图片、存储中没有记录的残留文件（见 ImageStore.collect_garbage）
+- 过期的幂等键记录（超过 IDEMPOTENCY_TTL，见 services/idempotency.py）
+
+启动后立即执行一次，之后每 JANITOR_INTERVAL 秒在线程池中执行，不阻塞事件循环；
+dry_run 时只统计可回收的内容，不删除。多个 worker 各自执行时由 SQLite 写锁串行，结果不变。
+"""
+import asyncio
+import time
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import Optional, Tuple
+
+from loguru import logger
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+
+from backend.database import SessionLocal
+from backend.models import BatchImage, HomeworkBatch
+from backend.services.batch_purge import mark_batches_deleted
+from backend.services.idempotency import IdempotencyService, get_idempotency_service
+from backend.services.image_store import GC_CHUNK_SIZE, GarbageReport, ImageStore, get_image_store
+
+
+@dataclass
+class JanitorReport:
+    """一次清理的结果"""
+    dry_run: bool = False
+    drafts: int = 0  # 删除的过期草稿数
+    draft_images: int = 0  # 随草稿清理的图片记录数
+    parse_result_bytes: int = 0  # 随草稿清理的 VLM 解析结果大小
+    idempotency_keys: int = 0  # 删除的过期幂等键记录数
+    garbage: GarbageReport = field(default_factory=GarbageReport)
+    seconds: float = 0.0
+
+    @property
+    def freed_bytes(self) -> int:
+        return self.parse_result_bytes + self.garbage.freed_bytes
+
+    def summary(self) -> dict:
+        return {
+            "dry_run": self.dry_run,
+            "drafts": self.drafts,
+            "draft_images": self.draft_images,
+            "idempotency_keys": self.idempotency_keys,
+            "released": len(self.garbage.released),
+            "orphans": len(self.garbage.orphans),
+            "freed_bytes": self.freed_bytes,
+            "seconds": round(self.seconds, 3),
+        }
+
+
+class StorageJanitor:
+    """
+    存储清理
+
+    Args:
+        store: 图片存储
+        idempotency: 幂等键记录
+        draft_ttl: 草稿多久没有更新后删除（秒），0 表示不删除草稿
+        interval: 定时执行间隔（秒），0 表示只在启动时执行一次
+    """
+
+    def __init__(self, store: ImageStore, idempotency: IdempotencyService, draft_ttl: int, interval: int):
+        self.store = store
+        self.idempotency = idempotency
+        self.draft_ttl = draft_ttl
+        self.interval = interval
+        self.last_run: Optional[datetime] = None
+        self.last_report: Optional[JanitorReport] = None
+
+    def expire_drafts(self, db: Session, dry_run: bool = False) -> Tuple[int, int, int]:
+        """
+        软删除过期草稿（一条条件 UPDATE，与确认、编辑草稿互斥），由批次清理任务批量删除
+
+        Returns:
+            (草稿数, 图片记录数, VLM 解析结果字节数)
+        """
+        if self.draft_ttl <= 0:
+            return 0, 0, 0
+
+        cutoff = datetime.utcnow() - timedelta(seconds=self.draft_ttl)
+        expired = (
+            HomeworkBatch.status == "draft",
+            func.coalesce(HomeworkBatch.updated_at, HomeworkBatch.created_at) < cutoff,
+        )
+        if dry_run:
+            batch_ids = [batch_id for (batch_id,) in db.query(HomeworkBatch.id).filter(*expired)]
+        else:
+            batch_ids = [batch_id for batch_id, _ in mark_batches_deleted(db, *expired)]
+        if not batch_ids:
+            db.rollback()
+            return 0, 0, 0
+
+        images = parse_bytes = 0
+        for start in range(0, len(batch_ids), GC_CHUNK_SIZE):
+            chunk = batch_ids[start:start + GC_CHUNK_SIZE]
+            images += db.query(func.count(BatchImage.id)).filter(BatchImage.batch_id.in_(chunk)).scalar()
+            parse_bytes += (
+                db.query(func.coalesce(func.sum(func.length(HomeworkBatch.vlm_parse_result)), 0))
+                .filter(HomeworkBatch.id.in_(chunk))
+                .execution_options(include_deleted=True)
+                .scalar()
+            )
+        if dry_run:
+            db.rollback()
+        else:
+            db.commit()
+        return len(batch_ids), images, parse_bytes
+
+    def run(self, dry_run: bool = False) -> JanitorReport:
+        """执行一次清理（同步，在线程池中调用）"""
+        started = time.perf_counter()
+        report = JanitorReport(dry_run=dry_run)
+        with SessionLocal() as db:
+            report.drafts, report.draft_images, report.parse_result_bytes = self.expire_drafts(db, dry_run)
+            report.idempotency_keys = self.idempotency.purge_expired(db, dry_run)
+            if dry_run:
+                db.rollback()
+            else:
+                db.commit()
+            # 草稿清理后其图片才进入保留期，保留期过后的下一次执行回收文件
+            report.garbage = self.store.collect_garbage(db, dry_run)
+        report.seconds = time.perf_counter() - started
+
+        self.last_run = datetime.utcnow()
+        self.last_report = report
+        if report.drafts or report.garbage.released or report.garbage.orphans:
+            logger.info(
+                f"[Janitor] {'（dry run）' if dry_run else ''}过期草稿 {report.drafts} 个"
+                f"（{report.draft_images} 张图片），回收 {report.freed_bytes / 1024 / 1024:.1f}MB，"
+                f"用时 {report.seconds:.2f}s"
+            )
+        return report
+
+    async def run_forever(self, dry_run: bool = False) -> None:
+        """后台定时执行（启动时创建任务）"""
+        while True:
+            try:
+                await run_in_threadpool(self.run, dry_run)
+            except Exception as e:  # 单次失败不影响下次执行
+                logger.exception(f"[Janitor] 清理失败: {e}")
+            if self.interval <= 0:
+                return
+            await asyncio.sleep(self.interval)
+
+    def stats(self) -> dict:
+        """最近一次执行的结果"""
+        return {
+            "last_run": self.last_run.isoformat() if self.last_run else None,
+            "last_report": self.last_report.summary() if self.last_report else None,
+        }
+
+
+# 全局单例
+_storage_janitor = None
+
+
+def get_storage_janitor() -> StorageJanitor:
+    """获取存储清理单例"""
+    global _storage_janitor
+    if _storage_janitor is None:
+        from backend.config import settings
+
+        _storage_janitor = StorageJanitor(
+            store=get_image_store(),
+            idempotency=get_idempotency_service(),
+            draft_ttl=settings.DRAFT_TTL,
+            interval=settings.JANITOR_INTERVAL,
+        )
+    return _storage_janitor
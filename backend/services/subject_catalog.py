@@ -0,0 +1,136 @@
+"""
+科目目录缓存服务
+科目是系统级数据，几乎不变；进程内保存一份带版本号的只读快照，写入科目后才重新加载
+"""
+import hashlib
+import threading
+from typing import Dict, Iterable, List, Optional
+
+from loguru import logger
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from backend.database import SessionLocal
+from backend.models import Subject
+
+
+class SubjectCatalog:
+    """
+    科目目录快照（不可变）
+
+    subjects 中是已脱离会话的 Subject 对象，只读，不要修改。
+    需要挂到 ORM 关系上时，用 bind() 合并进当前会话。
+    """
+
+    def __init__(self, version: int, subjects: List[Subject]):
+        self.version = version
+        self.subjects = tuple(subjects)
+        self._by_id: Dict[int, Subject] = {s.id: s for s in subjects}
+
+        # ETag 由内容摘要生成，进程重启后版本号归零也不会误判为未修改
+        digest = hashlib.sha1(
+            repr([(s.id, s.name, s.color, s.sort_order) for s in subjects]).encode()
+        ).hexdigest()[:16]
+        self.etag = f'W/"subjects-{digest}"'
+
+    def __contains__(self, subject_id: int) -> bool:
+        return subject_id in self._by_id
+
+    def get(self, subject_id: int) -> Optional[Subject]:
+        """按 ID 获取科目（脱离会话的只读对象）"""
+        return self._by_id.get(subject_id)
+
+    def as_dicts(self) -> List[Dict]:
+        """科目列表 [{"id": 1, "name": "数学"}, ...]，供解析服务使用"""
+        return [{"id": s.id, "name": s.name} for s in self.subjects]
+
+    def bind(self, db: Session, subject_ids: Optional[Iterable[int]] = None) -> Dict[int, Subject]:
+        """
+        把科目合并进会话（merge load=False，不查库）
+
+        Args:
+            db: 数据库会话
+            subject_ids: 需要的科目ID，为空时合并全部科目
+
+        Returns:
+            {科目ID: 会话中的 Subject}，不存在的 ID 不在结果中
+        """
+        if subject_ids is None:
+            subject_ids = self._by_id.keys()
+        return {
+            subject_id: db.merge(self._by_id[subject_id], load=False)
+            for subject_id in set(subject_ids)
+            if subject_id in self._by_id
+        }
+
+
+class SubjectCatalogService:
+    """科目目录缓存服务"""
+
+    def __init__(self):
+        self._catalog: Optional[SubjectCatalog] = None
+        self._version = 0
+        self._stale = True
+        self._lock = threading.Lock()
+
+    def get_catalog(self) -> SubjectCatalog:
+        """获取当前科目目录，过期时重新加载"""
+        if self._stale:
+            with self._lock:
+                if self._stale:
+                    self._reload()
+        return self._catalog
+
+    def invalidate(self) -> None:
+        """标记目录过期，下次访问时重新加载"""
+        self._stale = True
+
+    def _reload(self) -> None:
+        # 使用独立会话加载，避免把请求会话里的对象移出 identity map
+        db = SessionLocal()
+        try:
+            subjects = db.query(Subject).order_by(Subject.sort_order).all()
+            db.expunge_all()
+        finally:
+            db.close()
+
+        self._version += 1
+        self._catalog = SubjectCatalog(self._version, subjects)
+        self._stale = False
+        logger.info(f"[SubjectCatalog] 已加载 {len(subjects)} 个科目，版本 {self._version}")
+
+
+# 全局单例
+_subject_catalog_service = None
+
+
+def get_subject_catalog_service() -> SubjectCatalogService:
+    """获取科目目录服务单例"""
+    global _subject_catalog_service
+    if _subject_catalog_service is None:
+        _subject_catalog_service = SubjectCatalogService()
+    return _subject_catalog_service
+
+
+# ==================== 变更失效 ====================
+
+_PENDING_KEY = "subject_catalog_changed"
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_subject_changes(session, flush_context):
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        if isinstance(obj, Subject):
+            session.info[_PENDING_KEY] = True
+            return
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_subject_catalog(session):
+    if session.info.pop(_PENDING_KEY, False):
+        get_subject_catalog_service().invalidate()
+
+
+@event.listens_for(Session, "after_soft_rollback")
+def _discard_subject_changes(session, previous_transaction):
+    session.info.pop(_PENDING_KEY, None)
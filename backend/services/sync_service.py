@@ -0,0 +1,164 @@
+"""
+增量同步服务
+客户端带上次拿到的游标（seq）来取之后新增、修改、删除的批次、作业项和图片
+
+变更日志 sync_changes 由 SQLite 触发器维护，而不是 ORM 事件：
+批量 UPDATE/DELETE（如 complete_active_batch、transition_batch）不经过 flush，
+触发器能覆盖所有写入路径。SQLite 同一时刻只有一个写事务，seq 的分配顺序就是提交顺序，
+读到 seq=N 时不会再出现更小的 seq 提交。
+"""
+from dataclasses import dataclass, field
+from typing import Dict, List
+
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+
+from backend.models import BatchImage, HomeworkBatch, HomeworkItem, SyncChange
+
+
+# 实体 → (表名, child_id 表达式, batch_id 表达式)，表达式中的 {row} 替换为 NEW / OLD
+_SYNC_TABLES = {
+    "batch": ("homework_batches", "{row}.child_id", "{row}.id"),
+    "item": (
+        "homework_items",
+        "(SELECT child_id FROM homework_batches WHERE id = {row}.batch_id)",
+        "{row}.batch_id",
+    ),
+    "image": (
+        "batch_images",
+        "(SELECT child_id FROM homework_batches WHERE id = {row}.batch_id)",
+        "{row}.batch_id",
+    ),
+}
+
+# 实体 → 响应中的分组名
+_GROUPS = {"batch": "batches", "item": "items", "image": "images"}
+
+# 软删除的实体：UPDATE 时按此条件记为删除（墓碑）
+_SOFT_DELETED = {"batch": "NEW.deleted_at IS NOT NULL"}
+
+
+def _trigger_ddl(entity: str, table: str, child_expr: str, batch_expr: str) -> List[str]:
+    statements = []
+    update_deleted = _SOFT_DELETED.get(entity, "0")
+    for op, row, deleted in (("INSERT", "NEW", "0"), ("UPDATE", "NEW", update_deleted), ("DELETE", "OLD", "1")):
+        statements.append(f"DROP TRIGGER IF EXISTS trg_sync_{entity}_{op.lower()}")
+        statements.append(
+            f"CREATE TRIGGER trg_sync_{entity}_{op.lower()} "
+            f"AFTER {op} ON {table} BEGIN "
+            f"INSERT OR REPLACE INTO sync_changes (entity, entity_id, child_id, batch_id, deleted, changed_at) "
+            f"VALUES ('{entity}', {row}.id, {child_expr.format(row=row)}, {batch_expr.format(row=row)}, "
+            f"{deleted}, CURRENT_TIMESTAMP); "
+            f"END"
+        )
+    return statements
+
+
+def install_sync_triggers(engine: Engine) -> None:
+    """
+    创建变更日志触发器，并为尚无记录的已有数据补写变更行（幂等，启动时调用）
+
+    删除批次时先软删除（批次记为墓碑），后台清理再删作业项和图片、最后删批次，子表触发器仍能查到 child_id；
+    客户端收到批次墓碑时也应一并删除该批次下的作业项和图片。
+    触发器每次启动时重建，定义变化后自动生效。
+    """
+    with engine.begin() as conn:
+        for entity, (table, child_expr, batch_expr) in _SYNC_TABLES.items():
+            for statement in _trigger_ddl(entity, table, child_expr, batch_expr):
+                conn.execute(text(statement))
+            conn.execute(text(
+                f"INSERT OR IGNORE INTO sync_changes (entity, entity_id, child_id, batch_id, deleted) "
+                f"SELECT '{entity}', id, {child_expr.format(row=table)}, "
+                f"{batch_expr.format(row=table)}, 0 FROM {table}"
+            ))
+
+
+@dataclass
+class SyncChangeSet:
+    """一页变更"""
+    cursor: int  # 下次请求的 since
+    has_more: bool
+    batches: List[HomeworkBatch] = field(default_factory=list)
+    items: List[HomeworkItem] = field(default_factory=list)
+    images: List[BatchImage] = field(default_factory=list)
+    deleted: Dict[str, List[int]] = field(
+        default_factory=lambda: {group: [] for group in _GROUPS.values()}
+    )
+
+
+class SyncService:
+    """增量同步服务"""
+
+    def changes_since(self, db: Session, child_id: int, since: int, limit: int) -> SyncChangeSet:
+        """
+        获取游标之后的变更
+
+        同一实体多次修改只保留最新一行，所以每个实体在结果中最多出现一次。
+        实体在读取变更行之后又被修改或删除时，本页可能带上更新的数据或缺少该实体，
+        其更大的 seq 会在下一次同步中出现。
+
+        Args:
+            db: 数据库会话
+            child_id: 孩子ID
+            since: 上次同步的游标，0 表示全量
+            limit: 每页最多变更数
+
+        Returns:
+            SyncChangeSet
+        """
+        rows = (
+            db.query(SyncChange.seq, SyncChange.entity, SyncChange.entity_id, SyncChange.deleted)
+            .filter(SyncChange.child_id == child_id, SyncChange.seq > since)
+            .order_by(SyncChange.seq)
+            .limit(limit + 1)
+            .all()
+        )
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+
+        result = SyncChangeSet(cursor=rows[-1].seq if rows else since, has_more=has_more)
+        upserts = {entity: [] for entity in _GROUPS}
+        for row in rows:
+            if row.deleted:
+                result.deleted[_GROUPS[row.entity]].append(row.entity_id)
+            else:
+                upserts[row.entity].append(row.entity_id)
+
+        if upserts["batch"]:
+            result.batches = (
+                db.query(HomeworkBatch)
+                .filter(HomeworkBatch.id.in_(upserts["batch"]))
+                .order_by(HomeworkBatch.id)
+                .all()
+            )
+        if upserts["item"]:
+            # join 批次：已软删除、尚未清理的批次下的作业项和图片不返回
+            result.items = (
+                db.query(HomeworkItem)
+                .join(HomeworkItem.batch)
+                .filter(HomeworkItem.id.in_(upserts["item"]))
+                .order_by(HomeworkItem.id)
+                .all()
+            )
+        if upserts["image"]:
+            result.images = (
+                db.query(BatchImage)
+                .join(BatchImage.batch)
+                .filter(BatchImage.id.in_(upserts["image"]))
+                .order_by(BatchImage.id)
+                .all()
+            )
+        return result
+
+
+# 全局单例
+_sync_service = None
+
+
+def get_sync_service() -> SyncService:
+    """获取增量同步服务单例"""
+    global _sync_service
+    if _sync_service is None:
+        _sync_service = SyncService()
+    return _sync_service
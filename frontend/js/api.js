@@ -28,6 +28,47 @@ async function handleResponse(response) {
     return response.json();
 }
 
+// 计算文件的 sha256（十六进制）；非安全上下文（如 http 局域网访问）没有 crypto.subtle，返回 null
+async function hashFiles(files) {
+    if (!window.crypto || !window.crypto.subtle || files.length > 50) {
+        return null;
+    }
+    return Promise.all(files.map(async file => {
+        const digest = await window.crypto.subtle.digest('SHA-256', await file.arrayBuffer());
+        return Array.from(new Uint8Array(digest), b => b.toString(16).padStart(2, '0')).join('');
+    }));
+}
+
+// 生成幂等键；非安全上下文没有 crypto.randomUUID，退回随机字符串
+function newIdempotencyKey() {
+    if (window.crypto && window.crypto.randomUUID) {
+        return window.crypto.randomUUID();
+    }
+    return `${Date.now().toString(36)}-${Math.random().toString(36).slice(2)}${Math.random().toString(36).slice(2)}`;
+}
+
+// 带 Idempotency-Key 的写请求：网络中断或首个请求仍在处理（409 + Retry-After）时用同一个键重试，
+// 服务器对同一个键只执行一次，重试拿到的是首次的结果
+async function fetchIdempotent(url, options, attempts = 4) {
+    const headers = { ...options.headers, 'Idempotency-Key': newIdempotencyKey() };
+    for (let attempt = 1; ; attempt++) {
+        let response;
+        try {
+            response = await fetch(url, { ...options, headers });
+        } catch (e) {
+            if (attempt >= attempts) throw e;
+            await new Promise(resolve => setTimeout(resolve, 1000 * attempt));
+            continue;
+        }
+        const retryAfter = response.headers.get('Retry-After');
+        if (response.status === 409 && retryAfter && attempt < attempts) {
+            await new Promise(resolve => setTimeout(resolve, Number(retryAfter) * 1000));
+            continue;
+        }
+        return response;
+    }
+}
+
 // API 对象
 const api = {
     // 获取当前批次
@@ -47,6 +88,15 @@ const api = {
         return handleResponse(response);
     },
 
+    // 获取批次摘要列表（游标分页）
+    async getBatchSummaries(params = {}) {
+        const query = new URLSearchParams(params).toString();
+        const response = await fetch(`${API_BASE}/api/batches/summary?${query}`, {
+            headers: getAuthHeaders()
+        });
+        return handleResponse(response);
+    },
+
     // 获取批次详情
     async getBatch(batchId) {
         const response = await fetch(`${API_BASE}/api/batches/${batchId}`, {
@@ -55,6 +105,22 @@ const api = {
         return handleResponse(response);
     },
 
+    // 获取今日作业页面数据（批次、分组作业项、图片、倒计时）
+    async getTodayView(batchId) {
+        const response = await fetch(`${API_BASE}/api/batches/${batchId}/today`, {
+            headers: getAuthHeaders()
+        });
+        return handleResponse(response);
+    },
+
+    // 增量同步：获取 since 游标之后变更的批次、作业项、图片和墓碑
+    async sync(since = 0) {
+        const response = await fetch(`${API_BASE}/api/sync?since=${since}`, {
+            headers: getAuthHeaders()
+        });
+        return handleResponse(response);
+    },
+
     // 获取批次作业项
     async getBatchItems(batchId, params = {}) {
         const query = new URLSearchParams(params).toString();
@@ -174,13 +240,46 @@ const api = {
     // ==================== V1 API (使用 VLM) ====================
 
     // V1: 上传图片创建 draft 批次（使用 VLM 解析）
+    // 先用 sha256 预检，服务器已有的图片只发送引用，不再上传文件内容
     async v1UploadDraft(files) {
+        const hashes = await hashFiles(files).catch(() => null);
+        if (hashes) {
+            const preflight = await fetch(`${API_BASE}/api/v1/upload/preflight`, {
+                method: 'POST',
+                headers: { ...getAuthHeaders(), 'Content-Type': 'application/json' },
+                body: JSON.stringify({ hashes })
+            });
+            const known = new Set(preflight.ok ? (await preflight.json()).known : []);
+
+            if (known.size > 0) {
+                const formData = new FormData();
+                const manifest = files.map((file, i) => {
+                    if (known.has(hashes[i])) {
+                        return { sha256: hashes[i], file_name: file.name };
+                    }
+                    formData.append('files', file);
+                    return { file: formData.getAll('files').length - 1 };
+                });
+                formData.append('manifest', JSON.stringify(manifest));
+
+                const response = await fetchIdempotent(`${API_BASE}/api/v1/upload/draft`, {
+                    method: 'POST',
+                    headers: getAuthHeaders(),
+                    body: formData
+                });
+                // 409：预检后图片已被删除，退回完整上传
+                if (response.status !== 409) {
+                    return handleResponse(response);
+                }
+            }
+        }
+
         const formData = new FormData();
         files.forEach(file => {
             formData.append('files', file);
         });
 
-        const response = await fetch(`${API_BASE}/api/v1/upload/draft`, {
+        const response = await fetchIdempotent(`${API_BASE}/api/v1/upload/draft`, {
             method: 'POST',
             headers: getAuthHeaders(),
             body: formData
@@ -190,7 +289,7 @@ const api = {
 
     // V1: 确认批次（支持图片分类）
     async v1ConfirmBatch(batchId, items, imageClassification, deadlineAt) {
-        const response = await fetch(`${API_BASE}/api/v1/upload/${batchId}/confirm`, {
+        const response = await fetchIdempotent(`${API_BASE}/api/v1/upload/${batchId}/confirm`, {
             method: 'POST',
             headers: { ...getAuthHeaders(), 'Content-Type': 'application/json' },
             body: JSON.stringify({
@@ -250,6 +349,17 @@ const api = {
             headers: getAuthHeaders()
         });
         return handleResponse(response);
+    },
+
+    // 订阅实时事件（SSE）：onEvent(type, data)，断线后浏览器自动重连
+    // EventSource 不能设置请求头，令牌放在查询参数中
+    subscribeEvents(eventTypes, onEvent) {
+        const token = window.getCurrentToken ? window.getCurrentToken() : '';
+        const source = new EventSource(`${API_BASE}/api/events?token=${encodeURIComponent(token || '')}`);
+        for (const type of [...eventTypes, 'resync']) {
+            source.addEventListener(type, (e) => onEvent(type, JSON.parse(e.data || '{}')));
+        }
+        return source;
     }
 };
 
@@ -158,6 +158,7 @@ async function loadBatchData(batchId) {
         editorState.images = (batch.images || []).map(img => ({
             id: img.id,
             url: img.file_path,
+            thumb: img.thumbnail_url || img.file_path,
             name: img.file_name,
             type: img.image_type,
         }));
@@ -211,7 +212,7 @@ function renderImages(images) {
 
     editorElements.imagesList.innerHTML = images.map((img, index) => `
         <div class="editor-image flex-shrink-0 relative group cursor-pointer" data-index="${index}">
-            <img src="${img.url}" alt="${img.name}" class="editor-image-thumb w-20 h-20 object-cover rounded-xl shadow-sm border-2 border-stone-200 hover:border-amber-400 transition-colors" onclick="openImageViewer(editorState.images, ${index})">
+            <img src="${img.thumb || img.url}" alt="${img.name}" class="editor-image-thumb w-20 h-20 object-cover rounded-xl shadow-sm border-2 border-stone-200 hover:border-amber-400 transition-colors" onclick="openImageViewer(editorState.images, ${index})">
             <button class="editor-image-type-badge" data-type="${img.type}" onclick="event.stopPropagation(); toggleImageType(${img.id}, '${img.type}')">
                 ${img.type === 'homework' ? '作业' : '参考'}
             </button>
@@ -491,6 +492,7 @@ async function handleImageUpload(files) {
         const newImages = result.images.map(img => ({
             id: img.id,
             url: img.file_path,
+            thumb: img.thumbnail_url || img.file_path,
             name: img.file_name,
             type: img.image_type,
         }));
@@ -261,6 +261,7 @@ const editorView = {
             const images = (batch.images || []).map(img => ({
                 id: img.id,
                 url: img.file_path,
+                thumb: img.thumbnail_url || img.file_path,
                 name: img.file_name,
                 type: img.image_type,
             }));
@@ -539,6 +540,7 @@ async function handleEditorImageUpload(files) {
         const newImages = result.images.map(img => ({
             id: img.id,
             url: img.file_path,
+            thumb: img.thumbnail_url || img.file_path,
             name: img.file_name,
             type: img.image_type,
         }));
@@ -587,7 +589,7 @@ function renderEditorImages(images) {
 
     editorElements.imagesList.innerHTML = images.map((img, index) => `
         <div class="editor-image flex-shrink-0 relative group cursor-pointer" data-index="${index}">
-            <img src="${img.url}" alt="${img.name}" class="editor-image-thumb w-20 h-20 object-cover rounded-xl shadow-sm border-2 border-stone-200 hover:border-amber-400 transition-colors" onclick="openImageViewer(editorState.images, ${index})">
+            <img src="${img.thumb || img.url}" alt="${img.name}" class="editor-image-thumb w-20 h-20 object-cover rounded-xl shadow-sm border-2 border-stone-200 hover:border-amber-400 transition-colors" onclick="openImageViewer(editorState.images, ${index})">
             <button class="editor-image-type-badge" data-type="${img.type}" onclick="event.stopPropagation(); toggleImageType(${img.id}, '${img.type}')">
                 ${img.type === 'homework' ? '作业' : '参考'}
             </button>
@@ -17,6 +17,7 @@ var state = window.state;  // 使用 var 允许重复声明
 const registryState = {
     batches: [],
     page: 0,
+    nextCursor: null,
     hasMore: true,
     loading: false,
     itemsPerPage: 4,
@@ -37,6 +38,7 @@ async function loadRegistryPage() {
     // 重置状态
     registryState.batches = [];
     registryState.page = 0;
+    registryState.nextCursor = null;
     registryState.hasMore = true;
     registryState.loading = false;
 
@@ -63,14 +65,14 @@ async function loadInitialData() {
 
         // 再加载批次数据
         const config = getResponsiveConfig();
-        const batches = await api.getBatches({
+        const page = await api.getBatchSummaries({
             limit: config.initial,
-            offset: 0,
         });
 
-        registryState.batches = batches;
+        registryState.batches = page.batches;
         registryState.page = 1;
-        registryState.hasMore = batches.length >= config.initial;
+        registryState.nextCursor = page.next_cursor;
+        registryState.hasMore = !!page.next_cursor;
 
         render();
     } catch (error) {
@@ -90,16 +92,16 @@ async function loadMore() {
 
     try {
         const config = getResponsiveConfig();
-        const offset = registryState.batches.length;
 
-        const batches = await api.getBatches({
+        const page = await api.getBatchSummaries({
             limit: config.scrollLoad,
-            offset: offset,
+            cursor: registryState.nextCursor,
         });
 
-        registryState.batches.push(...batches);
+        registryState.batches.push(...page.batches);
         registryState.page += 1;
-        registryState.hasMore = batches.length >= config.scrollLoad;
+        registryState.nextCursor = page.next_cursor;
+        registryState.hasMore = !!page.next_cursor;
 
         render();
     } catch (error) {
@@ -196,9 +198,8 @@ function createAddCardHTML() {
  * 计算进度
  */
 function calculateProgress(batch) {
-    const items = batch.items || [];
-    const total = items.length;
-    const completed = items.filter(item => item.status === 'done').length;
+    const total = batch.item_count || 0;
+    const completed = batch.done_count || 0;
     const percent = total > 0 ? Math.round((completed / total) * 100) : 0;
     return { total, completed, percent };
 }
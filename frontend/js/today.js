@@ -6,15 +6,16 @@
 // 状态数据
 const todayState = {
     batch: null,
-    items: [],
+    items: { todo: [], doing: [], done: [] },
     images: [],
+    clockOffset: 0,  // 服务器时间 - 本地时间（毫秒）
     deadlineTimer: null,
 };
 
 // 创建图片查看器实例
 const imageViewer = createImageViewer({
     viewerId: 'imageViewer',
-    getUrl: (item) => item.file_path,
+    getUrl: (item) => item.medium_url || item.file_path,
     loop: false  // 不循环切换
 });
 
@@ -24,21 +25,18 @@ const imageViewer = createImageViewer({
  */
 async function loadTodayPage(batchId) {
     try {
-        // 并行加载批次详情、作业项、图片
-        const [batch, items, images] = await Promise.all([
-            api.getBatch(batchId),
-            api.getBatchItems(batchId),
-            api.getBatchImages(batchId),
-        ]);
+        // 一次请求取回批次、分组后的作业项、图片和完成标记
+        const view = await api.getTodayView(batchId);
 
-        todayState.batch = batch;
-        todayState.items = items;
-        todayState.images = images;
+        todayState.batch = view.batch;
+        todayState.items = view.items;
+        todayState.images = view.images;  // 已按 homework → reference、sort_order 排好序
+        todayState.clockOffset = new Date(view.server_time) - Date.now();
 
         render();
 
         // 检查是否所有作业都已完成（active 批次且所有 item 都是 done）
-        if (batch.status === 'active' && items.length > 0 && items.every(item => item.status === 'done')) {
+        if (view.ready_to_complete) {
             showCompletionBanner();
         } else {
             hideCompletionBanner();
@@ -83,19 +81,9 @@ function renderImages() {
 
     container?.classList.remove('hidden');
 
-    // 按 image_type 分组，homework 在前
-    const homeworkImages = todayState.images
-        .filter(img => img.image_type === 'homework')
-        .sort((a, b) => a.sort_order - b.sort_order);
-    const referenceImages = todayState.images
-        .filter(img => img.image_type === 'reference')
-        .sort((a, b) => a.sort_order - b.sort_order);
-
-    const allImages = [...homeworkImages, ...referenceImages];
-
-    list.innerHTML = allImages.map((img, index) => `
+    list.innerHTML = todayState.images.map((img, index) => `
         <div class="image-item" onclick="openImageViewer(${index})">
-            <img src="${img.file_path}" alt="${img.file_name}" class="image-thumb">
+            <img src="${img.thumbnail_url || img.file_path}" alt="${img.file_name}" class="image-thumb" loading="lazy">
             <span class="image-badge ${img.image_type === 'homework' ? 'image-badge-homework' : 'image-badge-reference'}">
                 ${img.image_type === 'homework' ? '作业' : '参考'}
             </span>
@@ -118,7 +106,8 @@ function renderDeadline() {
     container?.classList.remove('hidden');
 
     const deadline = new Date(deadlineAt);
-    const now = new Date();
+    // 用服务器时间校正本地时钟，避免设备时间不准导致倒计时错误
+    const now = new Date(Date.now() + todayState.clockOffset);
     const diffMs = deadline - now;
     const diffHours = Math.floor(diffMs / (1000 * 60 * 60));
     const diffMinutes = Math.floor((diffMs % (1000 * 60 * 60)) / (1000 * 60));
@@ -167,9 +156,9 @@ function renderItems() {
     const doneContainer = document.getElementById('doneItems');
     const doneSection = document.getElementById('doneSection');
 
-    // 分组
-    const todoItems = todayState.items.filter(item => item.status !== 'done');
-    const doneItems = todayState.items.filter(item => item.status === 'done');
+    // 服务端已按状态分组，进行中的排在待完成前面
+    const todoItems = [...todayState.items.doing, ...todayState.items.todo];
+    const doneItems = todayState.items.done;
 
     // 渲染未完成
     if (todoItems.length === 0) {
@@ -272,16 +261,7 @@ async function handleStatusUpdate(itemId, status) {
  * 图片查看器
  */
 function openImageViewer(index) {
-    // 按 image_type 分组
-    const homeworkImages = todayState.images
-        .filter(i => i.image_type === 'homework')
-        .sort((a, b) => a.sort_order - b.sort_order);
-    const referenceImages = todayState.images
-        .filter(i => i.image_type === 'reference')
-        .sort((a, b) => a.sort_order - b.sort_order);
-
-    const allImages = [...homeworkImages, ...referenceImages];
-    imageViewer.setImages(allImages);
+    imageViewer.setImages(todayState.images);
     imageViewer.open(index);
 }
 
@@ -305,6 +285,21 @@ function hideCompletionBanner() {
     body?.classList.remove('has-banner');
 }
 
+/**
+ * 订阅其他设备的改动：本批次的作业项或批次有变化时重新加载（合并 300ms 内的多条事件）
+ * @param {number} batchId - 批次 ID
+ */
+function subscribeTodayEvents(batchId) {
+    let reloadTimer = null;
+    const types = ['item.status', 'item.created', 'item.updated', 'item.deleted', 'batch.status', 'batch.updated'];
+
+    api.subscribeEvents(types, (type, data) => {
+        if (type !== 'resync' && String(data.batch_id) !== String(batchId)) return;
+        clearTimeout(reloadTimer);
+        reloadTimer = setTimeout(() => loadTodayPage(batchId), 300);
+    });
+}
+
 /**
  * 完成确认弹窗（已弃用，保留以防兼容性问题）
  */
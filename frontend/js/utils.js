@@ -382,6 +382,8 @@ window.createImageViewer = createImageViewer;
 // ==================== Token 认证 ====================
 
 const TOKEN_KEY = 'access_token';
+// 与 backend/api/deps.py 中的 ACCESS_TOKEN_COOKIE 一致
+const TOKEN_COOKIE = 'mobo_token';
 
 /**
  * 从 URL 参数获取 token
@@ -398,6 +400,22 @@ function getTokenFromUrl() {
  */
 function saveToken(token) {
     localStorage.setItem(TOKEN_KEY, token);
+    syncTokenCookie(token);
+}
+
+/**
+ * 把 token 同步到 Cookie
+ * <img> 请求无法带 X-Access-Token 头，服务端开启图片权限检查（accel 模式）时从 Cookie 读取
+ * @param {string|null} token - 访问令牌，为空时删除 Cookie
+ */
+function syncTokenCookie(token) {
+    const value = token ? encodeURIComponent(token) : '';
+    if (token && document.cookie.split('; ').includes(`${TOKEN_COOKIE}=${value}`)) {
+        return;
+    }
+    const maxAge = token ? 365 * 24 * 3600 : 0;
+    const secure = window.location.protocol === 'https:' ? '; Secure' : '';
+    document.cookie = `${TOKEN_COOKIE}=${value}; path=/; max-age=${maxAge}; SameSite=Strict${secure}`;
 }
 
 /**
@@ -413,6 +431,7 @@ function getSavedToken() {
  */
 function clearToken() {
     localStorage.removeItem(TOKEN_KEY);
+    syncTokenCookie(null);
 }
 
 /**
@@ -432,7 +451,12 @@ function getCurrentToken() {
         window.history.replaceState({}, '', url.toString());
         return urlToken;
     }
-    return getSavedToken();
+    const saved = getSavedToken();
+    // 升级前保存的令牌还没有 Cookie
+    if (saved) {
+        syncTokenCookie(saved);
+    }
+    return saved;
 }
 
 /**
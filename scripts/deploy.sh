@@ -586,11 +586,6 @@ server {
 
     client_max_body_size 10M;
 
-    location /frontend/ {
-        alias $project_root/frontend/;
-        try_files \$uri \$uri/ /frontend/index.html;
-    }
-
     location /uploads/ {
         alias $project_root/data/uploads/;
     }